@@ -1,16 +1,35 @@
 # Version information
 __version__ = '1.0.0'
 
-# Import main components
-from .scraper import GallbladderDataScraper
-from .data_processor import GallbladderDataProcessor
-from .analyzer import GallbladderAnalyzer
-from .dashboard_and_report import GallbladderDashboard
+import importlib
+
+# Main components are imported on first attribute access (PEP 562), so
+# touching one class does not pull in every other module's dependencies
+_LAZY_EXPORTS = {
+    'GallbladderDataScraper': '.scraper',
+    'GallbladderDataProcessor': '.data_processor',
+    'GallbladderAnalyzer': '.analyzer',
+    'GallbladderDashboard': '.dashboard_and_report',
+    'Config': '.settings',
+    'load_config': '.settings'
+}
 
 # Export main classes
 __all__ = [
     'GallbladderDataScraper',
     'GallbladderDataProcessor',
     'GallbladderAnalyzer',
-    'GallbladderDashboard'
-]
\ No newline at end of file
+    'GallbladderDashboard',
+    'Config',
+    'load_config'
+]
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
\ No newline at end of file
@@ -1,41 +1,89 @@
 # src/advanced_analysis.py
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.stattools import adfuller
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .data_lake import read_window
+except ImportError:
+    from data_lake import read_window
+
+try:
+    from .shared_data import SHARED_DIR, attach, export_shared
+except ImportError:
+    from shared_data import SHARED_DIR, attach, export_shared
+
+try:
+    from .html_export import HtmlExporter
+except ImportError:
+    from html_export import HtmlExporter
+
+try:
+    from .analysis import daily_counts
+except ImportError:
+    from analysis import daily_counts
+
+# Shortest series the per-source ADF test is run on
+MIN_STATIONARITY_POINTS = 20
+
+def _source_stationarity(code, directory=SHARED_DIR):
+    """
+    Worker: ADF test on one source's counts from the memory-mapped test data
+    """
+    from statsmodels.tsa.stattools import adfuller
+
+    df = attach('test_data', ['date', 'count', 'source'], directory)
+    rows = np.flatnonzero(df['source'].cat.codes.to_numpy() == code)
+    series = df['count'].iloc[rows]
+    series = series.iloc[np.argsort(df['date'].to_numpy()[rows], kind='stable')].dropna()
+    result = {'source': df['source'].cat.categories[code], 'observations': len(series)}
+    if len(series) < MIN_STATIONARITY_POINTS:
+        return {**result, 'adf_statistic': np.nan, 'p_value': np.nan}
+    statistic, p_value = adfuller(series.astype('float64'))[:2]
+    return {**result, 'adf_statistic': statistic, 'p_value': p_value}
 
 class AdvancedGallbladderAnalysis:
-    def __init__(self, data_path='data/raw_data/gallbladder_test_data.csv'):
-        self.df = pd.read_csv(data_path)
-        self.df['date'] = pd.to_datetime(self.df['date'])
-        
+    def __init__(self, data_path='data/raw_data/gallbladder_test_data.csv', df=None,
+                 max_workers=None, start=None, end=None, exporter=None):
+        # A start/end window reads only the data lake partitions it covers
+        self.df = df if df is not None else read_window(data_path, 'test_data', start, end)
+        self.max_workers = max_workers
+        self.exporter = exporter or HtmlExporter()
+        
+    @instrumented(rows_in=lambda self: len(self.df))
     def seasonal_analysis(self):
-        # Perform seasonal decomposition
-        decomposition = seasonal_decompose(self.df.set_index('date')['count'], 
-                                        period=365)
+        from statsmodels.tsa.seasonal import seasonal_decompose
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
+        # Perform seasonal decomposition on the gap-free daily totals
+        counts = daily_counts(self.df)
+        decomposition = seasonal_decompose(counts, period=365)
         
         # Create interactive subplot with decomposition components
         fig = make_subplots(rows=4, cols=1,
                            subplot_titles=('Observed', 'Trend', 'Seasonal', 'Residual'))
         
-        components = [self.df['count'], decomposition.trend, 
+        components = [counts, decomposition.trend, 
                      decomposition.seasonal, decomposition.resid]
         
         for idx, component in enumerate(components, 1):
-            fig.add_trace(go.Scatter(x=self.df['date'], y=component),
+            fig.add_trace(go.Scatter(x=counts.index, y=component),
                          row=idx, col=1)
         
         fig.update_layout(height=1000, title_text="Seasonal Decomposition")
-        fig.write_html('data/analysis_results/seasonal_decomposition.html')
+        self.exporter.export(fig, 'seasonal_decomposition')
         
+    @instrumented(rows_in=lambda self: len(self.df))
     def stationarity_test(self):
+        from statsmodels.tsa.stattools import adfuller
+
         # Perform Augmented Dickey-Fuller test
-        result = adfuller(self.df['count'].dropna())
+        result = adfuller(daily_counts(self.df))
         
         # Create results summary
         results_dict = {
@@ -50,10 +98,31 @@ class AdvancedGallbladderAnalysis:
             for key, value in results_dict.items():
                 f.write(f"{key}: {value}\n")
                 
+    @instrumented(rows_in=lambda self: len(self.df))
+    def stationarity_by_source(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Export once; every worker memory-maps the same columns instead of
+        # receiving a pickled copy of the data
+        df = self.df[['date', 'count', 'source']].reset_index(drop=True)
+        df['source'] = df['source'].astype('category')
+        export_shared(df, 'test_data')
+
+        codes = range(len(df['source'].cat.categories))
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            results = pd.DataFrame(list(pool.map(_source_stationarity, codes)))
+
+        results.to_csv('data/analysis_results/stationarity_by_source.csv', index=False)
+        return results
+
+    @instrumented(rows_in=lambda self: len(self.df))
     def prophet_forecast(self):
-        # Prepare data for Prophet
-        prophet_df = self.df[['date', 'count']].rename(
-            columns={'date': 'ds', 'count': 'y'})
+        from prophet import Prophet
+        from sklearn.metrics import mean_absolute_error, mean_squared_error
+        import plotly.graph_objects as go
+
+        # Prepare data for Prophet: one row per day
+        prophet_df = daily_counts(self.df).rename('y').rename_axis('ds').reset_index()
         
         # Create and fit model
         model = Prophet(yearly_seasonality=True, 
@@ -88,7 +157,7 @@ class AdvancedGallbladderAnalysis:
                          xaxis_title='Date',
                          yaxis_title='Cases')
         
-        fig.write_html('data/analysis_results/forecast.html')
+        self.exporter.export(fig, 'forecast')
         
         # Save forecast metrics
         actual = prophet_df['y'].values
@@ -109,9 +178,11 @@ class AdvancedGallbladderAnalysis:
         self.seasonal_analysis()
         print("Seasonal decomposition complete.")
         self.stationarity_test()
+        self.stationarity_by_source()
         print("Stationarity test complete.")
         self.prophet_forecast()
         print("Forecasting complete.")
+        self.exporter.write_report()
         print("Advanced analysis complete! Check the data/analysis_results directory.")
 
 if __name__ == "__main__":
@@ -1,52 +1,97 @@
 # src/analysis.py
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .schema import read_dataset
+except ImportError:
+    from schema import read_dataset
+
+try:
+    from .time_features import add_time_features
+except ImportError:
+    from time_features import add_time_features
+
+try:
+    from .query_engine import QueryEngine
+except ImportError:
+    from query_engine import QueryEngine
+
+try:
+    from .html_export import HtmlExporter
+except ImportError:
+    from html_export import HtmlExporter
+
+def daily_counts(df):
+    """
+    Daily case totals over all sources as a series with one value per
+    calendar day; days without any observed count are interpolated
+    """
+    counts = df.groupby('date')['count'].sum(min_count=1).astype('float64')
+    return counts.asfreq('D').interpolate(method='time').dropna()
 
 class GallbladderAnalysis:
-    def __init__(self, data_path='data/raw_data/gallbladder_test_data.csv'):
-        self.df = pd.read_csv(data_path)
-        self.df['date'] = pd.to_datetime(self.df['date'])
+    def __init__(self, data_path='data/raw_data/gallbladder_test_data.csv', df=None,
+                 query_engine=None, exporter=None):
+        self.query_engine = query_engine or QueryEngine()
+        self.exporter = exporter or HtmlExporter()
+        self.df = df if df is not None else read_dataset(data_path, 'test_data')
+        if not {'year', 'month'}.issubset(self.df.columns):
+            # Calendar columns come from the shared calendar, not from re-parsing dates
+            self.df = add_time_features(self.df.copy(), ['year', 'month'])
         
+    @instrumented(rows_in=lambda self: len(self.df))
     def basic_time_series_plot(self):
+        import plotly.express as px
+
+        # Rows are per source, so plot the daily totals
+        daily = daily_counts(self.df).rename('count').reset_index()
+        
         # Create time series plot using plotly
-        fig = px.line(self.df, x='date', y='count', 
+        fig = px.line(daily, x='date', y='count', 
                      title='Gallbladder Cases Over Time',
                      labels={'count': 'Number of Cases', 'date': 'Date'})
         
         # Add trend line
-        fig.add_scatter(x=self.df['date'], 
-                       y=self.df['count'].rolling(window=30).mean(),
+        fig.add_scatter(x=daily['date'], 
+                       y=daily['count'].rolling(window=30).mean(),
                        name='30-day Moving Average',
                        line=dict(color='red'))
         
-        fig.write_html('data/analysis_results/time_series.html')
+        self.exporter.export(fig, 'time_series')
         print("Time series plot saved as 'time_series.html'")
         
+    @instrumented(rows_in=lambda self: len(self.df))
     def hospital_comparison(self):
+        import plotly.express as px
+
         # Create box plot for each hospital
         fig = px.box(self.df, x='source', y='count',
                      title='Distribution of Cases by Hospital',
                      labels={'count': 'Number of Cases', 'source': 'Hospital'})
         
-        fig.write_html('data/analysis_results/hospital_comparison.html')
+        self.exporter.export(fig, 'hospital_comparison')
         print("Hospital comparison plot saved as 'hospital_comparison.html'")
         
+    @instrumented(rows_in=lambda self: len(self.df))
     def monthly_trends(self):
-        # Calculate monthly averages
-        monthly_avg = self.df.groupby(['year', 'month'])['count'].mean().reset_index()
+        import plotly.express as px
+
+        # Calculate monthly averages of the daily totals
+        daily = add_time_features(daily_counts(self.df).rename('count').reset_index(), ['year', 'month'])
+        monthly_avg = self.query_engine.rollup(daily, ['year', 'month'], {'count': ('count', 'mean')})
         monthly_avg['date'] = pd.to_datetime(monthly_avg[['year', 'month']].assign(day=1))
         
         fig = px.line(monthly_avg, x='date', y='count',
                       title='Monthly Average Cases',
                       labels={'count': 'Average Cases', 'date': 'Date'})
         
-        fig.write_html('data/analysis_results/monthly_trends.html')
+        self.exporter.export(fig, 'monthly_trends')
         print("Monthly trends plot saved as 'monthly_trends.html'")
         
     def run_analysis(self):
@@ -54,6 +99,7 @@ class GallbladderAnalysis:
         self.basic_time_series_plot()
         self.hospital_comparison()
         self.monthly_trends()
+        self.exporter.write_report()
         print("Analysis complete! Check the data/analysis_results directory for the plots.")
 
 if __name__ == "__main__":
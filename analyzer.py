@@ -1,26 +1,97 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.stats.proportion import proportions_ztest
-from statsmodels.tsa.stattools import adfuller
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
 import os
-import json
 from datetime import datetime
 
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .schema import TIME_FEATURES
+except ImportError:
+    from schema import TIME_FEATURES
+
+try:
+    from .data_lake import DataLake, read_processed
+except ImportError:
+    from data_lake import DataLake, read_processed
+
+try:
+    from .results_store import AnalysisResultsStore
+except ImportError:
+    from results_store import AnalysisResultsStore
+
+try:
+    from .settings import Config, load_config
+except ImportError:
+    from settings import Config, load_config
+
+try:
+    from .preprocessing import ANALYSIS_FEATURES, load_or_fit
+except ImportError:
+    from preprocessing import ANALYSIS_FEATURES, load_or_fit
+
+try:
+    from .shared_data import SHARED_DIR, attach, export_shared
+except ImportError:
+    from shared_data import SHARED_DIR, attach, export_shared
+
+try:
+    from .sketches import month_dir, sketch_path, summarize, summarize_months
+except ImportError:
+    from sketches import month_dir, sketch_path, summarize, summarize_months
+
+try:
+    from .query_engine import QueryEngine
+except ImportError:
+    from query_engine import QueryEngine
+
+def _pyplot():
+    # Plotting libraries are imported on first use to keep imports cheap
+    import matplotlib.pyplot as plt
+    plt.style.use('seaborn')
+    return plt
+
+def _anova(groups: pd.DataFrame) -> Tuple[float, float]:
+    """
+    One-way ANOVA F statistic and p-value from per-group counts, means and
+    variances, so the groups' rows need not be loaded
+    """
+    from scipy import stats
+
+    groups = groups[groups['count'] > 0]
+    n, k = groups['count'].sum(), len(groups)
+    grand_mean = (groups['count'] * groups['mean']).sum() / n
+    between = (groups['count'] * (groups['mean'] - grand_mean) ** 2).sum() / (k - 1)
+    within = ((groups['count'] - 1) * groups['var'].fillna(0)).sum() / (n - k)
+    f_stat = between / within
+    return float(f_stat), float(stats.f.sf(f_stat, k - 1, n - k))
+
+def _sweep_inertia(k: int, columns: List[str], random_state: Optional[int],
+                   directory: str = SHARED_DIR) -> float:
+    """
+    Worker: fit K-means with `k` clusters on the memory-mapped cluster features
+    """
+    from sklearn.cluster import KMeans
+
+    features = attach('cluster_features', columns, directory)
+    X = np.column_stack([features[column].to_numpy() for column in columns])
+    return float(KMeans(n_clusters=k, random_state=random_state).fit(X).inertia_)
+
 class GallbladderAnalyzer:
-    def __init__(self):
+    def __init__(self, config: Optional[Config] = None, since=None):
+        self.config = config or load_config()
+        # Incremental cutoff of the processing run; summaries reuse earlier months
+        self.since = since
+        
         # Set up logging
         logging.basicConfig(
             filename='analysis.log',
-            level=logging.INFO,
+            level=self.config.app.logging_level,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
@@ -31,10 +102,14 @@ class GallbladderAnalyzer:
         # Initialize containers
         self.processed_data = {}
         self.analysis_results = {}
+        self.row_outputs = {}
         self.figures = {}
+        self.results_store = AnalysisResultsStore()
+        self.lake = DataLake(layout=self.config.processing.layout)
+        self.query_engine = QueryEngine(self.config.performance.query_engine,
+                                        self.config.performance.workers, self.lake)
         
-        plt.style.use('seaborn')
-        
+    @instrumented(rows_out=lambda self, _: sum(len(df) for df in self.processed_data.values()))
     def load_processed_data(self):
         """
         Load all processed datasets
@@ -42,10 +117,9 @@ class GallbladderAnalyzer:
         try:
             logging.info("Loading processed data...")
             
-            # Load all processed CSV files
+            # Load all processed datasets from the data lake or flat files
             for dataset in ['pubmed', 'hospital', 'statistics', 'analysis']:
-                file_path = f'data/processed_data/{dataset}_processed.csv'
-                self.processed_data[dataset] = pd.read_csv(file_path)
+                self.processed_data[dataset] = read_processed(dataset, lake=self.lake)
                 
             logging.info("Processed data loaded successfully")
             
@@ -53,27 +127,52 @@ class GallbladderAnalyzer:
             logging.error(f"Error loading processed data: {str(e)}")
             raise
 
+    @staticmethod
+    def _measures(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Numeric measurement columns, leaving out the joined calendar attributes
+        and the standardized copies of the measures
+        """
+        numeric = df.select_dtypes(include=[np.number])
+        return numeric.drop(columns=[c for c in numeric.columns
+                                     if c in TIME_FEATURES or c.endswith('_scaled')])
+
+    @instrumented(rows_in=lambda self: len(self.processed_data['hospital']))
     def perform_temporal_analysis(self) -> Dict:
         """
         Analyze temporal trends in surgery rates and outcomes
         """
+        from statsmodels.tsa.seasonal import seasonal_decompose
+        from statsmodels.tsa.stattools import adfuller
+        plt = _pyplot()
+
         try:
-            df = self.processed_data['hospital'].copy()
-            df['date'] = pd.to_datetime(df['date'])
+            df = self.processed_data['hospital']
             
             # Time series analysis
-            monthly_surgeries = df.groupby([df['date'].dt.to_period('M')])['surgery_count'].sum()
+            # Monthly totals use the persisted calendar columns when present
+            if {'year', 'month'}.issubset(df.columns):
+                monthly_surgeries = df.groupby(['year', 'month'])['surgery_count'].sum()
+                monthly_surgeries.index = pd.to_datetime(
+                    monthly_surgeries.index.to_frame(index=False).assign(day=1)
+                )
+            else:
+                monthly_surgeries = df.groupby(df['date'].dt.to_period('M'))['surgery_count'].sum()
+                monthly_surgeries.index = monthly_surgeries.index.to_timestamp()
+            monthly_surgeries = monthly_surgeries.astype('float64')
             
             # Perform seasonal decomposition
-            decomposition = seasonal_decompose(monthly_surgeries, period=12, extrapolate_trend='freq')
+            period = self.config.analysis.temporal.seasonality_period
+            decomposition = seasonal_decompose(monthly_surgeries, period=period, extrapolate_trend='freq')
             
             # Test for stationarity
             adf_test = adfuller(monthly_surgeries)
             
             results = {
-                'trend': decomposition.trend.tolist(),
-                'seasonal': decomposition.seasonal.tolist(),
-                'resid': decomposition.resid.tolist(),
+                'dates': monthly_surgeries.index.to_numpy(),
+                'trend': decomposition.trend.to_numpy(),
+                'seasonal': decomposition.seasonal.to_numpy(),
+                'resid': decomposition.resid.to_numpy(),
                 'adf_test': {
                     'test_statistic': adf_test[0],
                     'p_value': adf_test[1],
@@ -97,23 +196,36 @@ class GallbladderAnalyzer:
             logging.error(f"Error in temporal analysis: {str(e)}")
             raise
 
+    @instrumented(rows_in=lambda self: len(self.processed_data.get('hospital', ())))
     def perform_geographical_analysis(self) -> Dict:
         """
         Analyze geographical patterns in surgery rates
         """
+        plt = _pyplot()
+
         try:
-            df = self.processed_data['hospital']
-            
-            # Regional statistics
-            regional_stats = df.groupby('location').agg({
-                'surgery_count': ['mean', 'std', 'count'],
-                'mean_value': 'mean'
-            }).round(2)
+            # Regional rollups; datasets not loaded are queried in place
+            surgery = self.query_engine.boxes(
+                self.processed_data.get('hospital', 'hospital'), ['location'], 'surgery_count',
+                metrics={
+                    'mean': ('surgery_count', 'mean'),
+                    'std': ('surgery_count', 'std'),
+                    'var': ('surgery_count', 'var')
+                }
+            ).set_index('location')
+            values = self.query_engine.rollup(
+                self.processed_data.get('analysis', 'analysis'), ['location'],
+                {'mean': ('mean_value', 'mean')}
+            ).set_index('location')
+            
+            # Regional statistics; statistics values are joined onto the analysis rows
+            regional_stats = pd.concat({
+                'surgery_count': surgery[['mean', 'std', 'count']],
+                'mean_value': values[['mean']]
+            }, axis=1).round(2)
             
             # Perform ANOVA test between regions
-            regions = df['location'].unique()
-            region_groups = [df[df['location'] == region]['surgery_count'] for region in regions]
-            f_stat, p_value = stats.f_oneway(*region_groups)
+            f_stat, p_value = _anova(surgery)
             
             results = {
                 'regional_statistics': regional_stats.to_dict(),
@@ -123,9 +235,15 @@ class GallbladderAnalyzer:
                 }
             }
             
-            # Create geographical visualization
-            plt.figure(figsize=(10, 6))
-            sns.boxplot(x='location', y='surgery_count', data=df)
+            # Create geographical visualization from the quartiles
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.bxp([
+                {'label': str(location), 'med': box['median'], 'q1': box['q1'], 'q3': box['q3'],
+                 'whislo': box['lower_fence'], 'whishi': box['upper_fence'], 'fliers': box['outliers']}
+                for location, box in surgery.iterrows()
+            ])
+            ax.set_xlabel('location')
+            ax.set_ylabel('surgery_count')
             plt.xticks(rotation=45)
             plt.title('Surgery Counts by Region')
             plt.tight_layout()
@@ -141,30 +259,40 @@ class GallbladderAnalyzer:
             logging.error(f"Error in geographical analysis: {str(e)}")
             raise
 
+    @instrumented(rows_in=lambda self: len(self.processed_data['analysis']))
     def perform_correlation_analysis(self) -> Dict:
         """
         Analyze correlations between different variables
         """
+        from scipy import stats
+        import seaborn as sns
+        plt = _pyplot()
+
         try:
             df = self.processed_data['analysis']
             
             # Calculate correlation matrix
-            correlation_matrix = df.select_dtypes(include=[np.number]).corr()
+            correlation_matrix = self._measures(df).corr()
             
             # Perform statistical tests
             variables = ['surgery_count', 'mean_value', 'publication_count']
             statistical_tests = {}
+            thresholds = self.config.analysis.statistical
             
             for var1 in variables:
                 for var2 in variables:
                     if var1 != var2:
-                        correlation, p_value = stats.pearsonr(
-                            df[var1].fillna(0), 
-                            df[var2].fillna(0)
-                        )
+                        # Gaps left by handle_missing are skipped pairwise
+                        pair = df[[var1, var2]].astype('float64').dropna()
+                        if len(pair) > 2:
+                            correlation, p_value = stats.pearsonr(pair[var1], pair[var2])
+                        else:
+                            correlation, p_value = np.nan, np.nan
                         statistical_tests[f"{var1}_vs_{var2}"] = {
                             'correlation': correlation,
-                            'p_value': p_value
+                            'p_value': p_value,
+                            'strong': bool(abs(correlation) >= thresholds.correlation_threshold),
+                            'significant': bool(p_value < thresholds.significance_level)
                         }
             
             results = {
@@ -189,36 +317,60 @@ class GallbladderAnalyzer:
             logging.error(f"Error in correlation analysis: {str(e)}")
             raise
 
+    @instrumented(rows_in=lambda self: len(self.processed_data['analysis']),
+                  rows_out=lambda self, _: len(self.row_outputs.get('cluster_label', [])))
     def perform_cluster_analysis(self) -> Dict:
         """
         Perform cluster analysis to identify patterns
         """
+        from sklearn.cluster import KMeans
+        plt = _pyplot()
+
         try:
             df = self.processed_data['analysis']
             
-            # Prepare data for clustering
-            features = ['surgery_count', 'mean_value', 'publication_count']
-            X = df[features].fillna(0)
+            # Scale and project with the saved preprocessing model (fitted by
+            # the processor) instead of refitting on every run
+            chunk_size = self.config.performance.chunk_size
+            model = load_or_fit(df, ANALYSIS_FEATURES, chunk_size=chunk_size)
+            transformed = model.transform(df, chunk_size)
             
-            # Standardize features
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
+            # Rows still missing a feature after imputation are left unclustered
+            complete = transformed[model.scaled_columns].notna().all(axis=1).to_numpy()
+            clustering = self.config.analysis.clustering
+            if complete.sum() < clustering.n_clusters:
+                raise ValueError(
+                    f"Only {complete.sum()} complete rows for {clustering.n_clusters} clusters; "
+                    "set processing.clean_data.handle_missing to impute the gaps"
+                )
+            
+            X_scaled = transformed.loc[complete, model.scaled_columns].to_numpy(dtype='float64')
             
             # Perform K-means clustering
-            n_clusters = 3
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            clusters = kmeans.fit_predict(X_scaled)
+            kmeans = KMeans(n_clusters=clustering.n_clusters, random_state=clustering.random_state)
+            clusters = np.full(len(df), -1)
+            clusters[complete] = kmeans.fit_predict(X_scaled)
             
-            # Perform PCA for visualization
-            pca = PCA(n_components=2)
-            X_pca = pca.fit_transform(X_scaled)
+            # Principal components for visualization
+            X_pca = transformed[model.component_columns].to_numpy(dtype='float64')
             
             results = {
                 'cluster_centers': kmeans.cluster_centers_.tolist(),
-                'cluster_labels': clusters.tolist(),
-                'explained_variance_ratio': pca.explained_variance_ratio_.tolist(),
-                'cluster_sizes': pd.Series(clusters).value_counts().to_dict()
+                'explained_variance_ratio': model.explained_variance_ratio_.tolist(),
+                'preprocessing_model': model.version,
+                'cluster_sizes': pd.Series(clusters[complete]).value_counts().to_dict()
             }
+            if clustering.sweep:
+                results['inertia_by_k'] = self._cluster_sweep(
+                    transformed.loc[complete, model.scaled_columns], clustering
+                )
+            
+            # Per-row outputs are persisted as columns next to the data
+            self.row_outputs.update({
+                'cluster_label': clusters.astype('int16'),
+                'pca_1': X_pca[:, 0].astype('float32'),
+                'pca_2': X_pca[:, 1].astype('float32')
+            })
             
             # Create cluster visualization
             plt.figure(figsize=(10, 8))
@@ -238,20 +390,69 @@ class GallbladderAnalyzer:
             logging.error(f"Error in cluster analysis: {str(e)}")
             raise
 
+    def _cluster_sweep(self, features: pd.DataFrame, clustering) -> Dict[int, float]:
+        """
+        K-means inertia for each cluster count in `clustering.sweep`.
+
+        The features are exported once as memory-mapped columns and every
+        worker process attaches to them, so the matrix is neither pickled
+        nor copied per task.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        ks = [k for k in clustering.sweep if k <= len(features)]
+        if len(ks) < len(clustering.sweep):
+            logging.warning(f"Skipping cluster counts above the {len(features)} complete rows")
+        columns = list(features.columns)
+        export_shared(features.reset_index(drop=True), 'cluster_features', columns)
+
+        workers = min(self.config.performance.worker_count, len(ks)) or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            inertia = pool.map(_sweep_inertia, ks, [columns] * len(ks),
+                               [clustering.random_state] * len(ks))
+            return dict(zip(ks, inertia))
+
+    def _recent_rows(self, dataset: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rows of `dataset` dated from the first day of the cutoff's month on.
+        Rows of that month before the cutoff were not reprocessed, so they
+        are read back from the processed dataset.
+        """
+        cutoff = pd.Timestamp(self.since)
+        start = cutoff.to_period('M').start_time
+        recent = df[df['date'] >= cutoff]
+        if start == cutoff:
+            return recent
+        earlier = read_processed(dataset, start, cutoff - pd.Timedelta(1, 'ns'), lake=self.lake)
+        return pd.concat([earlier.reindex(columns=df.columns), recent], ignore_index=True)
+
+    @instrumented(rows_in=lambda self: sum(len(df) for df in self.processed_data.values()))
     def generate_statistical_summary(self) -> Dict:
         """
         Generate comprehensive statistical summary
         """
         try:
             summary = {}
+            performance = self.config.performance
             
             for dataset_name, df in self.processed_data.items():
-                numeric_columns = df.select_dtypes(include=[np.number]).columns
+                # One pass of mergeable sketches per chunk; quantiles and
+                # distinct counts are approximate on large data
+                numeric = self._measures(df).columns
+                if 'date' in df.columns:
+                    # Saved per month, so an incremental run only
+                    # summarizes the months it changed
+                    rows = self._recent_rows(dataset_name, df) if self.since is not None else df
+                    sketch = summarize_months(rows, month_dir(dataset_name), self.since, numeric,
+                                              performance.chunk_size, performance.worker_count)
+                else:
+                    sketch = summarize(df, numeric, performance.chunk_size, performance.worker_count)
+                sketch.save(sketch_path(dataset_name))
                 
                 summary[dataset_name] = {
-                    'descriptive_stats': df[numeric_columns].describe().to_dict(),
-                    'missing_values': df.isnull().sum().to_dict(),
-                    'unique_values': df.nunique().to_dict()
+                    'descriptive_stats': sketch.describe(),
+                    'missing_values': sketch.missing_values(),
+                    'unique_values': sketch.unique_values()
                 }
             
             self.analysis_results['statistical_summary'] = summary
@@ -263,14 +464,19 @@ class GallbladderAnalyzer:
             logging.error(f"Error generating statistical summary: {str(e)}")
             raise
 
+    @instrumented()
     def save_analysis_results(self):
         """
         Save all analysis results and figures
         """
         try:
-            # Save analysis results as JSON
-            with open('data/analysis_results/analysis_results.json', 'w') as f:
-                json.dump(self.analysis_results, f, indent=4, default=str)
+            # Save scalar results as metadata and arrays in binary form
+            self.results_store.save_results(self.analysis_results)
+            
+            if self.row_outputs:
+                self.results_store.write_row_outputs(
+                    self.processed_data['analysis'], self.row_outputs
+                )
             
             logging.info("Analysis results saved successfully")
             
@@ -0,0 +1,266 @@
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import re
+import zipfile
+
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .schema import read_dataset
+except ImportError:
+    from schema import read_dataset
+
+try:
+    from .data_lake import DataLake, read_processed
+except ImportError:
+    from data_lake import DataLake, read_processed
+
+try:
+    from .settings import Config, ReportingConfig, load_config
+except ImportError:
+    from settings import Config, ReportingConfig, load_config
+
+# Shared assets handed to every worker once through the pool initializer
+_shared_assets = {}
+
+
+def _render_png(fig) -> bytes:
+    """
+    Render a matplotlib figure to PNG bytes without touching disk
+    """
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def _render_trend_chart(df: pd.DataFrame, title: str) -> bytes:
+    """
+    Monthly surgery totals for the given rows
+    """
+    monthly = df.groupby(df['date'].dt.to_period('M'))['surgery_count'].sum()
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.plot(monthly.index.to_timestamp(), monthly.values, marker='o')
+    ax.set_title(title)
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Number of Surgeries')
+    fig.autofmt_xdate()
+    return _render_png(fig)
+
+
+def _render_distribution_chart(df: pd.DataFrame, by: str, title: str) -> bytes:
+    """
+    Surgery count distribution per group
+    """
+    groups = [(name, group['surgery_count'].dropna().values)
+              for name, group in df.groupby(by, observed=True)]
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.boxplot([values for _, values in groups])
+    ax.set_xticks(range(1, len(groups) + 1))
+    ax.set_xticklabels([str(name) for name, _ in groups], rotation=45, ha='right')
+    ax.set_title(title)
+    ax.set_ylabel('Number of Surgeries')
+    return _render_png(fig)
+
+
+def render_shared_assets(df: pd.DataFrame) -> Dict[str, bytes]:
+    """
+    Render the charts that are identical in every report exactly once
+    """
+    return {
+        'overall_trend': _render_trend_chart(df, 'All Hospitals: Monthly Surgeries'),
+        'regional_distribution': _render_distribution_chart(
+            df, 'location', 'Surgery Distribution by Region'
+        )
+    }
+
+
+def render_entity_charts(entity_type: str, entity: str, df: pd.DataFrame) -> Dict[str, bytes]:
+    """
+    Render the charts specific to one hospital or region
+    """
+    charts = {'entity_trend': _render_trend_chart(df, f'{entity}: Monthly Surgeries')}
+    if entity_type == 'region':
+        charts['hospital_distribution'] = _render_distribution_chart(
+            df, 'hospital_name', f'{entity}: Surgery Distribution by Hospital'
+        )
+    return charts
+
+
+def _init_worker(shared_assets: Dict[str, bytes]):
+    global _shared_assets
+    _shared_assets = shared_assets
+
+
+def build_entity_report(entity_type: str, entity: str, df: pd.DataFrame,
+                        reporting_config: ReportingConfig) -> Tuple[str, bytes]:
+    """
+    Render one entity's charts and build its PDF entirely in memory
+    """
+    charts = render_entity_charts(entity_type, entity, df)
+    charts.update(_shared_assets)
+
+    styles = getSampleStyleSheet()
+    total = df['surgery_count'].sum()
+    period = f"{df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d}"
+
+    sections = {
+        'executive_summary': [
+            Paragraph("Executive Summary", styles['Heading1']),
+            Paragraph(
+                f"{entity} ({entity_type}) reported {total:,.0f} gallbladder surgeries "
+                f"between {period}.",
+                styles['Normal']
+            )
+        ],
+        'methodology': [
+            Paragraph("Methodology", styles['Heading1']),
+            Paragraph(
+                "Surgery counts were aggregated by month from the processed hospital "
+                "dataset and compared against all reporting hospitals and regions.",
+                styles['Normal']
+            )
+        ],
+        'results': [Paragraph("Results", styles['Heading1'])],
+        'conclusions': [
+            Paragraph("Conclusions", styles['Heading1']),
+            Paragraph(
+                f"Mean monthly volume for {entity} was "
+                f"{df.groupby(df['date'].dt.to_period('M'))['surgery_count'].sum().mean():,.1f}.",
+                styles['Normal']
+            )
+        ]
+    }
+
+    charts_per_page = reporting_config.charts_per_page
+    for i, (chart_name, png) in enumerate(charts.items()):
+        if i and i % charts_per_page == 0:
+            sections['results'].append(PageBreak())
+        sections['results'].append(Paragraph(chart_name.replace('_', ' ').title(), styles['Heading2']))
+        sections['results'].append(Image(BytesIO(png), width=400, height=200))
+        sections['results'].append(Spacer(1, 12))
+
+    elements = [
+        Paragraph(f"Gallbladder Surgery Report: {entity}", styles['Title']),
+        Spacer(1, 12)
+    ]
+    for section in reporting_config.sections:
+        elements.extend(sections.get(section, []))
+        elements.append(Spacer(1, 12))
+
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(elements)
+    slug = re.sub(r'[^\w]+', '_', str(entity)).strip('_').lower()
+    return f'{entity_type}/{slug}.pdf', buffer.getvalue()
+
+
+class GallbladderBatchReporter:
+    def __init__(self, data_path: Optional[str] = None,
+                 config: Optional[Config] = None, max_workers: Optional[int] = None):
+        self.config = config or load_config()
+
+        # Set up logging
+        logging.basicConfig(
+            filename='reporting.log',
+            level=self.config.app.logging_level,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+
+        os.makedirs('data/analysis_results/reports', exist_ok=True)
+
+        # Without a path, the processed hospital dataset (lake or flat file)
+        self.data_path = data_path
+        self.max_workers = max_workers or self.config.performance.worker_count
+        self.reporting_config = self.config.reporting
+        self.df = None
+
+    @instrumented(rows_out=lambda self, _: len(self.df))
+    def load_data(self, period: Optional[str] = None):
+        """
+        Load hospital data, optionally restricted to one month (YYYY-MM)
+        """
+        try:
+            columns = ['hospital_name', 'location', 'date', 'surgery_count']
+            month = pd.Period(period, freq='M') if period else None
+            if self.data_path is None:
+                # A single month reads only that month's lake partition
+                bounds = (month.start_time, month.end_time) if month is not None else (None, None)
+                df = read_processed('hospital', *bounds, columns=columns,
+                                    lake=DataLake(layout=self.config.processing.layout))
+            else:
+                df = read_dataset(self.data_path, 'hospital', usecols=columns)
+                if month is not None:
+                    df = df[df['date'].dt.to_period('M') == month]
+            self.df = df
+            logging.info(f"Loaded {len(df)} rows for batch reporting")
+
+        except Exception as e:
+            logging.error(f"Error loading reporting data: {str(e)}")
+            raise
+
+    def _entities(self) -> List[Tuple[str, str, pd.DataFrame]]:
+        entities = []
+        for column, entity_type in [('hospital_name', 'hospital'), ('location', 'region')]:
+            for name, group in self.df.groupby(column, observed=True):
+                entities.append((entity_type, name, group))
+        return entities
+
+    @instrumented(rows_in=lambda self: len(self.df))
+    def generate_batch(self, output_path: Optional[str] = None) -> str:
+        """
+        Build one PDF per hospital and region and stream them into a zip archive
+        """
+        try:
+            if self.df is None:
+                self.load_data()
+            if output_path is None:
+                output_path = (f'data/analysis_results/reports/'
+                               f'gallbladder_reports_{datetime.now():%Y_%m}.zip')
+
+            shared_assets = render_shared_assets(self.df)
+            entities = self._entities()
+
+            with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+                    ProcessPoolExecutor(max_workers=self.max_workers,
+                                        initializer=_init_worker,
+                                        initargs=(shared_assets,)) as pool:
+                # Keep a bounded number of PDFs in flight so memory stays flat
+                pending = set()
+                for entity_type, name, group in entities:
+                    if len(pending) >= 2 * self.max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            archive.writestr(*future.result())
+                    pending.add(pool.submit(build_entity_report, entity_type, name,
+                                            group, self.reporting_config))
+                for future in wait(pending).done:
+                    archive.writestr(*future.result())
+
+            logging.info(f"Generated {len(entities)} reports into {output_path}")
+            return output_path
+
+        except Exception as e:
+            logging.error(f"Error generating batch reports: {str(e)}")
+            raise
+
+def main():
+    reporter = GallbladderBatchReporter()
+    reporter.load_data()
+    reporter.generate_batch()
+
+if __name__ == "__main__":
+    main()
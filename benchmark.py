@@ -0,0 +1,443 @@
+import argparse
+import gc
+import importlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .instrumentation import peak_rss_mb, reset_peak_rss
+except ImportError:
+    from instrumentation import peak_rss_mb, reset_peak_rss
+
+try:
+    from .settings import load_config
+except ImportError:
+    from settings import load_config
+
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+YEARS = 5
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Statements timed in a fresh interpreter by the import benchmark
+IMPORT_TARGETS = [
+    'import gallbladder_analysis',
+    'from gallbladder_analysis import GallbladderDataProcessor',
+    'from gallbladder_analysis import GallbladderAnalyzer',
+    'from gallbladder_analysis import GallbladderDashboard',
+    'from gallbladder_analysis import GallbladderDataScraper',
+    'import gallbladder_analysis.advanced_analysis'
+]
+
+_IMPORT_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+# VmHWM, unlike ru_maxrss, is not carried over from the parent across exec
+with open('/proc/self/status') as f:
+    peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+print(json.dumps({{'import_s': elapsed, 'max_rss_mb': peak / 1024, 'modules': len(sys.modules)}}))
+'''
+
+
+def _module(name: str):
+    """
+    Import a pipeline module lazily so a missing optional dependency only
+    skips the stages that need it
+    """
+    if __package__:
+        return importlib.import_module(f'.{name}', __package__)
+    return importlib.import_module(name)
+
+
+def _measure(name: str, func: Callable, stages: List[Dict]) -> bool:
+    """
+    Run one stage and append its wall time, CPU time and peak RSS
+    """
+    gc.collect()
+    reset_peak_rss()
+    status, error = 'ok', None
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        func()
+    except ImportError as e:
+        status, error = 'skipped', str(e)
+    except Exception as e:
+        status, error = 'error', f'{type(e).__name__}: {e}'
+    stages.append({
+        'stage': name,
+        'status': status,
+        'wall_s': round(time.perf_counter() - wall, 4),
+        'cpu_s': round(time.process_time() - cpu, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'error': error
+    })
+    logging.info(f"{name}: {stages[-1]}")
+    return status == 'ok'
+
+
+def run_scale(scale: str, rows: int, workdir: str, repeats: int = 5) -> Dict:
+    """
+    Generate fixtures of `rows` hospital-days and time every pipeline stage
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    logging.basicConfig(
+        filename='benchmark.log',
+        level=load_config().app.logging_level,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    stages = []
+
+    generate_test_data = _module('generate_test_data')
+    n_hospitals = max(1, math.ceil(rows / (365 * YEARS)))
+    _measure('fixtures.generate', lambda: generate_test_data.generate_fixtures(
+        n_hospitals=n_hospitals, years=YEARS, n_articles=max(1000, rows // 100),
+        missing_rate=0.01, duplicate_rate=0.001
+    ), stages)
+
+    # Data processing
+    processor = _module('data_processor').GallbladderDataProcessor()
+    for step in ['load_raw_data', 'clean_pubmed_data', 'clean_hospital_data',
+                 'process_statistics_data', 'handle_outliers_and_missing',
+                 'create_time_features', 'calculate_data_quality_metrics',
+                 'create_analysis_dataset', 'save_processed_data']:
+        _measure(f'processor.{step}', getattr(processor, step), stages)
+    del processor
+
+    # Statistical analysis
+    analyzer_box = {}
+    if _measure('analyzer.init', lambda: analyzer_box.setdefault(
+            'analyzer', _module('analyzer').GallbladderAnalyzer()), stages):
+        analyzer = analyzer_box.pop('analyzer')
+        for step in ['load_processed_data', 'perform_temporal_analysis',
+                     'perform_geographical_analysis', 'perform_correlation_analysis',
+                     'perform_cluster_analysis', 'generate_statistical_summary',
+                     'save_analysis_results']:
+            _measure(f'analyzer.{step}', getattr(analyzer, step), stages)
+        del analyzer
+
+    # Forecasting
+    advanced_box = {}
+    if _measure('advanced.load', lambda: advanced_box.setdefault(
+            'advanced', _module('advanced_analysis').AdvancedGallbladderAnalysis()), stages):
+        advanced = advanced_box.pop('advanced')
+        for step in ['seasonal_analysis', 'stationarity_test', 'prophet_forecast']:
+            _measure(f'advanced.{step}', getattr(advanced, step), stages)
+        del advanced
+
+    # Dashboard callbacks, timed through the methods behind update_charts
+    dashboard_box = {}
+    if _measure('dashboard.load', lambda: dashboard_box.setdefault(
+            'dashboard', _module('dashboard_and_report').GallbladderDashboard()), stages):
+        dashboard = dashboard_box.pop('dashboard')
+        hospital = dashboard.processed_data['hospital']
+        locations = list(hospital['location'].dropna().unique()[:2])
+        start_date, end_date = hospital['date'].min(), hospital['date'].max()
+
+        def update_charts():
+            dashboard.create_temporal_chart(locations, start_date, end_date)
+            dashboard.create_geographical_chart(locations)
+            dashboard.create_correlation_chart()
+            dashboard.create_cluster_chart()
+
+        latencies = []
+        for _ in range(repeats):
+            if not _measure('dashboard.update_charts', update_charts, stages):
+                break
+            latencies.append(stages.pop()['wall_s'])
+        if latencies:
+            stages.append({
+                'stage': 'dashboard.update_charts',
+                'status': 'ok',
+                'wall_s': statistics.median(latencies),
+                'wall_max_s': max(latencies),
+                'repeats': len(latencies),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'error': None
+            })
+
+    return {'rows': rows, 'stages': stages}
+
+
+def _timed(name: str, func: Callable, rows: int, repeats: int) -> Dict:
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'stage': name,
+        'status': 'ok',
+        'rows': rows,
+        'wall_s': round(statistics.median(timings), 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'error': None
+    }
+
+
+def run_join_benchmark(scales: List[str], repeats: int = 3) -> List[Dict]:
+    """
+    Time the analysis join layer (KeyIndex as-of and period lookups) against
+    pandas merge_asof and merge on synthetic hospital-day keys
+    """
+    import numpy as np
+    import pandas as pd
+    joins = _module('joins')
+
+    days = 365 * YEARS
+    rng = np.random.default_rng(0)
+    # Monthly statistics snapshots and yearly publication counts
+    snapshot_keys = np.arange(0, days, 30)
+    snapshots = pd.DataFrame({'key': snapshot_keys, 'mean_value': rng.normal(8, 1, len(snapshot_keys))})
+    yearly = pd.DataFrame({'year': np.arange(2018, 2018 + YEARS), 'publication_count': rng.integers(100, 500, YEARS)})
+
+    results = []
+    for scale in scales:
+        rows = SCALES[scale]
+        keys = pd.Series(np.tile(np.arange(days), -(-rows // days))[:rows])
+        years = pd.Series(2018 + keys.to_numpy() // 365)
+        left = pd.DataFrame({'key': keys, 'year': years})
+
+        stats_index = joins.KeyIndex.from_frame(snapshots, 'key', ['mean_value'])
+        years_index = joins.KeyIndex.from_frame(yearly, 'year', ['publication_count'])
+        cases = [
+            ('keyindex_asof', lambda: stats_index.asof(keys, direction='nearest')),
+            ('merge_asof', lambda: pd.merge_asof(
+                left.reset_index().sort_values('key'), snapshots, on='key', direction='nearest'
+            ).sort_values('index')),
+            ('keyindex_lookup', lambda: years_index.lookup(years)),
+            ('merge', lambda: left.merge(yearly, on='year', how='left'))
+        ]
+        for name, func in cases:
+            results.append(_timed(f'joins.{scale}.{name}', func, rows, repeats))
+            logging.info(f"{results[-1]}")
+    return results
+
+
+def run_parse_benchmark(pages_dir: str, repeats: int = 3) -> List[Dict]:
+    """
+    Time every PubMed parser backend, and lxml through a process pool, on
+    the saved result pages in `pages_dir` (stub server pages when it has none)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    parsing = _module('parsing')
+
+    pages = []
+    if os.path.isdir(pages_dir):
+        for name in sorted(os.listdir(pages_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(pages_dir, name), 'rb') as f:
+                    pages.append(f.read())
+    if not pages:
+        stub_server = _module('stub_server')
+        pages = [stub_server.pubmed_page('gallbladder surgery', page).encode() for page in range(1, 21)]
+    megabytes = sum(len(page) for page in pages) / 1e6
+
+    def parse_all(backend):
+        return lambda: [parsing.parse_pubmed_page(page, backend) for page in pages]
+
+    workers = os.cpu_count() or 1
+    cases = [(backend, parse_all(backend)) for backend in parsing.PUBMED_BACKENDS]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        cases.append((f'lxml.pool{workers}', lambda: list(pool.map(parsing.parse_pubmed_page, pages))))
+        results = []
+        for name, func in cases:
+            result = _timed(f'parse.{name}', func, len(pages), repeats)
+            result['pages_per_s'] = round(len(pages) / result['wall_s'], 1)
+            result['mb_per_s'] = round(megabytes / result['wall_s'], 2)
+            results.append(result)
+            logging.info(f"{result}")
+    return results
+
+
+def run_import_benchmark(repeats: int = 5) -> List[Dict]:
+    """
+    Time importing the package and its main classes in fresh interpreters
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        # Expose the repository under its package name
+        os.symlink(REPO_DIR, os.path.join(root, 'gallbladder_analysis'))
+        env = dict(os.environ, PYTHONPATH=root)
+        for statement in IMPORT_TARGETS:
+            runs, error = [], None
+            for _ in range(repeats):
+                process = subprocess.run(
+                    [sys.executable, '-c', _IMPORT_PROBE.format(statement=statement)],
+                    capture_output=True, text=True, env=env, cwd=root
+                )
+                if process.returncode != 0:
+                    error = process.stderr.strip().splitlines()[-1]
+                    break
+                runs.append(json.loads(process.stdout))
+            results.append({
+                'stage': statement,
+                'status': 'ok' if runs and error is None else 'error',
+                'wall_s': round(statistics.median(r['import_s'] for r in runs), 4) if runs else None,
+                'peak_rss_mb': round(max(r['max_rss_mb'] for r in runs), 1) if runs else None,
+                'modules': runs[0]['modules'] if runs else None,
+                'error': error
+            })
+    return results
+
+
+def _environment() -> Dict:
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, text=True,
+            stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for package in ['pandas', 'numpy', 'sklearn', 'statsmodels', 'pyarrow']:
+        try:
+            versions[package] = importlib.import_module(package).__version__
+        except ImportError:
+            versions[package] = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions
+    }
+
+
+def stage_errors(results: Dict) -> List[str]:
+    """
+    '<scale> <stage>: <error>' for every stage that raised during a run
+    """
+    return [
+        f"{scale} {stage['stage']}: {stage['error']}"
+        for scale, result in results['scales'].items()
+        for stage in result['stages'] if stage.get('status') == 'error'
+    ]
+
+
+def run_benchmarks(scales: List[str], output_dir: str, workdir: str, repeats: int = 5,
+                   imports: bool = False, joins: bool = False,
+                   parse_pages: Optional[str] = None) -> str:
+    """
+    Run each scale in a fresh process and persist all results as one JSON file
+    """
+    results = {'environment': _environment(), 'scales': {}}
+    if imports:
+        results['scales']['imports'] = {'rows': None, 'stages': run_import_benchmark(repeats)}
+        for stage in results['scales']['imports']['stages']:
+            print(f"{stage['stage']:<60} {stage['status']:<8} "
+                  f"{stage['wall_s'] or 0:>9.3f}s {stage['peak_rss_mb'] or 0:>9.1f}MB "
+                  f"{stage['modules'] or 0:>6} modules")
+    if joins:
+        results['scales']['joins'] = {'rows': None, 'stages': run_join_benchmark(scales)}
+        for stage in results['scales']['joins']['stages']:
+            print(f"{stage['stage']:<45} {stage['rows']:>10} rows {stage['wall_s']:>9.3f}s")
+        scales = []
+    if parse_pages is not None:
+        results['scales']['parsing'] = {'rows': None, 'stages': run_parse_benchmark(parse_pages)}
+        for stage in results['scales']['parsing']['stages']:
+            print(f"{stage['stage']:<30} {stage['rows']:>6} pages {stage['wall_s']:>9.3f}s "
+                  f"{stage['pages_per_s']:>9.1f} pages/s {stage['mb_per_s']:>7.2f} MB/s")
+        scales = []
+    context = multiprocessing.get_context('spawn')
+    for scale in scales:
+        with context.Pool(1) as pool:
+            results['scales'][scale] = pool.apply(
+                run_scale,
+                (scale, SCALES[scale], os.path.abspath(os.path.join(workdir, scale)), repeats)
+            )
+        for stage in results['scales'][scale]['stages']:
+            print(f"{scale:>4} {stage['stage']:<45} {stage['status']:<8} "
+                  f"{stage['wall_s']:>9.3f}s {stage['peak_rss_mb']:>9.1f}MB")
+
+    errors = stage_errors(results)
+    if errors:
+        print(f"{len(errors)} stage(s) failed; their timings are not comparable:")
+        for error in errors:
+            print(f"  {error}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    name = f"{datetime.now():%Y%m%d_%H%M%S}_{results['environment']['commit'] or 'nogit'}.json"
+    path = os.path.join(output_dir, name)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Benchmark results saved to {path}")
+    return path
+
+
+def compare_results(baseline_path: str, candidate_path: str, threshold: float = 0.1) -> int:
+    """
+    Print per-stage ratios between two result files; returns the number of regressions
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    regressions = 0
+    for scale, result in candidate['scales'].items():
+        previous = {s['stage']: s for s in baseline['scales'].get(scale, {}).get('stages', [])}
+        for stage in result['stages']:
+            before = previous.get(stage['stage'])
+            if not before or before['status'] != 'ok' or stage['status'] != 'ok':
+                continue
+            time_ratio = stage['wall_s'] / before['wall_s'] if before['wall_s'] else 1.0
+            memory_ratio = stage['peak_rss_mb'] / before['peak_rss_mb'] if before['peak_rss_mb'] else 1.0
+            flag = ''
+            if time_ratio > 1 + threshold or memory_ratio > 1 + threshold:
+                flag = 'REGRESSION'
+                regressions += 1
+            print(f"{scale:>4} {stage['stage']:<45} time x{time_ratio:6.2f}  "
+                  f"memory x{memory_ratio:6.2f}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the gallbladder analysis pipeline')
+    parser.add_argument('--scales', nargs='*', choices=list(SCALES), default=['10k'])
+    parser.add_argument('--imports', action='store_true',
+                        help='also time package and class imports in fresh interpreters')
+    parser.add_argument('--joins', action='store_true',
+                        help='time only the analysis join layer at the selected scales')
+    parser.add_argument('--parse', nargs='?', const='data/raw_data/pages/pubmed', metavar='PAGES_DIR',
+                        help='time only the PubMed page parsers on saved result pages')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='dashboard callback repetitions')
+    parser.add_argument('--output-dir', default='benchmarks/results')
+    parser.add_argument('--workdir', default='benchmarks/work')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help='compare two saved result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename='benchmark.log',
+        level=load_config().app.logging_level,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    if args.compare:
+        sys.exit(1 if compare_results(*args.compare, threshold=args.threshold) else 0)
+    path = run_benchmarks(args.scales, args.output_dir, args.workdir, args.repeats, args.imports,
+                          args.joins, args.parse)
+    with open(path) as f:
+        # A stage that raised fails the run instead of passing as a fast timing
+        sys.exit(1 if stage_errors(json.load(f)) else 0)
+
+if __name__ == "__main__":
+    main()
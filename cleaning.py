@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from typing import Iterator, List, Sequence
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 0.6745
+STAT_COLUMNS = ['count', 'mean', 'std', 'median', 'mad']
+
+
+def iter_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield consecutive row slices of at most `chunk_size` rows
+    """
+    for start in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def group_statistics(df: pd.DataFrame, value: str, by: Sequence[str]) -> pd.DataFrame:
+    """
+    Per-group count, mean, std, median and MAD of `value` in `df`.
+
+    Only the key and value columns are read. An empty `by` gives a single
+    global row.
+    """
+    by = list(by)
+    values = df[value].astype('float64')
+
+    if not by:
+        valid = values.dropna()
+        median = valid.median()
+        return pd.DataFrame({
+            'count': [len(valid)], 'mean': [valid.mean()], 'std': [valid.std()],
+            'median': [median], 'mad': [(valid - median).abs().median()]
+        })
+
+    keys = [df[column] for column in by]
+    grouped = values.groupby(keys, observed=True)
+    stats = grouped.agg(['count', 'mean', 'std', 'median'])
+    deviation = (values - grouped.transform('median')).abs()
+    stats['mad'] = deviation.groupby(keys, observed=True).median()
+    return stats[STAT_COLUMNS]
+
+
+def _row_stats(df: pd.DataFrame, stats: pd.DataFrame, by: Sequence[str],
+               column: str) -> np.ndarray:
+    """
+    Broadcast one statistic onto the rows of `df` by group key; unknown groups get NaN
+    """
+    by = list(by)
+    table = np.append(stats[column].to_numpy(dtype='float64'), np.nan)
+    if not by:
+        return np.full(len(df), table[0])
+    if len(by) == 1:
+        keys = pd.Index(df[by[0]])
+    else:
+        keys = pd.MultiIndex.from_frame(df[by])
+    positions = stats.index.get_indexer(keys)
+    # -1 (missing group) selects the trailing NaN
+    return table[positions]
+
+
+def flag_outliers(df: pd.DataFrame, value: str, stats: pd.DataFrame, by: Sequence[str],
+                  method: str = 'zscore', threshold: float = 3.0) -> np.ndarray:
+    """
+    Boolean mask of rows whose `value` is an outlier within its group.
+
+    'zscore' compares |x - mean| / std against `threshold`; 'mad' uses the
+    modified z-score 0.6745 * |x - median| / MAD. Groups with zero spread
+    and missing values are never flagged.
+    """
+    values = df[value].to_numpy(dtype='float64', na_value=np.nan)
+    if method == 'mad':
+        centre = _row_stats(df, stats, by, 'median')
+        spread = _row_stats(df, stats, by, 'mad') / MAD_SCALE
+    elif method == 'zscore':
+        centre = _row_stats(df, stats, by, 'mean')
+        spread = _row_stats(df, stats, by, 'std')
+    else:
+        raise ValueError(f"Unknown outlier method: {method}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.abs(values - centre) / spread
+    return np.nan_to_num(score, nan=0.0, posinf=0.0) > threshold
+
+
+def impute(df: pd.DataFrame, value: str, levels: List[tuple], strategy: str = 'mean') -> pd.Series:
+    """
+    Fill missing `value` from group statistics, most specific level first.
+
+    `levels` holds (by, stats) pairs as returned by group_statistics; a level
+    with an empty `by` acts as the global fallback. 'zero' fills with 0 and
+    'none' leaves gaps as they are ('drop' is handled by the caller).
+    """
+    values = df[value].to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(values)
+    if strategy == 'none' or not missing.any():
+        return pd.Series(values, index=df.index, name=value)
+    if strategy == 'zero':
+        return pd.Series(np.where(missing, 0.0, values), index=df.index, name=value)
+
+    column = 'mean' if strategy == 'mean' else 'median'
+    for by, stats in levels:
+        if not missing.any():
+            break
+        fill = _row_stats(df, stats, by, column)
+        values = np.where(missing, fill, values)
+        missing = np.isnan(values)
+    return pd.Series(values, index=df.index, name=value)
@@ -0,0 +1,246 @@
+import argparse
+import importlib
+import json
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    from . import instrumentation
+    from .data_lake import read_window
+    from .schema import read_dataset
+    from .settings import ConfigError, load_config, parse_overrides
+    from .validation import VALIDATION_DIR, ValidationError
+except ImportError:
+    import instrumentation
+    from data_lake import read_window
+    from schema import read_dataset
+    from settings import ConfigError, load_config, parse_overrides
+    from validation import VALIDATION_DIR, ValidationError
+
+STAGES = ['scrape', 'process', 'analyze', 'explore', 'advanced', 'report', 'dashboard']
+DEFAULT_STAGES = ['process', 'analyze']
+TEST_DATA_PATH = 'data/raw_data/gallbladder_test_data.csv'
+
+
+def _import(name: str):
+    # Stage modules are imported only when their stage runs
+    if __package__:
+        return importlib.import_module(f'.{name}', __package__)
+    return importlib.import_module(name)
+
+
+class PipelineRunner:
+    """
+    Runs the selected pipeline stages in one process, handing data produced
+    by one stage to the next instead of re-reading it from disk
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.config = load_config(args.config, parse_overrides(args.set))
+        self.jobs = args.jobs or self.config.performance.worker_count
+        self.processed_data: Optional[Dict] = None
+        self.analyzer = None
+        self.test_data = None
+
+    def scrape(self):
+        hospitals = None
+        if self.args.hospitals:
+            with open(self.args.hospitals) as f:
+                hospitals = json.load(f)
+        else:
+            logging.info("No --hospitals file given; skipping hospital scraping")
+        if self.args.queue:
+            _import('work_queue').run_crawl(self.config, hospitals, workers=self.jobs,
+                                            resume=self.args.queue == 'resume')
+            return
+
+        scraper = _import('scraper').GallbladderDataScraper(self.config)
+        tasks = [scraper.scrape_pubmed_queries, scraper.scrape_medical_statistics]
+        if hospitals:
+            tasks.append(lambda: scraper.scrape_hospital_data(hospitals))
+
+        # The sources are independent network-bound jobs
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for future in [pool.submit(task) for task in tasks]:
+                future.result()
+        scraper.combine_data()
+
+    def process(self):
+        processor = _import('data_processor').GallbladderDataProcessor(
+            output_format=self.args.format, since=self.args.since, config=self.config
+        )
+        processor.load_raw_data()
+        processor.clean_pubmed_data()
+        processor.clean_hospital_data()
+        processor.process_statistics_data()
+        processor.handle_outliers_and_missing()
+        processor.create_time_features()
+        processor.calculate_data_quality_metrics()
+        processor.create_analysis_dataset()
+        processor.save_processed_data()
+        self.processed_data = processor.processed_data
+
+    def analyze(self):
+        analyzer = _import('analyzer').GallbladderAnalyzer(self.config, since=self.args.since)
+        if self.processed_data is not None:
+            analyzer.processed_data = dict(self.processed_data)
+        else:
+            analyzer.load_processed_data()
+        analyzer.perform_temporal_analysis()
+        analyzer.perform_geographical_analysis()
+        analyzer.perform_correlation_analysis()
+        analyzer.perform_cluster_analysis()
+        analyzer.generate_statistical_summary()
+        analyzer.save_analysis_results()
+        self.analyzer = analyzer
+
+    def _test_data(self):
+        if self.test_data is None:
+            if self.config.processing.layout == 'partitioned':
+                # --since reads only the partitions from the cutoff on
+                df = read_window(TEST_DATA_PATH, 'test_data', start=self.args.since)
+            else:
+                df = read_dataset(TEST_DATA_PATH, 'test_data')
+                if self.args.since:
+                    df = df[df['date'] >= self.args.since]
+            self.test_data = df
+        return self.test_data
+
+    def _exporter(self):
+        return _import('html_export').HtmlExporter(
+            self.config.reporting.html_export, self.config.reporting.html_report
+        )
+
+    def explore(self):
+        engine = _import('query_engine').QueryEngine(
+            self.config.performance.query_engine, self.config.performance.workers
+        )
+        _import('analysis').GallbladderAnalysis(
+            df=self._test_data(), query_engine=engine, exporter=self._exporter()
+        ).run_analysis()
+
+    def advanced(self):
+        _import('advanced_analysis').AdvancedGallbladderAnalysis(
+            df=self._test_data(), max_workers=self.config.performance.workers,
+            exporter=self._exporter()
+        ).run_advanced_analysis()
+
+    def report(self):
+        reporter = _import('batch_report').GallbladderBatchReporter(
+            config=self.config, max_workers=self.jobs
+        )
+        if self.processed_data is not None:
+            reporter.df = self.processed_data['hospital'][
+                ['hospital_name', 'location', 'date', 'surgery_count']
+            ]
+        else:
+            reporter.load_data()
+        reporter.generate_batch()
+
+    def dashboard(self):
+        module = _import('dashboard_and_report')
+        if self.analyzer is not None:
+            processed_data = dict(self.analyzer.processed_data)
+            # Attach the per-row cluster outputs the dashboard reads
+            processed_data['analysis'] = processed_data['analysis'].reset_index(drop=True).assign(
+                **self.analyzer.row_outputs
+            )
+            dashboard = module.GallbladderDashboard(
+                processed_data, self.analyzer.analysis_results, config=self.config
+            )
+        else:
+            dashboard = module.GallbladderDashboard(config=self.config)
+        # The reloader would restart the whole pipeline run
+        dashboard.app.run_server(debug=self.config.app.debug, use_reloader=False)
+
+    def run(self, stages: List[str]):
+        for stage in STAGES:
+            if stage in stages:
+                logging.info(f"Running stage: {stage}")
+                with instrumentation.stage(f'cli.{stage}'):
+                    getattr(self, stage)()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='gallbladder',
+        description='Run gallbladder analysis pipeline stages in a single process'
+    )
+    parser.add_argument('stages', nargs='*', choices=STAGES + ['all'], metavar='STAGE',
+                        help=f"stages to run, in pipeline order ({', '.join(STAGES)} or all; "
+                             f"default: {' '.join(DEFAULT_STAGES)})")
+    parser.add_argument('-c', '--config', metavar='YAML',
+                        help='configuration file (default: $GALLBLADDER_CONFIG or config.yaml)')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='override a config value for this run, '
+                             'e.g. --set analysis.clustering.n_clusters=5 (repeatable)')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='worker count for parallel stages (scraping, batch reports); '
+                             'default: performance.workers')
+    parser.add_argument('--format', choices=['parquet', 'csv'],
+                        help='file format for processed datasets; default: processing.output_format')
+    parser.add_argument('--since', metavar='YYYY-MM-DD',
+                        help='only process rows dated on or after this day and merge them '
+                             'into existing outputs')
+    parser.add_argument('--profile', nargs='?', const='cprofile',
+                        choices=['cprofile', 'pyinstrument'],
+                        help='dump a profile for every stage (default profiler: cprofile)')
+    parser.add_argument('--hospitals', metavar='JSON',
+                        help='hospital list for the scrape stage')
+    parser.add_argument('--queue', nargs='?', const='new', choices=['new', 'resume'],
+                        help='scrape through the durable work queue with --jobs worker '
+                             'processes; "resume" continues the previous crawl')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    stages = args.stages or DEFAULT_STAGES
+    if 'all' in stages:
+        stages = [stage for stage in STAGES if stage != 'dashboard']
+
+    try:
+        runner = PipelineRunner(args)
+    except ConfigError as e:
+        build_parser().error(str(e))
+
+    logging.basicConfig(
+        filename='gallbladder.log',
+        level=runner.config.app.logging_level,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.profile:
+        instrumentation.configure(profiler=args.profile)
+    try:
+        runner.run(stages)
+    except ValidationError as e:
+        # Bad input stops the run before any downstream work
+        print(f"Validation failed: {e} ({VALIDATION_DIR}/{e.report['dataset']}.json)",
+              file=sys.stderr)
+        sys.exit(2)
+
+
+def _single_stage(stage: str):
+    main([stage] + sys.argv[1:])
+
+
+def scrape():
+    _single_stage('scrape')
+
+
+def process():
+    _single_stage('process')
+
+
+def analyze():
+    _single_stage('analyze')
+
+
+def dashboard():
+    _single_stage('dashboard')
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,97 @@
-import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
-import plotly.express as px
-import plotly.graph_objs as go
-from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import json
 import logging
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 import os
 import base64
+from collections import OrderedDict
 from io import BytesIO
+from typing import Optional
+
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .data_lake import DataLake, read_processed
+except ImportError:
+    from data_lake import DataLake, read_processed
+
+try:
+    from .query_engine import QueryEngine
+except ImportError:
+    from query_engine import QueryEngine
+
+try:
+    from .results_store import AnalysisResultsStore
+except ImportError:
+    from results_store import AnalysisResultsStore
+
+try:
+    from .settings import Config, load_config
+except ImportError:
+    from settings import Config, load_config
+
+try:
+    from .sketches import DatasetSummary, sketch_path
+except ImportError:
+    from sketches import DatasetSummary, sketch_path
+
+# Plotly templates for the dashboard.theme setting
+THEME_TEMPLATES = {'light': 'plotly_white', 'dark': 'plotly_dark'}
 
 class GallbladderDashboard:
-    def __init__(self):
+    def __init__(self, processed_data=None, analysis_results=None, config: Optional[Config] = None):
+        self.config = config or load_config()
+        
         # Set up logging
         logging.basicConfig(
             filename='dashboard.log',
-            level=logging.INFO,
+            level=self.config.app.logging_level,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
-        # Initialize data containers
+        # Chart figures for recent filter selections, least recently used first
+        self.chart_cache = OrderedDict()
+        
+        # Initialize data containers; data already in memory skips the reload
         self.processed_data = {}
         self.analysis_results = {}
-        self.load_data()
+        self.results_store = AnalysisResultsStore()
+        self.lake = DataLake(layout=self.config.processing.layout)
+        self.query_engine = QueryEngine(self.config.performance.query_engine,
+                                        self.config.performance.workers, self.lake)
+        if processed_data is not None and analysis_results is not None:
+            self.processed_data = dict(processed_data)
+            self.analysis_results = analysis_results
+        else:
+            self.load_data()
+        self.summaries = self.load_summaries()
         
         # Initialize Dash app
+        import dash
         self.app = dash.Dash(__name__)
         self.setup_layout()
         self.setup_callbacks()
 
+    @instrumented(rows_out=lambda self, _: sum(len(df) for df in self.processed_data.values()))
     def load_data(self):
         """
         Load processed data and analysis results
         """
         try:
             # Load processed data
-            for dataset in ['pubmed', 'hospital', 'statistics', 'analysis']:
-                self.processed_data[dataset] = pd.read_csv(
-                    f'data/processed_data/{dataset}_processed.csv'
-                )
+            for dataset in ['pubmed', 'hospital', 'statistics']:
+                self.processed_data[dataset] = read_processed(dataset, lake=self.lake)
+            
+            # Only the precomputed cluster columns are needed from the analysis rows
+            self.processed_data['analysis'] = self.results_store.read_rows(
+                columns=['surgery_count', 'mean_value', 'cluster_label', 'pca_1', 'pca_2']
+            )
             
-            # Load analysis results
-            with open('data/analysis_results/analysis_results.json', 'r') as f:
-                self.analysis_results = json.load(f)
+            # Load analysis results; arrays are read on first use
+            self.analysis_results = self.results_store.load_results()
                 
             logging.info("Data loaded successfully")
             
@@ -57,10 +99,46 @@ class GallbladderDashboard:
             logging.error(f"Error loading data: {str(e)}")
             raise
 
+    def load_summaries(self):
+        """
+        Load the summary sketches persisted by the analyzer, where present
+        """
+        summaries = {}
+        for dataset in ['hospital', 'statistics', 'analysis']:
+            path = sketch_path(dataset)
+            if os.path.exists(path):
+                summaries[dataset] = DatasetSummary.load(path)
+        return summaries
+
+    def create_summary_table(self, dataset: str = 'hospital'):
+        """
+        Table of the persisted summary statistics for one dataset
+        """
+        from dash import html
+
+        summary = self.summaries.get(dataset)
+        if summary is None:
+            return html.P("No summary available; run the analyze stage first.")
+        
+        stats = summary.describe()
+        unique = summary.unique_values()
+        header = ['Column', 'Count', 'Mean', 'Std', 'Median', 'Distinct', 'Missing']
+        rows = [
+            [column, f"{s['count']:,.0f}", f"{s['mean']:.2f}", f"{s['std']:.2f}",
+             f"{s['50%']:.2f}", f"~{unique[column]:,}", f"{summary.missing[column]:,}"]
+            for column, s in stats.items()
+        ]
+        return html.Table(
+            [html.Tr([html.Th(cell) for cell in header])] +
+            [html.Tr([html.Td(cell) for cell in row]) for row in rows]
+        )
+
     def setup_layout(self):
         """
         Set up the dashboard layout
         """
+        from dash import dcc, html
+
         self.app.layout = html.Div([
             # Header
             html.Div([
@@ -92,6 +170,12 @@ class GallbladderDashboard:
                 
                 # Main charts area
                 html.Div([
+                    # Summary statistics from the persisted sketches
+                    html.Div([
+                        html.H3("Data Summary"),
+                        self.create_summary_table()
+                    ]),
+                    
                     # Temporal Analysis
                     html.Div([
                         html.H3("Temporal Analysis"),
@@ -130,6 +214,8 @@ class GallbladderDashboard:
         """
         Set up interactive callbacks
         """
+        from dash.dependencies import Input, Output
+
         @self.app.callback(
             [Output('temporal-chart', 'figure'),
              Output('geographical-chart', 'figure'),
@@ -140,12 +226,7 @@ class GallbladderDashboard:
              Input('date-range', 'end_date')]
         )
         def update_charts(locations, start_date, end_date):
-            return (
-                self.create_temporal_chart(locations, start_date, end_date),
-                self.create_geographical_chart(locations),
-                self.create_correlation_chart(),
-                self.create_cluster_chart()
-            )
+            return self.cached_charts(locations, start_date, end_date)
         
         @self.app.callback(
             Output('report-status', 'children'),
@@ -160,11 +241,63 @@ class GallbladderDashboard:
                     return f"Error generating report: {str(e)}"
             return ""
 
+    def cached_charts(self, locations, start_date, end_date):
+        """
+        All dashboard figures for one filter selection, reusing recent results
+        """
+        key = (tuple(sorted(locations or [])), str(start_date), str(end_date))
+        if key in self.chart_cache:
+            self.chart_cache.move_to_end(key)
+            return self.chart_cache[key]
+
+        charts = (
+            self.create_temporal_chart(locations, start_date, end_date),
+            self.create_geographical_chart(locations),
+            self.create_correlation_chart(),
+            self.create_cluster_chart()
+        )
+        cache_size = self.config.performance.cache_size
+        if cache_size:
+            self.chart_cache[key] = charts
+            while len(self.chart_cache) > cache_size:
+                self.chart_cache.popitem(last=False)
+        return charts
+
+    def _styled(self, fig, chart: str):
+        """
+        Apply the configured theme and size for `chart`
+        """
+        size = self.config.dashboard.chart(chart)
+        fig.update_layout(
+            template=THEME_TEMPLATES[self.config.dashboard.theme],
+            height=size.height,
+            width=size.width
+        )
+        return fig
+
+    def hospital_window(self, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        Hospital rows dated within the selected range; read from only the
+        overlapping lake partitions when the dataset is partitioned
+        """
+        if self.lake.serves('hospital'):
+            return self.lake.read('hospital', start_date, end_date,
+                                  columns=['date', 'surgery_count', 'location'])
+        df = self.processed_data['hospital']
+        if start_date is not None:
+            df = df[df['date'] >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            df = df[df['date'] <= pd.Timestamp(end_date)]
+        return df
+
+    @instrumented(rows_in=lambda self: len(self.processed_data['hospital']))
     def create_temporal_chart(self, locations, start_date, end_date):
         """
         Create temporal analysis chart
         """
-        df = self.processed_data['hospital']
+        import plotly.graph_objs as go
+
+        df = self.hospital_window(start_date, end_date)
         if locations:
             df = df[df['location'].isin(locations)]
         
@@ -182,27 +315,55 @@ class GallbladderDashboard:
             yaxis_title='Number of Surgeries'
         )
         
-        return fig
+        return self._styled(fig, 'temporal')
 
+    @instrumented(rows_in=lambda self: len(self.processed_data['hospital']))
     def create_geographical_chart(self, locations):
         """
         Create geographical analysis chart
         """
-        df = self.processed_data['hospital']
+        import plotly.graph_objs as go
+
+        # Quartiles per location, queried in place when the data is partitioned
+        source = 'hospital' if self.lake.serves('hospital') else self.processed_data['hospital']
+        boxes = self.query_engine.boxes(
+            source, ['location'], 'surgery_count',
+            filters={'location': locations or []}
+        )
+        outliers = boxes[['location', 'outliers']].explode('outliers').dropna()
         
-        fig = px.box(
-            df,
-            x='location',
-            y='surgery_count',
-            title='Surgery Distribution by Location'
+        fig = go.Figure([
+            go.Box(
+                x=boxes['location'].astype(str),
+                q1=boxes['q1'],
+                median=boxes['median'],
+                q3=boxes['q3'],
+                lowerfence=boxes['lower_fence'],
+                upperfence=boxes['upper_fence'],
+                name='surgery_count'
+            ),
+            go.Scatter(
+                x=outliers['location'].astype(str),
+                y=outliers['outliers'],
+                mode='markers',
+                name='outliers'
+            )
+        ])
+        fig.update_layout(
+            title='Surgery Distribution by Location',
+            xaxis_title='location',
+            yaxis_title='surgery_count'
         )
         
-        return fig
+        return self._styled(fig, 'geographical')
 
+    @instrumented()
     def create_correlation_chart(self):
         """
         Create correlation analysis chart
         """
+        import plotly.express as px
+
         corr_matrix = pd.DataFrame(self.analysis_results['correlation']['correlation_matrix'])
         
         fig = px.imshow(
@@ -211,28 +372,38 @@ class GallbladderDashboard:
             color_continuous_scale='RdBu'
         )
         
-        return fig
+        return self._styled(fig, 'correlation')
 
+    @instrumented(rows_in=lambda self: len(self.processed_data['analysis']))
     def create_cluster_chart(self):
         """
         Create cluster analysis chart
         """
-        clusters = self.analysis_results['clustering']
+        import plotly.express as px
+
+        df = self.processed_data['analysis']
         
         fig = px.scatter(
-            self.processed_data['analysis'],
-            x='surgery_count',
-            y='mean_value',
-            color='cluster_labels',
-            title='Cluster Analysis'
+            df,
+            x='pca_1',
+            y='pca_2',
+            color=df['cluster_label'].astype(str),
+            hover_data=['surgery_count', 'mean_value'],
+            labels={'pca_1': 'PC 1', 'pca_2': 'PC 2', 'color': 'Cluster'},
+            title='Cluster Analysis (PCA)'
         )
         
-        return fig
+        return self._styled(fig, 'cluster')
 
+    @instrumented()
     def create_pdf_report(self):
         """
         Generate PDF report with analysis results
         """
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+        from reportlab.lib.styles import getSampleStyleSheet
+
         doc = SimpleDocTemplate(
             "data/analysis_results/gallbladder_analysis_report.pdf",
             pagesize=letter
@@ -278,7 +449,7 @@ def main():
     dashboard = GallbladderDashboard()
     
     # Run server
-    dashboard.app.run_server(debug=True)
+    dashboard.app.run_server(debug=dashboard.config.app.debug)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,315 @@
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+
+try:
+    from .schema import apply_schema, iter_dataset, processed_path, read_dataset
+except ImportError:
+    from schema import apply_schema, iter_dataset, processed_path, read_dataset
+
+LAKE_DIR = 'data/lake'
+MANIFEST = '_manifest.json'
+# Partition for rows without a date; skipped by date-bounded reads
+UNDATED = 'undated'
+# Partition directory of a dated row, relative to its source directory
+PARTITION_FORMAT = 'year=%Y/month=%m'
+
+
+class DataLake:
+    """
+    Datasets stored as Parquet parts partitioned by source (the dataset
+    name), year and month of their `date` column:
+
+        data/lake/source=hospital/year=2019/month=03/part-00000.parquet
+
+    Each source has a manifest listing its partitions with row counts and
+    date bounds, so date-bounded reads open only the partitions they need.
+    `source=<dataset>` is a symlink to a versioned directory: writes build
+    a new version and switch the link in one rename, so readers see the old
+    or the new dataset, never a half-written or missing one. `layout` is the configured
+    processing.layout, which decides whether processed datasets are read
+    from the lake or from their flat files.
+    """
+
+    def __init__(self, base_dir: str = LAKE_DIR, layout: str = 'partitioned'):
+        self.base_dir = base_dir
+        self.layout = layout
+
+    def source_dir(self, dataset: str) -> str:
+        return os.path.join(self.base_dir, f'source={dataset}')
+
+    def manifest(self, dataset: str) -> Optional[Dict]:
+        path = os.path.join(self.source_dir(dataset), MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def has(self, dataset: str) -> bool:
+        return self.manifest(dataset) is not None
+
+    def serves(self, dataset: str) -> bool:
+        """
+        Whether processed `dataset` is read from the lake: under the
+        partitioned layout whenever it is there, under the flat layout only
+        when it has no flat file
+        """
+        return self.has(dataset) and (self.layout == 'partitioned'
+                                      or not os.path.exists(processed_path(dataset)))
+
+    def drop(self, dataset: str):
+        """
+        Remove `dataset` from the lake, e.g. once a flat write supersedes it
+        """
+        target = self.source_dir(dataset)
+        if os.path.islink(target):
+            version = os.path.realpath(target)
+            os.remove(target)
+            shutil.rmtree(version, ignore_errors=True)
+        else:
+            shutil.rmtree(target, ignore_errors=True)
+
+    def is_current(self, dataset: str, source_file: str) -> bool:
+        """
+        Whether the dataset was ingested from `source_file` as it is now
+        """
+        manifest = self.manifest(dataset)
+        return (manifest is not None and os.path.exists(source_file)
+                and manifest.get('source_file') == source_file
+                and manifest.get('source_stat') == _file_stat(source_file))
+
+    def partitions(self, dataset: str, start=None, end=None) -> List[Dict]:
+        """
+        Manifest entries of the partitions that can hold rows dated within
+        [start, end]; all partitions without bounds
+        """
+        manifest = self.manifest(dataset)
+        if manifest is None:
+            raise FileNotFoundError(f"No dataset {dataset!r} in {self.base_dir}")
+        if start is None and end is None:
+            return manifest['partitions']
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        return [
+            partition for partition in manifest['partitions']
+            if partition['key'] != UNDATED
+            and (start is None or pd.Timestamp(partition['max_date']) >= start)
+            and (end is None or pd.Timestamp(partition['min_date']) <= end)
+        ]
+
+    def read(self, dataset: str, start=None, end=None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Rows of `dataset` dated within [start, end], reading only the
+        partitions that overlap it; `columns` limits what is read
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        partitions = self.partitions(dataset, start, end)
+        read_columns = columns
+        if columns is not None and (start is not None or end is not None) and 'date' not in columns:
+            read_columns = list(columns) + ['date']
+        tables = [
+            pq.read_table(os.path.join(self.source_dir(dataset), partition['key'], name),
+                          columns=read_columns)
+            for partition in partitions for name in partition['files']
+        ]
+        if not tables:
+            manifest = self.manifest(dataset)
+            empty = pd.DataFrame(columns=read_columns or manifest['columns'])
+            return apply_schema(empty, dataset)[columns or manifest['columns']]
+
+        df = pa.concat_tables(tables, promote_options='default').to_pandas()
+        if start is not None:
+            df = df[df['date'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['date'] <= pd.Timestamp(end)]
+        if columns is not None:
+            df = df[columns]
+        return apply_schema(df.reset_index(drop=True), dataset)
+
+    def _read_partition(self, dataset: str, partition: Dict) -> pd.DataFrame:
+        directory = os.path.join(self.source_dir(dataset), partition['key'])
+        return pd.concat([pd.read_parquet(os.path.join(directory, name)) for name in partition['files']],
+                         ignore_index=True)
+
+    def _keep_partition(self, dataset: str, partition: Dict, staging: str,
+                        partitions: Dict[str, Dict]):
+        # Hard-link an existing partition's parts into the staged directory
+        source = os.path.join(self.source_dir(dataset), partition['key'])
+        os.makedirs(os.path.join(staging, partition['key']), exist_ok=True)
+        for name in partition['files']:
+            os.link(os.path.join(source, name),
+                    os.path.join(staging, partition['key'], f'kept-{name}'))
+        entry = partitions.setdefault(partition['key'], {
+            'key': partition['key'], 'files': [], 'rows': 0,
+            'min_date': None, 'max_date': None
+        })
+        entry['files'] = [f'kept-{name}' for name in partition['files']] + entry['files']
+        entry['rows'] += partition['rows']
+        if partition['key'] != UNDATED:
+            entry['min_date'] = min(filter(None, [entry['min_date'], partition['min_date']]))
+            entry['max_date'] = max(filter(None, [entry['max_date'], partition['max_date']]))
+
+    def _write_parts(self, staging: str, chunks: Iterable[pd.DataFrame],
+                     partitions: Dict[str, Dict], prefix: str = 'part') -> List[str]:
+        columns = []
+        for index, chunk in enumerate(chunks):
+            columns = columns or list(chunk.columns)
+            if chunk.empty:
+                continue
+            # Raw files hold dates as text; unparseable ones count as undated
+            dates = pd.to_datetime(chunk['date'], errors='coerce') if 'date' in chunk.columns else None
+            if dates is None or dates.isna().all():
+                groups = [(UNDATED, chunk)]
+            else:
+                keys = dates.dt.strftime(PARTITION_FORMAT).fillna(UNDATED)
+                groups = chunk.groupby(keys, sort=True)
+            for key, rows in groups:
+                directory = os.path.join(staging, key)
+                os.makedirs(directory, exist_ok=True)
+                name = f'{prefix}-{index:05d}.parquet'
+                rows.to_parquet(os.path.join(directory, name), index=False)
+                entry = partitions.setdefault(key, {'key': key, 'files': [], 'rows': 0,
+                                                    'min_date': None, 'max_date': None})
+                entry['files'].append(name)
+                entry['rows'] += len(rows)
+                if key != UNDATED:
+                    low, high = dates[rows.index].min(), dates[rows.index].max()
+                    entry['min_date'] = min(filter(None, [entry['min_date'], low.isoformat()]))
+                    entry['max_date'] = max(filter(None, [entry['max_date'], high.isoformat()]))
+        return columns
+
+    def write(self, dataset: str, chunks: Iterable[pd.DataFrame], since=None,
+              source_file: Optional[str] = None) -> Dict:
+        """
+        Write `dataset` from an iterable of frames and return its manifest.
+
+        With `since`, only rows dated on or after it are replaced: earlier
+        partitions are kept as they are (hard-linked, not copied) and the
+        partition holding the cutoff keeps its earlier rows. Undated rows
+        are kept too unless the new data brings undated rows of its own.
+        """
+        target = self.source_dir(dataset)
+        staging = f'{target}.{time.time_ns()}'
+        os.makedirs(staging)
+
+        partitions: Dict[str, Dict] = {}
+        columns = self._write_parts(staging, chunks, partitions)
+        previous = self.manifest(dataset) if since is not None else None
+        if previous is not None:
+            since = pd.Timestamp(since)
+            for partition in previous['partitions']:
+                if partition['key'] == UNDATED:
+                    # Undated rows cannot fall after the cutoff; keep them
+                    # unless the new data replaces them
+                    if UNDATED not in partitions:
+                        self._keep_partition(dataset, partition, staging, partitions)
+                elif pd.Timestamp(partition['min_date']) >= since:
+                    continue
+                elif pd.Timestamp(partition['max_date']) < since:
+                    # Entirely before the cutoff: keep the existing parts
+                    self._keep_partition(dataset, partition, staging, partitions)
+                else:
+                    # Straddles the cutoff: keep its rows before it
+                    kept = self._read_partition(dataset, partition)
+                    kept = kept[pd.to_datetime(kept['date'], errors='coerce') < since]
+                    self._write_parts(staging, [kept], partitions, prefix='kept')
+            columns = columns or previous['columns']
+
+        manifest = {
+            'dataset': dataset,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'columns': columns,
+            'rows': sum(partition['rows'] for partition in partitions.values()),
+            'partitions': [partitions[key] for key in sorted(partitions)]
+        }
+        if source_file is not None:
+            manifest.update(source_file=source_file, source_stat=_file_stat(source_file))
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        switch_directory(target, staging)
+        logging.info(f"Wrote {manifest['rows']} rows of {dataset} in "
+                     f"{len(manifest['partitions'])} partitions")
+        return manifest
+
+    def ingest(self, path: str, dataset: str, chunk_size: int = 1_000_000) -> Dict:
+        """
+        Partition a CSV or Parquet file in bounded-memory chunks
+        """
+        return self.write(dataset, iter_dataset(path, dataset, chunk_size), source_file=path)
+
+
+def _file_stat(path: str) -> List[int]:
+    # Exact modification time and size; float mtimes do not round-trip
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def switch_directory(target: str, version: str):
+    """
+    Point the `target` symlink at the `version` directory beside it in one
+    rename, then remove the other versions, including those of interrupted
+    writes
+    """
+    link = f'{version}.link'
+    os.symlink(os.path.basename(version), link)
+    if os.path.isdir(target) and not os.path.islink(target):
+        # Written before versioned writes; the only switch with a gap
+        shutil.rmtree(target)
+    os.replace(link, target)
+    for path in glob.glob(f'{glob.escape(target)}.*'):
+        if path == version:
+            continue
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def read_processed(dataset: str, start=None, end=None, columns: Optional[List[str]] = None,
+                   lake: Optional[DataLake] = None) -> pd.DataFrame:
+    """
+    A processed dataset from the data lake or the flat processed file, as
+    chosen by the lake's layout (see DataLake.serves); either way limited
+    to rows dated within [start, end] and to `columns`
+    """
+    lake = lake or DataLake()
+    if lake.serves(dataset):
+        return lake.read(dataset, start, end, columns)
+
+    path = processed_path(dataset)
+    usecols = columns
+    if columns is not None and (start is not None or end is not None) and 'date' not in columns:
+        usecols = list(columns) + ['date']
+    df = read_dataset(path, dataset, **({'usecols': usecols} if usecols is not None else {}))
+    if start is not None:
+        df = df[df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['date'] <= pd.Timestamp(end)]
+    return df[columns] if columns is not None else df
+
+
+def read_window(path: str, dataset: str, start=None, end=None,
+                columns: Optional[List[str]] = None,
+                lake: Optional[DataLake] = None) -> pd.DataFrame:
+    """
+    Rows of a raw CSV or Parquet file dated within [start, end]. Bounded
+    reads partition the file into the lake on first use (and again when it
+    changes), so later windows open only the months they cover.
+    """
+    if start is None and end is None:
+        return read_dataset(path, dataset, **({'usecols': columns} if columns is not None else {}))
+    lake = lake or DataLake()
+    if not lake.is_current(dataset, path):
+        logging.info(f"Partitioning {path} into {lake.source_dir(dataset)}")
+        lake.ingest(path, dataset)
+    return lake.read(dataset, start, end, columns)
@@ -4,33 +4,108 @@ from datetime import datetime
 import json
 import os
 import logging
-from sklearn.preprocessing import StandardScaler
 import re
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .schema import PROCESSED_FORMATS, apply_schema, processed_path, read_dataset
+    from .data_lake import DataLake, read_processed
+except ImportError:
+    from schema import PROCESSED_FORMATS, apply_schema, processed_path, read_dataset
+    from data_lake import DataLake, read_processed
+
+try:
+    from .settings import Config, load_config
+except ImportError:
+    from settings import Config, load_config
+
+try:
+    from .cleaning import flag_outliers, group_statistics, impute
+except ImportError:
+    from cleaning import flag_outliers, group_statistics, impute
+
+try:
+    from .time_features import DEFAULT_FEATURES, build_calendar, date_keys, join_calendar
+except ImportError:
+    from time_features import DEFAULT_FEATURES, build_calendar, date_keys, join_calendar
+
+try:
+    from .joins import KeyIndex
+except ImportError:
+    from joins import KeyIndex
+
+try:
+    from .preprocessing import ANALYSIS_FEATURES, load_or_fit
+except ImportError:
+    from preprocessing import ANALYSIS_FEATURES, load_or_fit
+
+try:
+    from .validation import rules_for, validate_file
+except ImportError:
+    from validation import rules_for, validate_file
+
+# Calendar attributes joined onto each processed dataset; PubMed dates are yearly
+TIME_FEATURES = {
+    'pubmed': ['year'],
+    'hospital': DEFAULT_FEATURES,
+    'statistics': ['year', 'month']
+}
+
 class GallbladderDataProcessor:
-    def __init__(self):
+    def __init__(self, output_format=None, since=None, config: Optional[Config] = None):
+        self.config = config or load_config()
+        
         # Set up logging
         logging.basicConfig(
             filename='data_processing.log',
-            level=logging.INFO,
+            level=self.config.app.logging_level,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
         # Create directories if they don't exist
         os.makedirs('data/processed_data', exist_ok=True)
         
+        # Output format ('csv' or 'parquet') and optional incremental cutoff
+        self.output_format = output_format or self.config.processing.output_format
+        self.since = pd.Timestamp(since) if since is not None else None
+        self.layout = self.config.processing.layout
+        
         # Initialize data containers
         self.raw_data = {}
         self.processed_data = {}
         self.metadata = {
             'processing_date': datetime.now().strftime('%Y-%m-%d'),
             'data_quality_metrics': {},
+            'outliers': {},
             'processing_steps': []
         }
+        
+        # Group statistics per dataset and column, reused across chunks
+        self.group_stats = {}
+        
+        # Sorted join indexes over the side datasets, built while cleaning them
+        self.join_indexes = {}
+        
+        # Surgeries per location over the full history after imputation, so
+        # rates do not depend on the incremental cutoff
+        self.location_totals = None
+
+    def _since(self, df):
+        """
+        Keep only rows dated on or after the incremental cutoff, if any
+        """
+        if self.since is None or 'date' not in df.columns:
+            return df
+        return df[df['date'] >= self.since]
 
+    @instrumented(rows_out=lambda self, _: sum(len(df) for k, df in self.raw_data.items() if k != 'combined'))
     def load_raw_data(self):
         """
         Load all raw data from different sources
@@ -42,10 +117,16 @@ class GallbladderDataProcessor:
             with open('data/raw_data/combined_data.json', 'r') as f:
                 self.raw_data['combined'] = json.load(f)
             
-            # Load individual CSV files
-            self.raw_data['pubmed'] = pd.read_csv('data/raw_data/pubmed_data.csv')
-            self.raw_data['hospital'] = pd.read_csv('data/raw_data/hospital_data.csv')
-            self.raw_data['statistics'] = pd.read_csv('data/raw_data/medical_statistics.csv')
+            # Load individual CSV files, rejecting bad scraper output up front
+            raw_files = {
+                'pubmed': ('data/raw_data/pubmed_data.csv', 'pubmed_raw'),
+                'hospital': ('data/raw_data/hospital_data.csv', 'hospital_raw'),
+                'statistics': ('data/raw_data/medical_statistics.csv', 'statistics_raw')
+            }
+            if self.config.processing.validate_inputs:
+                self.validate_raw_data(raw_files)
+            for name, (path, dataset) in raw_files.items():
+                self.raw_data[name] = read_dataset(path, dataset)
             
             logging.info("Raw data loaded successfully")
             self.metadata['processing_steps'].append('raw_data_loaded')
@@ -54,6 +135,22 @@ class GallbladderDataProcessor:
             logging.error(f"Error loading raw data: {str(e)}")
             raise
 
+    def validate_raw_data(self, raw_files: Dict[str, tuple]):
+        """
+        Stream each raw file through its validation rules; the first file with
+        an error stops the run with ValidationError before anything is loaded
+        """
+        self.metadata['validation'] = {}
+        for name, (path, dataset) in raw_files.items():
+            report = validate_file(path, dataset, rules_for(dataset, self.config),
+                                   chunk_size=self.config.performance.chunk_size)
+            self.metadata['validation'][name] = {
+                'rows_checked': report['rows_checked'],
+                'warnings': report['warnings']
+            }
+
+    @instrumented(rows_in=lambda self: len(self.raw_data['pubmed']),
+                  rows_out=lambda self, _: len(self.processed_data['pubmed']))
     def clean_pubmed_data(self):
         """
         Clean and process PubMed data
@@ -71,9 +168,14 @@ class GallbladderDataProcessor:
             df['first_author'] = df['authors'].apply(lambda x: x.split(',')[0] if pd.notnull(x) else None)
             
             # Remove duplicates
-            df = df.drop_duplicates(subset=['title'])
-            
-            self.processed_data['pubmed'] = df
+            if self.config.processing.clean_data.remove_duplicates:
+                if 'pmid' in df.columns:
+                    df = df[df['pmid'].isna() | ~df.duplicated('pmid')]
+                df = df.drop_duplicates(subset=['title'])
+            
+            df = apply_schema(df, 'pubmed')
+            self._build_join_index('pubmed', df)
+            self.processed_data['pubmed'] = self._since(df)
             logging.info("PubMed data cleaned successfully")
             self.metadata['processing_steps'].append('pubmed_data_cleaned')
             
@@ -81,6 +183,8 @@ class GallbladderDataProcessor:
             logging.error(f"Error cleaning PubMed data: {str(e)}")
             raise
 
+    @instrumented(rows_in=lambda self: len(self.raw_data['hospital']),
+                  rows_out=lambda self, _: len(self.processed_data['hospital']))
     def clean_hospital_data(self):
         """
         Clean and process hospital data
@@ -103,9 +207,12 @@ class GallbladderDataProcessor:
             df['location'] = df['location'].str.strip().str.title()
             
             # Remove duplicates
-            df = df.drop_duplicates(subset=['hospital_name', 'date'])
+            if self.config.processing.clean_data.remove_duplicates:
+                df = df.drop_duplicates(subset=['hospital_name', 'date'])
             
-            self.processed_data['hospital'] = df
+            # The incremental cutoff is applied after imputation, which
+            # draws its group statistics from the full history
+            self.processed_data['hospital'] = apply_schema(df, 'hospital')
             logging.info("Hospital data cleaned successfully")
             self.metadata['processing_steps'].append('hospital_data_cleaned')
             
@@ -113,6 +220,8 @@ class GallbladderDataProcessor:
             logging.error(f"Error cleaning hospital data: {str(e)}")
             raise
 
+    @instrumented(rows_in=lambda self: len(self.raw_data['statistics']),
+                  rows_out=lambda self, _: len(self.processed_data['statistics']))
     def process_statistics_data(self):
         """
         Process medical statistics data
@@ -120,23 +229,17 @@ class GallbladderDataProcessor:
         try:
             df = self.raw_data['statistics'].copy()
             
-            # Parse and structure the data field
-            def parse_statistics(data_str):
-                try:
-                    # Extract numeric values and their descriptions
-                    matches = re.findall(r'(\d+(?:\.\d+)?)\s*(?:percent|%|\b)', data_str)
-                    return [float(x) for x in matches]
-                except:
-                    return None
-            
-            df['parsed_values'] = df['data'].apply(parse_statistics)
-            
-            # Calculate basic statistics
-            df['mean_value'] = df['parsed_values'].apply(
-                lambda x: np.mean(x) if isinstance(x, list) and len(x) > 0 else None
-            )
-            
-            self.processed_data['statistics'] = df
+            if 'value' in df.columns:
+                # The scraper reads tables into one typed value per metric
+                df['mean_value'] = df['value']
+            else:
+                # Older scrapes stored the page text; average the numbers in it
+                numbers = df['data'].str.extractall(r'(\d+(?:\.\d+)?)')[0].astype('float64')
+                df['mean_value'] = numbers.groupby(level=0).mean().reindex(df.index)
+            
+            df = apply_schema(df, 'statistics')
+            self._build_join_index('statistics', df)
+            self.processed_data['statistics'] = self._since(df)
             logging.info("Statistics data processed successfully")
             self.metadata['processing_steps'].append('statistics_data_processed')
             
@@ -144,6 +247,95 @@ class GallbladderDataProcessor:
             logging.error(f"Error processing statistics data: {str(e)}")
             raise
 
+    def _impute_and_flag(self, df: pd.DataFrame, columns: List[str], dataset: str,
+                         flag: bool = True) -> pd.DataFrame:
+        """
+        Flag outliers and impute gaps in `columns` within the configured groups.
+
+        Group statistics are computed once per column and level and kept in
+        `group_stats`; flagging and imputation then run vectorized over `df`.
+        """
+        clean = self.config.processing.clean_data
+        keys = [key for key in clean.group_by if key in df.columns]
+        
+        for column in columns:
+            # One level per grouping key, then the global fallback
+            levels = [
+                (by, group_statistics(df, column, by))
+                for by in [[key] for key in keys] + [[]]
+            ]
+            self.group_stats.setdefault(dataset, {})[column] = levels
+            
+            if flag:
+                by, stats = levels[0]
+                df[f'{column}_outlier'] = flag_outliers(df, column, stats, by,
+                                                        clean.outlier_method, clean.outlier_threshold)
+                self.metadata['outliers'].setdefault(dataset, {})[column] = int(
+                    df[f'{column}_outlier'].sum()
+                )
+            df[column] = impute(df, column, levels, clean.handle_missing).to_numpy()
+        
+        if clean.handle_missing == 'drop':
+            df = df.dropna(subset=columns)
+        return df
+
+    @instrumented(rows_in=lambda self: len(self.processed_data['hospital']),
+                  rows_out=lambda self, _: len(self.processed_data['hospital']))
+    def handle_outliers_and_missing(self):
+        """
+        Flag outlying surgery counts and impute missing ones by hospital and
+        location, from statistics over the full history; with an incremental
+        cutoff, only the rows on or after it are kept afterwards
+        """
+        try:
+            df = self._impute_and_flag(self.processed_data['hospital'].copy(), ['surgery_count'], 'hospital')
+            df = apply_schema(df, 'hospital')
+            
+            # Rate denominators include the imputed counts, over the full history
+            self.location_totals = df.groupby('location', observed=True)['surgery_count'].sum()
+            self.processed_data['hospital'] = self._since(df)
+            logging.info(f"Outliers flagged: {self.metadata['outliers'].get('hospital', {})}")
+            self.metadata['processing_steps'].append('outliers_and_missing_handled')
+            
+        except Exception as e:
+            logging.error(f"Error handling outliers and missing values: {str(e)}")
+            raise
+
+    @instrumented(rows_in=lambda self: sum(len(self.processed_data[name]) for name in TIME_FEATURES
+                                           if name in self.processed_data))
+    def create_time_features(self):
+        """
+        Join a precomputed calendar dimension onto each dataset by integer date key
+        """
+        try:
+            features = self.config.processing.feature_engineering
+            if not features.create_time_features:
+                logging.info("Time features disabled in config")
+                return
+            
+            datasets = [name for name in TIME_FEATURES if name in self.processed_data]
+            dates = pd.concat([self.processed_data[name]['date'].dropna() for name in datasets])
+            if dates.empty:
+                logging.warning("No dates found; skipping time features")
+                return
+            
+            # One calendar row per day, built once and shared by every dataset
+            calendar = build_calendar(dates.min(), dates.max(),
+                                      features.fiscal_year_start_month,
+                                      features.holiday_calendar)
+            for name in datasets:
+                df = join_calendar(self.processed_data[name].copy(), calendar, TIME_FEATURES[name])
+                self.processed_data[name] = apply_schema(df, name)
+            self.processed_data['calendar'] = apply_schema(calendar, 'calendar')
+            
+            logging.info(f"Time features created for {datasets} over {len(calendar)} days")
+            self.metadata['processing_steps'].append('time_features_created')
+            
+        except Exception as e:
+            logging.error(f"Error creating time features: {str(e)}")
+            raise
+
+    @instrumented(rows_in=lambda self: sum(len(df) for df in self.processed_data.values()))
     def calculate_data_quality_metrics(self):
         """
         Calculate data quality metrics for all processed datasets
@@ -152,10 +344,16 @@ class GallbladderDataProcessor:
             metrics = {}
             
             for dataset_name, df in self.processed_data.items():
+                # List-valued columns cannot be hashed
+                hashable = [
+                    column for column in df.columns
+                    if df[column].dtype != object
+                    or not df[column].map(lambda v: isinstance(v, list)).any()
+                ]
                 metrics[dataset_name] = {
-                    'completeness': (1 - df.isnull().sum() / len(df)).mean(),
+                    'completeness': float((1 - df.isnull().sum() / len(df)).mean()),
                     'record_count': len(df),
-                    'duplicate_rate': 1 - len(df.drop_duplicates()) / len(df),
+                    'duplicate_rate': float(df.duplicated(subset=hashable).mean()),
                     'columns': list(df.columns)
                 }
             
@@ -167,40 +365,93 @@ class GallbladderDataProcessor:
             logging.error(f"Error calculating data quality metrics: {str(e)}")
             raise
 
+    @staticmethod
+    def _date_keys(df: pd.DataFrame) -> pd.Series:
+        """
+        Integer date keys, reusing the persisted time features when present
+        """
+        if 'date_key' in df.columns:
+            return df['date_key']
+        return pd.Series(date_keys(df['date']), index=df.index)
+
+    def _build_join_index(self, name: str, df: pd.DataFrame) -> KeyIndex:
+        """
+        Sorted key index over the aggregated `name` dataset. The cleaning
+        stages build it from the full history before the incremental cutoff
+        is applied, so rows in the window still join earlier publication
+        years and statistics snapshots.
+        """
+        if name == 'statistics':
+            # One row per snapshot date: mean value across sources
+            snapshots = df.assign(date_key=self._date_keys(df)).groupby('date_key').agg(
+                mean_value=('mean_value', 'mean'),
+                statistics_sources=('source', 'nunique')
+            )
+            index = KeyIndex(snapshots.index, snapshots.reset_index(drop=True))
+        elif name == 'pubmed':
+            # Publications per year; years inside the scraped range without
+            # any publication count as zero
+            years = (df['year'] if 'year' in df.columns else df['date'].dt.year).dropna().astype('int64')
+            counts = years.value_counts()
+            if not counts.empty:
+                counts = counts.reindex(range(counts.index.min(), counts.index.max() + 1), fill_value=0)
+            index = KeyIndex(counts.index, pd.DataFrame({'publication_count': counts.to_numpy()}))
+        else:
+            raise KeyError(f"No join index defined for {name}")
+        self.join_indexes[name] = index
+        return index
+
+    def _join_index(self, name: str) -> KeyIndex:
+        """
+        Join index over `name`, built from the processed rows if no cleaning
+        stage has built it yet
+        """
+        if name not in self.join_indexes:
+            self._build_join_index(name, self.processed_data[name])
+        return self.join_indexes[name]
+
+    @instrumented(rows_in=lambda self: len(self.processed_data['hospital']),
+                  rows_out=lambda self, _: len(self.processed_data['analysis']))
     def create_analysis_dataset(self):
         """
         Combine all processed data into a single analysis dataset
         """
         try:
-            # Merge hospital and statistics data
-            analysis_df = pd.merge(
-                self.processed_data['hospital'],
-                self.processed_data['statistics'][['source', 'mean_value']],
-                left_index=True,
-                right_index=True,
-                how='left'
-            )
-            
-            # Add relevant PubMed information
-            pubmed_summary = self.processed_data['pubmed'].groupby('date').size().reset_index()
-            pubmed_summary.columns = ['date', 'publication_count']
-            
-            analysis_df = pd.merge(
-                analysis_df,
-                pubmed_summary,
-                on='date',
-                how='left'
-            )
-            
-            # Calculate additional features
-            analysis_df['surgery_rate'] = analysis_df['surgery_count'] / analysis_df.groupby('location')['surgery_count'].transform('sum')
-            
-            # Normalize numeric columns
-            scaler = StandardScaler()
-            numeric_cols = ['surgery_count', 'mean_value', 'publication_count']
-            analysis_df[numeric_cols] = scaler.fit_transform(analysis_df[numeric_cols])
-            
-            self.processed_data['analysis'] = analysis_df
+            analysis_df = self.processed_data['hospital'].copy()
+            keys = self._date_keys(analysis_df)
+            
+            # Statistics are dated scrape snapshots without a location, so each
+            # hospital day takes the nearest snapshot in time
+            statistics = self._join_index('statistics').asof(keys, direction='nearest')
+            analysis_df['mean_value'] = statistics['mean_value'].to_numpy()
+            analysis_df['statistics_sources'] = statistics['statistics_sources'].to_numpy()
+            
+            # PubMed dates are publication years, so counts join on the row's year
+            years = analysis_df['year'] if 'year' in analysis_df.columns else analysis_df['date'].dt.year
+            publications = self._join_index('pubmed').lookup(years)
+            analysis_df['publication_count'] = publications['publication_count'].to_numpy()
+            
+            # Share of the location's surgeries over the full history, so full
+            # and incremental runs agree and each location's rates sum to 1
+            totals = self.location_totals
+            if totals is None:
+                totals = analysis_df.groupby('location', observed=True)['surgery_count'].sum()
+            analysis_df['surgery_rate'] = analysis_df['surgery_count'] / analysis_df['location'].map(totals).astype('float64')
+            
+            # Fill gaps from group statistics with the configured strategy
+            analysis_df = self._impute_and_flag(analysis_df, ANALYSIS_FEATURES, 'analysis', flag=False)
+            
+            # Scaled copies come from the saved preprocessing model; raw values are kept
+            features = self.config.processing.feature_engineering
+            if features.normalize_numeric:
+                chunk_size = self.config.performance.chunk_size
+                model = load_or_fit(analysis_df, refit=features.refit_preprocessing,
+                                    chunk_size=chunk_size)
+                scaled = model.transform(analysis_df, chunk_size)
+                analysis_df[model.scaled_columns] = scaled[model.scaled_columns]
+                self.metadata['preprocessing_model'] = model.version
+            
+            self.processed_data['analysis'] = apply_schema(analysis_df, 'analysis')
             logging.info("Analysis dataset created successfully")
             self.metadata['processing_steps'].append('analysis_dataset_created')
             
@@ -208,14 +459,41 @@ class GallbladderDataProcessor:
             logging.error(f"Error creating analysis dataset: {str(e)}")
             raise
 
+    @instrumented(rows_in=lambda self: sum(len(df) for df in self.processed_data.values()))
     def save_processed_data(self):
         """
         Save all processed data and metadata
         """
         try:
-            # Save processed datasets
+            # Save processed datasets; each write retires the other layout's
+            # copy so readers never fall back to stale rows
+            lake = DataLake(layout=self.layout)
             for name, df in self.processed_data.items():
-                df.to_csv(f'data/processed_data/{name}_processed.csv', index=False)
+                if self.layout == 'partitioned':
+                    # The lake keeps partitions before the cutoff itself; rows
+                    # written under the flat layout seed it first
+                    if self.since is not None and not lake.has(name) and os.path.exists(processed_path(name)):
+                        lake.ingest(processed_path(name), name)
+                    lake.write(name, [df], since=self.since)
+                    for path in [processed_path(name, fmt) for fmt in PROCESSED_FORMATS]:
+                        if os.path.exists(path):
+                            os.remove(path)
+                    continue
+                
+                path = processed_path(name, self.output_format)
+                
+                # Incremental runs replace only the rows on or after the cutoff
+                if self.since is not None and (lake.has(name) or os.path.exists(processed_path(name))):
+                    previous = read_processed(name, lake=lake)
+                    if 'date' in previous.columns:
+                        previous = previous[previous['date'].isna() | (previous['date'] < self.since)]
+                        df = apply_schema(pd.concat([previous, df], ignore_index=True), name)
+                
+                if self.output_format == 'parquet':
+                    df.to_parquet(path, index=False)
+                else:
+                    df.to_csv(path, index=False)
+                lake.drop(name)
             
             # Save metadata
             with open('data/processed_data/processing_metadata.json', 'w') as f:
@@ -237,6 +515,8 @@ def main():
     processor.clean_pubmed_data()
     processor.clean_hospital_data()
     processor.process_statistics_data()
+    processor.handle_outliers_and_missing()
+    processor.create_time_features()
     processor.calculate_data_quality_metrics()
     processor.create_analysis_dataset()
     processor.save_processed_data()
@@ -1,34 +1,257 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import argparse
+import json
+import os
+
+try:
+    from .settings import load_config
+except ImportError:
+    from settings import load_config
+
+# Regions accepted by the default config (data_sources.hospitals.regions)
+REGIONS = ['North', 'South', 'East', 'West']
+JOURNALS = ['Surg Endosc', 'Ann Surg', 'JAMA Surg', 'Br J Surg', 'World J Surg', 'HPB (Oxford)']
+SEARCH_TERMS = ['gallbladder surgery', 'cholecystectomy', 'laparoscopic cholecystectomy']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+# Elective surgery volume by weekday, Monday first
+WEEKDAY_FACTORS = np.array([1.1, 1.1, 1.05, 1.05, 1.0, 0.45, 0.35])
 
 def generate_sample_data():
     # Generate dates for the past 5 years
     start_date = datetime(2018, 1, 1)
-    dates = [start_date + timedelta(days=x) for x in range(0, 365 * 5)]
-    
+    dates = pd.date_range(start_date, periods=365 * 5, freq='D')
+    i = np.arange(len(dates))
+
     # Generate synthetic data
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
+    noise = rng.normal(0, 10, len(dates))
     data = {
         'date': dates,
-        'count': [
-            max(0, int(100 + 0.1 * i + 20 * np.sin(i/30) + np.random.normal(0, 10)))
-            for i in range(len(dates))
-        ],
-        'source': np.random.choice(['Hospital A', 'Hospital B', 'Hospital C'], len(dates)),
-        'rate': np.random.normal(8.5, 1.5, len(dates))
+        'count': np.maximum(0, (100 + 0.1 * i + 20 * np.sin(i / 30) + noise).astype(int)),
+        'source': rng.choice(['Hospital A', 'Hospital B', 'Hospital C'], len(dates)),
+        'rate': rng.normal(8.5, 1.5, len(dates))
     }
-    
+
     df = pd.DataFrame(data)
-    
+
     # Add year and month columns
     df['year'] = df['date'].dt.year
     df['month'] = df['date'].dt.month
-    
+
     # Save the test data
     df.to_csv('data/raw_data/gallbladder_test_data.csv', index=False)
     print("Test data generated successfully!")
     return df
 
+def _region_names(n_locations: int, regions: Optional[List[str]] = None) -> list:
+    # Locations are the configured regions, which the `allowed` location rule
+    # accepts; there are no more distinct locations than regions
+    regions = regions or REGIONS
+    if not 1 <= n_locations <= len(regions):
+        raise ValueError(f"n_locations must be between 1 and the {len(regions)} "
+                         f"configured regions, got {n_locations}")
+    return list(regions[:n_locations])
+
+def _inject_duplicates(df: pd.DataFrame, rng: np.random.Generator, rate: float) -> pd.DataFrame:
+    if rate <= 0 or df.empty:
+        return df
+    n_duplicates = rng.binomial(len(df), rate)
+    return pd.concat([df, df.iloc[rng.integers(0, len(df), n_duplicates)]], ignore_index=True)
+
+def _hospital_chunks(n_hospitals: int, n_locations: int, years: int, start_date: str,
+                     seed: int, missing_rate: float, duplicate_rate: float,
+                     chunk_rows: int, regions: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield hospital-day rows in blocks of whole hospitals, roughly `chunk_rows` each.
+
+    Every block draws from its own generator seeded by (seed, block index), so
+    the output is reproducible for a given seed and chunk size.
+    """
+    dates = pd.date_range(start_date, periods=365 * years, freq='D')
+    n_days = len(dates)
+    day_index = np.arange(n_days)
+    day_of_year = dates.dayofyear.to_numpy()
+    weekday_factor = WEEKDAY_FACTORS[dates.dayofweek.to_numpy()]
+    date_strings = dates.strftime('%Y-%m-%d').to_numpy()
+    locations = np.array(_region_names(n_locations, regions))
+
+    hospitals_per_chunk = max(1, chunk_rows // n_days)
+    for chunk_index, first in enumerate(range(0, n_hospitals, hospitals_per_chunk)):
+        rng = np.random.default_rng([seed, chunk_index])
+        hospital_ids = np.arange(first, min(first + hospitals_per_chunk, n_hospitals))
+        n = len(hospital_ids)
+
+        # Per-hospital parameters, broadcast against the day axis
+        base = rng.uniform(5, 60, (n, 1))
+        growth = rng.normal(0.002, 0.001, (n, 1))
+        amplitude = rng.uniform(0.05, 0.25, (n, 1))
+        phase = rng.uniform(0, 2 * np.pi, (n, 1))
+
+        expected = (
+            base
+            * (1 + growth * day_index / 30)
+            * (1 + amplitude * np.sin(2 * np.pi * day_of_year / 365.25 + phase))
+            * weekday_factor
+        )
+        counts = rng.poisson(np.clip(expected, 0, None)).astype('float64')
+        if missing_rate > 0:
+            counts[rng.random(counts.shape) < missing_rate] = np.nan
+
+        df = pd.DataFrame({
+            'hospital_name': np.repeat([f'Hospital {h:05d}' for h in hospital_ids], n_days),
+            'date': np.tile(date_strings, n),
+            'surgery_count': pd.array(counts.ravel(), dtype='float64').astype('Int32'),
+            'location': np.repeat(locations[hospital_ids % n_locations], n_days),
+            'rate': rng.normal(8.5, 1.5, n * n_days).round(3)
+        })
+        yield _inject_duplicates(df, rng, duplicate_rate)
+
+def _pubmed_chunks(n_articles: int, start_year: int, years: int, seed: int,
+                   duplicate_rate: float, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for chunk_index, first in enumerate(range(0, n_articles, chunk_rows)):
+        rng = np.random.default_rng([seed, 1_000_000 + chunk_index])
+        ids = np.arange(first, min(first + chunk_rows, n_articles))
+        n = len(ids)
+        year = rng.integers(start_year, start_year + years, n).astype(str)
+        month = np.array(MONTHS)[rng.integers(0, 12, n)]
+        journal = np.array(JOURNALS)[rng.integers(0, len(JOURNALS), n)]
+        first_author = rng.integers(0, max(1, n_articles // 20), n).astype(str)
+        co_author = rng.integers(0, max(1, n_articles // 5), n).astype(str)
+
+        df = pd.DataFrame({
+            'pmid': (30_000_000 + ids).astype(str),
+            'title': np.char.add('Outcomes of laparoscopic cholecystectomy: cohort ', ids.astype(str)),
+            'authors': np.char.add(np.char.add(np.char.add('Author', first_author), ' A, Author'),
+                                   np.char.add(co_author, ' B')),
+            'date': np.char.add(np.char.add(np.char.add(journal, '. '), year),
+                                np.char.add(' ', month)),
+            'source': 'PubMed',
+            'queries': np.array(SEARCH_TERMS)[rng.integers(0, len(SEARCH_TERMS), n)]
+        })
+        yield _inject_duplicates(df, rng, duplicate_rate)
+
+def _statistics_fixture(n_sources: int, seed: int, end_date: str) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, 2_000_000])
+    rates = rng.uniform(5, 20, n_sources).round(1)
+    complications = rng.uniform(1, 8, n_sources).round(1)
+    # One row per source and metric, as the statistics scraper writes them
+    return pd.DataFrame({
+        'source': np.repeat([f'example-medical-stats-{i}' for i in range(n_sources)], 2),
+        'metric': np.tile(['cholecystectomy_rate', 'complication_rate'], n_sources),
+        'value': np.column_stack([rates, complications]).ravel(),
+        'unit': '%',
+        'date': end_date
+    })
+
+def _write_chunks(chunks: Iterator[pd.DataFrame], path: str) -> int:
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+def generate_fixtures(n_hospitals: int = 100, n_locations: int = 4, years: int = 5,
+                      start_date: str = '2018-01-01', n_articles: int = 5000,
+                      n_sources: int = 20, seed: int = 42, missing_rate: float = 0.0,
+                      duplicate_rate: float = 0.0, chunk_rows: int = 1_000_000,
+                      output_dir: str = 'data/raw_data',
+                      regions: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Write synthetic raw fixtures of configurable scale in bounded-memory chunks.
+
+    Produces hospital_data.csv (hospitals x days, plus `duplicate_rate`
+    repeated rows), gallbladder_test_data.csv with the same volumes in the
+    exploratory-analysis layout (one row per hospital and day, without the
+    duplicates; the analyses total them per day), pubmed_data.csv,
+    medical_statistics.csv and a combined_data.json summary. Locations are
+    the first `n_locations` of `regions` (the default config's regions).
+    Returns the number of rows written per file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        name: os.path.join(output_dir, name)
+        for name in ['hospital_data.csv', 'gallbladder_test_data.csv',
+                     'pubmed_data.csv', 'medical_statistics.csv']
+    }
+    start_year = pd.Timestamp(start_date).year
+    end_date = (pd.Timestamp(start_date) + timedelta(days=365 * years - 1)).strftime('%Y-%m-%d')
+    rows = dict.fromkeys(paths, 0)
+
+    # Hospital volumes feed both the raw hospital file and the test data layout
+    hospital_chunks = _hospital_chunks(n_hospitals, n_locations, years, start_date, seed,
+                                       missing_rate, duplicate_rate, chunk_rows, regions)
+    for i, chunk in enumerate(hospital_chunks):
+        # Duplicates stand in for repeated scrapes, which processing removes;
+        # the analysis layout holds one row per hospital and day
+        measured = chunk.drop_duplicates(['hospital_name', 'date']) if duplicate_rate > 0 else chunk
+        dates = pd.to_datetime(measured['date'])
+        test_data = pd.DataFrame({
+            'date': measured['date'],
+            'count': measured['surgery_count'],
+            'source': measured['hospital_name'],
+            'rate': measured['rate'],
+            'year': dates.dt.year,
+            'month': dates.dt.month
+        })
+        for name, df in [('hospital_data.csv', chunk[['hospital_name', 'date', 'surgery_count', 'location']]),
+                         ('gallbladder_test_data.csv', test_data)]:
+            df.to_csv(paths[name], mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows[name] += len(df)
+
+    rows['pubmed_data.csv'] = _write_chunks(
+        _pubmed_chunks(n_articles, start_year, years, seed, duplicate_rate, chunk_rows),
+        paths['pubmed_data.csv']
+    )
+    rows['medical_statistics.csv'] = _write_chunks(
+        iter([_statistics_fixture(n_sources, seed, end_date)]), paths['medical_statistics.csv']
+    )
+
+    # Summary in the scraper's combine_data layout; records are omitted at scale
+    with open(os.path.join(output_dir, 'combined_data.json'), 'w') as f:
+        json.dump({
+            'pubmed_articles': rows['pubmed_data.csv'],
+            'hospitals_reported': rows['hospital_data.csv'],
+            'statistics_sources': rows['medical_statistics.csv'],
+            'last_updated': end_date,
+            'data_sources': {}
+        }, f, indent=4)
+    print(f"Fixtures generated in {output_dir}: {rows}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic gallbladder data')
+    parser.add_argument('--fixtures', action='store_true',
+                        help='write scalable raw fixtures instead of the small sample dataset')
+    parser.add_argument('--hospitals', type=int, default=100)
+    parser.add_argument('--locations', type=int, default=4)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--start-date', default='2018-01-01')
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--sources', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--missing-rate', type=float, default=0.0)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--output-dir', default='data/raw_data')
+    args = parser.parse_args()
+
+    if not args.fixtures:
+        generate_sample_data()
+        return
+
+    regions = load_config().data_sources.hospitals.regions or REGIONS
+    if args.locations > len(regions):
+        parser.error(f"--locations cannot exceed the {len(regions)} configured regions")
+    generate_fixtures(
+        n_hospitals=args.hospitals, n_locations=args.locations, years=args.years,
+        start_date=args.start_date, n_articles=args.articles, n_sources=args.sources,
+        seed=args.seed, missing_rate=args.missing_rate, duplicate_rate=args.duplicate_rate,
+        chunk_rows=args.chunk_rows, output_dir=args.output_dir,
+        regions=regions
+    )
+
 if __name__ == "__main__":
-    generate_sample_data()
+    main()
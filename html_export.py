@@ -0,0 +1,249 @@
+import numpy as np
+from typing import Dict, List, Optional
+import base64
+import glob
+import html
+import json
+import logging
+import os
+
+RESULTS_DIR = 'data/analysis_results'
+CHARTS_DIR = 'charts'
+REPORT_FILE = 'report.html'
+HTML_EXPORT_MODES = ('shared', 'standalone')
+# Report sections in pipeline order; other charts follow alphabetically
+REPORT_ORDER = ['time_series', 'hospital_comparison', 'monthly_trends',
+                'seasonal_decomposition', 'forecast']
+
+# numpy dtypes plotly.js reads as typed arrays (plotly.js 2.28 and later)
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'
+}
+# Trace attributes drawn against an axis, which may hold dates
+AXIS_ATTRIBUTES = {'x': 'xaxis', 'y': 'yaxis'}
+
+
+def _plotlyjs_version() -> str:
+    from plotly.offline import get_plotlyjs_version
+    return get_plotlyjs_version()
+
+
+def supports_typed_arrays(version: Optional[str] = None) -> bool:
+    major, minor = (int(part) for part in (version or _plotlyjs_version()).split('.')[:2])
+    return (major, minor) >= (2, 28)
+
+
+def _typed_array(values: np.ndarray):
+    """
+    A numeric array as a base64 plotly.js typed array spec; anything else as-is
+    """
+    if values.size == 0 or values.dtype.kind not in 'iuf':
+        return values
+    if values.dtype.kind == 'f':
+        # Single precision keeps 7 significant digits, beyond what a chart shows
+        values = values.astype('float32')
+    elif str(values.dtype) not in TYPED_ARRAY_DTYPES:
+        low, high = values.min(), values.max()
+        fitting = [dtype for dtype in ['int8', 'int16', 'int32']
+                   if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max]
+        values = values.astype(fitting[0] if fitting else 'float64')
+    spec = {
+        'dtype': TYPED_ARRAY_DTYPES[str(values.dtype)],
+        'bdata': base64.b64encode(np.ascontiguousarray(values)).decode('ascii')
+    }
+    if values.ndim > 1:
+        spec['shape'] = str(values.shape)[1:-1]
+    return spec
+
+
+def _encode(value):
+    if isinstance(value, dict) and 'bdata' in value:
+        # Already a typed array (newer plotly encodes numpy arrays itself)
+        if value.get('dtype') != 'f8':
+            return value
+        values = np.frombuffer(base64.b64decode(value['bdata']), 'float64')
+        if 'shape' in value:
+            values = values.reshape([int(n) for n in value['shape'].split(',')])
+        return _typed_array(values)
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(
+            isinstance(item, (int, float)) and not isinstance(item, bool) for item in value):
+        return _typed_array(np.asarray(value))
+    if isinstance(value, np.ndarray):
+        return _typed_array(value)
+    return value
+
+
+def compact_figure(fig) -> Dict:
+    """
+    Figure dict with numeric trace arrays as base64 typed arrays. Dates on
+    an x or y axis become millisecond timestamps on a date axis, which
+    plotly.js reads without parsing strings.
+    """
+    figure = fig if isinstance(fig, dict) else fig.to_plotly_json()
+    layout = dict(figure.get('layout', {}))
+    data = []
+    for trace in figure.get('data', []):
+        trace = dict(trace)
+        dates = {}
+        for attribute, axis in AXIS_ATTRIBUTES.items():
+            values = trace.get(attribute)
+            if isinstance(values, np.ndarray) and values.dtype.kind == 'M':
+                reference = trace.get(attribute + 'axis', attribute)
+                axis_key = axis + reference[1:]
+                if layout.get(axis_key, {}).get('type', 'date') != 'date':
+                    continue
+                layout[axis_key] = {**layout.get(axis_key, {}), 'type': 'date'}
+                # Timestamps need double precision, so they bypass the float32 narrowing
+                millis = values.astype('datetime64[ms]').astype('int64').astype('float64')
+                millis[np.isnat(values)] = np.nan
+                dates[attribute] = {'dtype': 'f8', 'bdata': base64.b64encode(millis).decode('ascii')}
+        data.append({key: dates[key] if key in dates else _encode(value) for key, value in trace.items()})
+    return {'data': data, 'layout': layout}
+
+
+class HtmlExporter:
+    """
+    Writes interactive Plotly charts for the exploratory analyses.
+
+    In 'shared' mode every chart file loads one plotly.js bundle written
+    next to it and carries its trace arrays in binary; 'standalone' embeds
+    the library and data in each file as before. With `report`, the charts
+    are also combined into one page that draws each chart when it scrolls
+    into view.
+    """
+
+    def __init__(self, mode: str = 'shared', report: bool = True, output_dir: str = RESULTS_DIR):
+        if mode not in HTML_EXPORT_MODES:
+            raise ValueError(f"Unknown HTML export mode {mode!r}; expected one of {HTML_EXPORT_MODES}")
+        self.mode = mode
+        self.report = report
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def bundle(self) -> str:
+        """
+        File name of the shared plotly.js bundle, written once per version
+        """
+        from plotly.offline import get_plotlyjs
+
+        name = f'plotly-{_plotlyjs_version()}.min.js'
+        path = os.path.join(self.output_dir, name)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(get_plotlyjs())
+            logging.info(f"Wrote shared plotly.js bundle {path}")
+        return name
+
+    def _figure(self, fig) -> Dict:
+        if supports_typed_arrays():
+            return compact_figure(fig)
+        return fig if isinstance(fig, dict) else fig.to_plotly_json()
+
+    def export(self, fig, name: str) -> str:
+        """
+        Write `fig` to <name>.html and, for the report, keep its figure data
+        """
+        import plotly.io as pio
+
+        path = os.path.join(self.output_dir, f'{name}.html')
+        figure = self._figure(fig) if self.mode == 'shared' or self.report else None
+        if self.mode == 'standalone':
+            fig.write_html(path)
+        else:
+            pio.write_html(figure, path, include_plotlyjs=self.bundle(),
+                           validate=False, full_html=True)
+
+        if self.report:
+            charts_dir = os.path.join(self.output_dir, CHARTS_DIR)
+            os.makedirs(charts_dir, exist_ok=True)
+            with open(os.path.join(charts_dir, f'{name}.json'), 'w', encoding='utf-8') as f:
+                f.write(pio.to_json(figure, validate=False))
+        return path
+
+    def _chart_names(self) -> List[str]:
+        names = [os.path.splitext(os.path.basename(path))[0]
+                 for path in glob.glob(os.path.join(self.output_dir, CHARTS_DIR, '*.json'))]
+        return ([name for name in REPORT_ORDER if name in names]
+                + sorted(name for name in names if name not in REPORT_ORDER))
+
+    def write_report(self, title: str = 'Gallbladder Analysis Report') -> Optional[str]:
+        """
+        Combine every exported chart into one page. plotly.js is loaded
+        once and each chart's data is parsed and drawn only when its
+        section comes into view.
+        """
+        if not self.report:
+            return None
+        names = self._chart_names()
+        if not names:
+            return None
+
+        sections, figures = [], []
+        for name in names:
+            with open(os.path.join(self.output_dir, CHARTS_DIR, f'{name}.json'), encoding='utf-8') as f:
+                figure_json = f.read()
+            layout_title = json.loads(figure_json).get('layout', {}).get('title') or {}
+            heading = layout_title.get('text') if isinstance(layout_title, dict) else layout_title
+            sections.append(
+                f'<section id="{name}"><h2>{html.escape(heading or name)}</h2>'
+                f'<div class="chart" data-figure="figure-{name}"></div></section>'
+            )
+            # Plotly's JSON escapes '<' and '>', so it cannot close the script tag
+            figures.append(f'<script type="application/json" id="figure-{name}">{figure_json}</script>')
+
+        contents = ''.join(f'<li><a href="#{name}">{name.replace("_", " ")}</a></li>' for name in names)
+        page = REPORT_TEMPLATE.format(
+            title=html.escape(title), bundle=self.bundle(), contents=contents,
+            sections='\n'.join(sections), figures='\n'.join(figures)
+        )
+        path = os.path.join(self.output_dir, REPORT_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        logging.info(f"Wrote report with {len(names)} charts to {path}")
+        return path
+
+
+REPORT_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{bundle}" defer></script>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+.chart {{ min-height: 450px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<ul>{contents}</ul>
+{sections}
+{figures}
+<script>
+window.addEventListener('load', function () {{
+  var draw = function (element) {{
+    var figure = JSON.parse(document.getElementById(element.dataset.figure).textContent);
+    Plotly.newPlot(element, figure.data, figure.layout, {{responsive: true}});
+  }};
+  var charts = document.querySelectorAll('.chart');
+  if (!('IntersectionObserver' in window)) {{
+    charts.forEach(draw);
+    return;
+  }}
+  var observer = new IntersectionObserver(function (entries) {{
+    entries.forEach(function (entry) {{
+      if (entry.isIntersecting) {{
+        observer.unobserve(entry.target);
+        draw(entry.target);
+      }}
+    }});
+  }}, {{rootMargin: '200px'}});
+  charts.forEach(function (element) {{ observer.observe(element); }});
+}});
+</script>
+</body>
+</html>
+'''
@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+try:
+    from .settings import HttpConfig
+except ImportError:
+    from settings import HttpConfig
+
+
+class FetchError(Exception):
+    """
+    A request that failed after all retries, or with a non-retryable status
+    """
+
+    def __init__(self, url: str, reason: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.reason = reason
+        self.status = status
+
+
+class CircuitOpenError(FetchError):
+    """
+    Raised without a request while a host's circuit breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: `failure_threshold` consecutive failures open it, and
+    after `reset_timeout` seconds one trial request is let through (half
+    open); its success closes the breaker, its failure opens it again
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.trial_in_flight = False
+
+
+class HttpClient:
+    """
+    requests wrapper with per-host retries, exponential backoff with full
+    jitter, connect/read timeouts, circuit breakers and request spacing:
+    requests to one host start at least `request_delay` seconds apart,
+    however many threads share the client. Safe to share between threads.
+    """
+
+    def __init__(self, config: Optional[HttpConfig] = None, headers: Optional[Dict] = None,
+                 session=None, sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        import requests
+
+        self.config = config or HttpConfig()
+        self.session = session or requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        self.sleep = sleep
+        self.clock = clock
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # Host -> earliest start of its next request
+        self.next_slot: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(
+                    self.config.failure_threshold, self.config.reset_timeout, self.clock
+                )
+            return self.breakers[host]
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Seconds to wait before retry `attempt` (1-based): a server-sent
+        Retry-After when given, otherwise uniform in [0, base * 2**attempt]
+        capped at backoff_max
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config.backoff_max)
+            except ValueError:
+                pass
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def wait_for_slot(self, url: str):
+        """
+        Reserve the host's next request slot and sleep until it starts
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = self.clock()
+            start = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = start + self.config.request_delay
+        if start > now:
+            self.sleep(start - now)
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def get(self, url: str, **kwargs):
+        """
+        GET `url`, retrying timeouts, connection errors and retryable statuses.
+
+        Raises CircuitOpenError while the host's breaker is open and FetchError
+        once retries are exhausted or the server answers with a client error.
+        """
+        import requests
+
+        breaker = self.breaker(url)
+        timeout = (self.config.connect_timeout, self.config.timeout)
+        reason, status = 'no attempt made', None
+
+        for attempt in range(self.config.max_retries + 1):
+            if not breaker.allow():
+                self._count('rejected')
+                raise CircuitOpenError(url, f"circuit open for {urlsplit(url).netloc}")
+            if attempt:
+                self._count('retries')
+
+            retry_after = None
+            self.wait_for_slot(url)
+            try:
+                self._count('requests')
+                response = self.session.get(url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                reason, status = type(e).__name__, None
+            else:
+                if response.status_code < 400:
+                    breaker.record_success()
+                    return response
+                reason, status = f"HTTP {response.status_code}", response.status_code
+                if status not in self.config.retry_statuses:
+                    # The host answered; a client error is not a host failure
+                    breaker.record_success()
+                    raise FetchError(url, reason, status)
+                retry_after = response.headers.get('Retry-After')
+
+            breaker.record_failure()
+            if attempt < self.config.max_retries:
+                delay = self.backoff(attempt + 1, retry_after)
+                logging.warning(f"{url}: {reason}; retry {attempt + 1} in {delay:.2f}s")
+                self.sleep(delay)
+
+        self._count('failures')
+        raise FetchError(url, f"{reason} after {self.config.max_retries + 1} attempts", status)
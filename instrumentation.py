@@ -0,0 +1,227 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+
+# Per-stage metrics from every pipeline class go to one JSON-lines file
+METRICS_PATH = os.environ.get('GALLBLADDER_METRICS', 'data/metrics/pipeline_metrics.jsonl')
+# Opt-in profiling: 'cprofile' or 'pyinstrument'
+PROFILER = os.environ.get('GALLBLADDER_PROFILE') or None
+PROFILE_DIR = 'data/metrics/profiles'
+RUN_ID = os.environ.get('GALLBLADDER_RUN_ID') or uuid.uuid4().hex[:12]
+
+_lock = threading.Lock()
+_local = threading.local()
+# Stages currently inside _profiled, across threads; only one profiler may run
+_profile_depth = 0
+# Running stages across threads; the peak-RSS watermark is process-wide
+_active = set()
+
+
+def configure(metrics_path: Optional[str] = None, profiler: Optional[str] = None,
+              profile_dir: Optional[str] = None, run_id: Optional[str] = None):
+    """
+    Override where metrics go and whether each stage is profiled
+    """
+    global METRICS_PATH, PROFILER, PROFILE_DIR, RUN_ID
+    if profiler not in (None, 'cprofile', 'pyinstrument'):
+        raise ValueError(f"Unknown profiler: {profiler}")
+    METRICS_PATH = metrics_path or METRICS_PATH
+    PROFILER = profiler
+    PROFILE_DIR = profile_dir or PROFILE_DIR
+    RUN_ID = run_id or RUN_ID
+
+
+def reset_peak_rss():
+    """
+    Reset the kernel's peak-RSS watermark (Linux only; a no-op elsewhere)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size since the last reset, in MB
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageRecord:
+    """
+    Mutable record for one running stage; callers may set `rows_out`
+    """
+
+    def __init__(self, name: str, rows_in: Optional[int] = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.child_peak_mb = 0.0
+        # Set when another thread ran a stage meanwhile, so the peak is the process's
+        self.concurrent = False
+
+
+def _write(record: dict):
+    directory = os.path.dirname(METRICS_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _lock, open(METRICS_PATH, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+
+@contextmanager
+def _profiled(name: str):
+    """
+    Profile the outermost stage only. A second cProfile raises on Python
+    3.12+ and disabling it stops the enclosing one on older versions, so
+    nested stages appear inside their parent's profile instead.
+    """
+    global _profile_depth
+    with _lock:
+        outermost = _profile_depth == 0
+        _profile_depth += 1
+    try:
+        if PROFILER is None or not outermost:
+            yield
+        else:
+            with _profiler(name):
+                yield
+    finally:
+        with _lock:
+            _profile_depth -= 1
+
+
+@contextmanager
+def _profiler(name: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prefix = os.path.join(PROFILE_DIR, f'{RUN_ID}_{name}')
+    if PROFILER == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(f'{prefix}.html', 'w') as f:
+                f.write(profiler.output_html())
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f'{prefix}.prof')
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None):
+    """
+    Time a block of pipeline work and append its metrics to the metrics file.
+
+    Records wall time, CPU time, rows in/out and peak RSS. Nested stages are
+    reported on their own and their peak is folded into the enclosing stage.
+    The watermark is only reset while no other thread runs a stage; peaks
+    of overlapping stages cover the whole process and are recorded with
+    `peak_rss_scope` 'process' instead of 'stage'.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    record = StageRecord(name, rows_in)
+    with _lock:
+        others = [other for other in _active if other not in stack]
+        for other in others:
+            other.concurrent = True
+        record.concurrent = bool(others) or any(parent.concurrent for parent in stack)
+        _active.add(record)
+    if stack:
+        # Keep the enclosing stage's peak so far before the watermark is reset
+        stack[-1].child_peak_mb = max(stack[-1].child_peak_mb, peak_rss_mb())
+    stack.append(record)
+
+    if not record.concurrent:
+        reset_peak_rss()
+    started = datetime.now()
+    wall, cpu = time.perf_counter(), time.process_time()
+    status, error = 'ok', None
+    try:
+        with _profiled(name):
+            yield record
+    except Exception as e:
+        status, error = 'error', f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        stack.pop()
+        with _lock:
+            _active.discard(record)
+        peak = max(peak_rss_mb(), record.child_peak_mb)
+        if stack:
+            stack[-1].child_peak_mb = max(stack[-1].child_peak_mb, peak)
+        try:
+            _write({
+                'run_id': RUN_ID,
+                'pid': os.getpid(),
+                'stage': name,
+                'start': started.isoformat(timespec='milliseconds'),
+                'wall_s': round(time.perf_counter() - wall, 6),
+                'cpu_s': round(time.process_time() - cpu, 6),
+                'rows_in': record.rows_in,
+                'rows_out': record.rows_out,
+                'peak_rss_mb': round(peak, 1),
+                'peak_rss_scope': 'process' if record.concurrent else 'stage',
+                'status': status,
+                'error': error
+            })
+        except OSError as e:
+            logging.warning(f"Could not write metrics for {name}: {str(e)}")
+
+
+def _safe_count(func: Optional[Callable], *args) -> Optional[int]:
+    if func is None:
+        return None
+    try:
+        return int(func(*args))
+    except Exception:
+        return None
+
+
+def instrumented(name: Optional[str] = None,
+                 rows_in: Optional[Callable] = None,
+                 rows_out: Optional[Callable] = None):
+    """
+    Decorate a pipeline method so every call is recorded as a stage.
+
+    `rows_in(self)` and `rows_out(self, result)` return row counts; failures
+    while counting are ignored so instrumentation never breaks a run.
+    """
+    def decorator(method):
+        stage_name = name or method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with stage(stage_name, _safe_count(rows_in, self)) as record:
+                result = method(self, *args, **kwargs)
+                record.rows_out = _safe_count(rows_out, self, result)
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence
+
+ASOF_DIRECTIONS = ('backward', 'forward', 'nearest')
+
+
+class KeyIndex:
+    """
+    Sorted integer keys with aligned value columns, built once and reused for
+    exact (period) and as-of lookups with np.searchsorted
+    """
+
+    def __init__(self, keys, values: pd.DataFrame):
+        keys = np.asarray(keys, dtype='int64')
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.values = values.iloc[order].reset_index(drop=True)
+        if len(self.keys) and (np.diff(self.keys) == 0).any():
+            raise ValueError("KeyIndex keys must be unique; aggregate before indexing")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key: str, columns: Sequence[str]) -> 'KeyIndex':
+        df = df[df[key].notna()]
+        return cls(df[key].to_numpy(dtype='int64'), df[list(columns)])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _take(self, positions: np.ndarray, columns: Optional[Sequence[str]]) -> pd.DataFrame:
+        columns: List[str] = list(self.values.columns if columns is None else columns)
+        # -1 marks rows without a match and becomes NA
+        return pd.DataFrame({
+            column: self.values[column].array.take(positions, allow_fill=True)
+            for column in columns
+        })
+
+    def lookup(self, keys, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Values for exactly matching keys; missing keys give NA
+        """
+        keys, missing = _as_keys(keys)
+        if len(self.keys) == 0:
+            return self._take(np.full(len(keys), -1), columns)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = ~missing & (self.keys[positions] == keys)
+        return self._take(np.where(found, positions, -1), columns)
+
+    def asof(self, keys, columns: Optional[Sequence[str]] = None,
+             direction: str = 'backward', tolerance: Optional[int] = None) -> pd.DataFrame:
+        """
+        Values for the last key <= each key ('backward'), the first key >= it
+        ('forward') or whichever is closer ('nearest', ties go backward)
+        """
+        if direction not in ASOF_DIRECTIONS:
+            raise ValueError(f"Unknown as-of direction: {direction}")
+        keys, missing = _as_keys(keys)
+        n = len(self.keys)
+        if n == 0:
+            return self._take(np.full(len(keys), -1), columns)
+
+        # Last key <= k and first key >= k; -1 where there is none
+        before = np.searchsorted(self.keys, keys, side='right') - 1
+        after = np.searchsorted(self.keys, keys, side='left')
+        after = np.where(after < n, after, -1)
+
+        if direction == 'backward':
+            positions = before
+        elif direction == 'forward':
+            positions = after
+        else:
+            before_distance = np.where(before >= 0, keys - self.keys[before], np.iinfo('int64').max)
+            after_distance = np.where(after >= 0, self.keys[after] - keys, np.iinfo('int64').max)
+            positions = np.where(after_distance < before_distance, after, before)
+
+        if tolerance is not None:
+            distance = np.abs(self.keys[positions] - keys)
+            positions = np.where(distance <= tolerance, positions, -1)
+        positions = np.where(missing | (positions < 0), -1, positions)
+        return self._take(positions, columns)
+
+
+def _as_keys(keys):
+    """
+    int64 keys plus a missing-value mask from an integer Series or array
+    """
+    if isinstance(keys, (pd.Series, pd.Index)):
+        missing = keys.isna().to_numpy()
+        values = keys.to_numpy(dtype='float64', na_value=np.nan) if missing.any() else keys.to_numpy()
+        return np.where(missing, 0, values).astype('int64'), missing
+    keys = np.asarray(keys)
+    return keys.astype('int64'), np.zeros(len(keys), dtype=bool)
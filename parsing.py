@@ -0,0 +1,113 @@
+from typing import Callable, Dict, List, Optional
+
+# Raw search pages are kept here when data_sources.pubmed.save_pages is set
+PUBMED_PAGES_DIR = 'data/raw_data/pages/pubmed'
+
+# Output field -> class of the element holding it inside an article
+PUBMED_FIELDS = {'pmid': 'docsum-pmid', 'title': 'docsum-title', 'authors': 'docsum-authors',
+                 'date': 'docsum-journal-cite'}
+
+
+def _text(node) -> Optional[str]:
+    return node.text_content().strip() if node is not None else None
+
+
+def _first(node, css_class: str):
+    matches = node.find_class(css_class)
+    return matches[0] if matches else None
+
+
+def _pubmed_lxml(content: bytes) -> List[Dict[str, Optional[str]]]:
+    import lxml.html
+
+    document = lxml.html.document_fromstring(content)
+    return [
+        {name: _text(_first(article, css_class)) for name, css_class in PUBMED_FIELDS.items()}
+        for article in document.find_class('full-docsum') if article.tag == 'article'
+    ]
+
+
+def _pubmed_soup(content: bytes, parser: str, strain: bool) -> List[Dict[str, Optional[str]]]:
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # With a strainer only the article subtrees are built, not the whole page
+    only = SoupStrainer('article', class_='full-docsum') if strain else None
+    soup = BeautifulSoup(content, parser, parse_only=only)
+    rows = []
+    for article in soup.find_all('article', class_='full-docsum'):
+        found = {name: article.find(class_=css_class) for name, css_class in PUBMED_FIELDS.items()}
+        rows.append({name: node.get_text().strip() if node is not None else None
+                     for name, node in found.items()})
+    return rows
+
+
+# Backends for parse_pubmed_page; 'html.parser' is the former full-document
+# parse, kept as the benchmark baseline
+PUBMED_BACKENDS: Dict[str, Callable[[bytes], List[Dict[str, Optional[str]]]]] = {
+    'lxml': _pubmed_lxml,
+    'soup-strained': lambda content: _pubmed_soup(content, 'lxml', strain=True),
+    'html.parser': lambda content: _pubmed_soup(content, 'html.parser', strain=False)
+}
+
+
+def parse_pubmed_page(content: bytes, backend: str = 'lxml') -> List[Dict[str, Optional[str]]]:
+    """
+    Articles on a PubMed search results page as dicts of pmid, title, authors
+    and date (None where the element is missing). Articles without a title are
+    skipped, and an empty page gives no articles.
+    """
+    if not content or not content.strip():
+        return []
+    return [row for row in PUBMED_BACKENDS[backend](content) if row['title']]
+
+
+def parse_pubmed_ids(content: bytes) -> List[str]:
+    """
+    PMIDs of a PubMed result page fetched with format=pmid, in result order
+    """
+    import lxml.html
+
+    if not content or not content.strip():
+        return []
+    document = lxml.html.document_fromstring(content)
+    return [pmid for chunk in document.find_class('search-results-chunk')
+            for pmid in chunk.text_content().split()]
+
+
+def _cells(row) -> List[str]:
+    return [cell.text_content().strip() for cell in row if cell.tag in ('td', 'th')]
+
+
+def extract_table(content: bytes, table_class: str, columns: Dict[str, str]) -> List[Dict[str, Optional[str]]]:
+    """
+    Rows of the first table with (or inside an element with) class
+    `table_class`, as dicts keyed by the names in `columns`.
+
+    `columns` maps output names to header texts (case-insensitive); the
+    header is the first row. Missing cells give None. Raises ValueError
+    when the table or a header is not found.
+    """
+    import lxml.html
+
+    document = lxml.html.fromstring(content)
+    matches = document.find_class(table_class)
+    if not matches:
+        raise ValueError(f"No element with class {table_class!r}")
+    table = matches[0] if matches[0].tag == 'table' else matches[0].find('.//table')
+    if table is None:
+        raise ValueError(f"No table inside the element with class {table_class!r}")
+
+    rows = [cells for cells in (_cells(row) for row in table.iter('tr')) if cells]
+    if not rows:
+        return []
+    header = [cell.lower() for cell in rows[0]]
+    positions = {}
+    for name, title in columns.items():
+        if title.lower() not in header:
+            raise ValueError(f"Table {table_class!r} has no {title!r} column (found {rows[0]})")
+        positions[name] = header.index(title.lower())
+
+    return [
+        {name: row[i] if i < len(row) and row[i] != '' else None for name, i in positions.items()}
+        for row in rows[1:]
+    ]
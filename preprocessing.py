@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .cleaning import iter_chunks
+except ImportError:
+    from cleaning import iter_chunks
+
+MODEL_DIR = 'data/models/preprocessing'
+FORMAT_VERSION = 1
+ANALYSIS_FEATURES = ['surgery_count', 'mean_value', 'publication_count']
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+class PreprocessingModel:
+    """
+    Standardization followed by PCA, fitted once in streaming passes and
+    applied chunk by chunk. Parameters are stored as JSON plus NumPy arrays
+    in numbered version directories, so transforming new rows needs neither
+    sklearn nor the data the model was fitted on.
+    """
+
+    def __init__(self, features: Sequence[str] = ANALYSIS_FEATURES, n_components: int = 2):
+        self.features: List[str] = list(features)
+        self.n_components = n_components
+        self.mean_ = None
+        self.scale_ = None
+        self.components_ = None
+        self.pca_mean_ = None
+        self.explained_variance_ratio_ = None
+        self.n_samples_ = 0
+        self.fitted_at = None
+        self.version = None
+
+    @property
+    def scaled_columns(self) -> List[str]:
+        return [f'{feature}_scaled' for feature in self.features]
+
+    @property
+    def component_columns(self) -> List[str]:
+        return [f'pca_{i + 1}' for i in range(self.n_components)]
+
+    def _complete(self, df: pd.DataFrame):
+        X = df[self.features].to_numpy(dtype='float64', na_value=np.nan)
+        return X, ~np.isnan(X).any(axis=1)
+
+    def fit(self, df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'PreprocessingModel':
+        """
+        Fit the scaler, then PCA on scaled rows, in two passes over `chunk_size`
+        slices; rows with a missing feature are ignored
+        """
+        from sklearn.decomposition import IncrementalPCA
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler()
+        for chunk in iter_chunks(df, chunk_size):
+            X, complete = self._complete(chunk)
+            if complete.any():
+                scaler.partial_fit(X[complete])
+        if not getattr(scaler, 'n_samples_seen_', 0):
+            raise ValueError("No complete rows to fit the preprocessing model on")
+
+        pca = IncrementalPCA(n_components=self.n_components)
+        remainder = np.empty((0, len(self.features)))
+        for chunk in iter_chunks(df, chunk_size):
+            X, complete = self._complete(chunk)
+            # IncrementalPCA needs at least n_components rows per batch
+            batch = np.vstack([remainder, scaler.transform(X[complete])])
+            if len(batch) < self.n_components:
+                remainder = batch
+                continue
+            pca.partial_fit(batch)
+            remainder = np.empty((0, len(self.features)))
+        if not hasattr(pca, 'components_'):
+            raise ValueError(f"Need at least {self.n_components} complete rows for PCA")
+
+        self.mean_ = scaler.mean_
+        self.scale_ = scaler.scale_
+        self.components_ = pca.components_
+        self.pca_mean_ = pca.mean_
+        self.explained_variance_ratio_ = pca.explained_variance_ratio_
+        self.n_samples_ = int(scaler.n_samples_seen_)
+        self.fitted_at = datetime.now().isoformat(timespec='seconds')
+        self.version = None
+        return self
+
+    def transform(self, df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+        """
+        Scaled features and principal components for every row of `df`;
+        rows with a missing feature get NaN
+        """
+        if self.mean_ is None:
+            raise ValueError("Preprocessing model is not fitted")
+        scaled_parts, component_parts = [], []
+        for chunk in iter_chunks(df, chunk_size):
+            X, _ = self._complete(chunk)
+            scaled = (X - self.mean_) / self.scale_
+            scaled_parts.append(scaled.astype('float32'))
+            component_parts.append(((scaled - self.pca_mean_) @ self.components_.T).astype('float32'))
+
+        result = pd.DataFrame(np.concatenate(scaled_parts), columns=self.scaled_columns, index=df.index)
+        components = np.concatenate(component_parts)
+        for i, column in enumerate(self.component_columns):
+            result[column] = components[:, i]
+        return result
+
+    def save(self, directory: str = MODEL_DIR) -> str:
+        """
+        Write the model as the next numbered version and mark it latest
+        """
+        if self.mean_ is None:
+            raise ValueError("Preprocessing model is not fitted")
+        try:
+            import sklearn
+            os.makedirs(directory, exist_ok=True)
+            existing = [name for name in os.listdir(directory) if name.startswith('v') and name[1:].isdigit()]
+            self.version = f"v{max([int(name[1:]) for name in existing] + [0]) + 1:04d}"
+            path = os.path.join(directory, self.version)
+            os.makedirs(path)
+
+            np.savez(os.path.join(path, 'arrays.npz'), mean=self.mean_, scale=self.scale_,
+                     components=self.components_, pca_mean=self.pca_mean_,
+                     explained_variance_ratio=self.explained_variance_ratio_)
+            with open(os.path.join(path, 'model.json'), 'w') as f:
+                json.dump({
+                    'format_version': FORMAT_VERSION,
+                    'version': self.version,
+                    'features': self.features,
+                    'n_components': self.n_components,
+                    'n_samples': self.n_samples_,
+                    'fitted_at': self.fitted_at,
+                    'sklearn_version': sklearn.__version__
+                }, f, indent=4)
+
+            # Switch the pointer atomically so readers never see a partial model
+            latest = os.path.join(directory, 'LATEST')
+            with open(f'{latest}.tmp', 'w') as f:
+                f.write(self.version)
+            os.replace(f'{latest}.tmp', latest)
+
+            logging.info(f"Saved preprocessing model {self.version} to {path}")
+            return path
+
+        except Exception as e:
+            logging.error(f"Error saving preprocessing model: {str(e)}")
+            raise
+
+    @classmethod
+    def load(cls, version: str = 'latest', directory: str = MODEL_DIR) -> 'PreprocessingModel':
+        """
+        Load a saved version ('latest' follows the LATEST pointer)
+        """
+        if version == 'latest':
+            with open(os.path.join(directory, 'LATEST')) as f:
+                version = f.read().strip()
+        path = os.path.join(directory, version)
+        with open(os.path.join(path, 'model.json')) as f:
+            meta = json.load(f)
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported preprocessing model format: {meta['format_version']}")
+
+        model = cls(meta['features'], meta['n_components'])
+        with np.load(os.path.join(path, 'arrays.npz')) as arrays:
+            model.mean_ = arrays['mean']
+            model.scale_ = arrays['scale']
+            model.components_ = arrays['components']
+            model.pca_mean_ = arrays['pca_mean']
+            model.explained_variance_ratio_ = arrays['explained_variance_ratio']
+        model.n_samples_ = meta['n_samples']
+        model.fitted_at = meta['fitted_at']
+        model.version = meta['version']
+        return model
+
+
+def load_or_fit(df: pd.DataFrame, features: Sequence[str] = ANALYSIS_FEATURES,
+                refit: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                directory: str = MODEL_DIR) -> PreprocessingModel:
+    """
+    Reuse the latest saved model for `features`, fitting and saving a new
+    version only when none exists or `refit` is set
+    """
+    if not refit:
+        try:
+            model = PreprocessingModel.load(directory=directory)
+            if model.features == list(features):
+                logging.info(f"Using preprocessing model {model.version}")
+                return model
+            logging.info("Saved preprocessing model has different features; refitting")
+        except FileNotFoundError:
+            pass
+
+    model = PreprocessingModel(features).fit(df, chunk_size)
+    model.save(directory)
+    return model
@@ -0,0 +1,279 @@
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Union
+import logging
+import os
+import threading
+
+try:
+    from .data_lake import DataLake, read_processed
+    from .schema import processed_path
+except ImportError:
+    from data_lake import DataLake, read_processed
+    from schema import processed_path
+
+QUERY_ENGINES = ('auto', 'duckdb', 'pandas')
+
+# Aggregates a rollup can ask for, as SQL templates and pandas equivalents
+SQL_AGGREGATES = {
+    'mean': 'avg({})',
+    'std': 'stddev_samp({})',
+    'var': 'var_samp({})',
+    'count': 'count({})',
+    'sum': 'sum({})',
+    'min': 'min({})',
+    'max': 'max({})',
+    'median': 'quantile_cont({}, 0.5)',
+    'q1': 'quantile_cont({}, 0.25)',
+    'q3': 'quantile_cont({}, 0.75)'
+}
+PANDAS_AGGREGATES = {
+    **{name: name for name in ['mean', 'std', 'var', 'count', 'sum', 'min', 'max', 'median']},
+    'q1': lambda s: s.quantile(0.25),
+    'q3': lambda s: s.quantile(0.75)
+}
+
+# Output column -> (input column, aggregate), as in pandas named aggregation
+Metrics = Dict[str, Tuple[str, str]]
+# Columns of QueryEngine.boxes besides the group keys
+BOX_COLUMNS = ['count', 'min', 'q1', 'median', 'q3', 'max', 'lower_fence', 'upper_fence', 'outliers']
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def duckdb_available() -> bool:
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class QueryEngine:
+    """
+    Grouped rollups over processed datasets or in-memory frames.
+
+    With DuckDB installed, datasets are queried in place: the Parquet parts
+    of the data lake partitions that overlap the date range (or the flat
+    processed file) are scanned with the filters and column list pushed
+    down, and the aggregation runs on `workers` threads. Without it, the
+    same rollups run in pandas on a read limited to the needed columns.
+    """
+
+    def __init__(self, engine: str = 'auto', workers: Optional[int] = None,
+                 lake: Optional[DataLake] = None):
+        if engine not in QUERY_ENGINES:
+            raise ValueError(f"Unknown query engine {engine!r}; expected one of {QUERY_ENGINES}")
+        if engine == 'duckdb' and not duckdb_available():
+            logging.warning("DuckDB is not installed; rollups fall back to pandas")
+        self.backend = 'duckdb' if engine != 'pandas' and duckdb_available() else 'pandas'
+        self.workers = workers
+        self.lake = lake or DataLake()
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _cursor(self):
+        # One connection per engine; each query gets its own cursor so
+        # dashboard callbacks on several threads can run concurrently
+        with self._lock:
+            if self._connection is None:
+                import duckdb
+                self._connection = duckdb.connect()
+                if self.workers:
+                    self._connection.execute(f'SET threads TO {int(self.workers)}')
+            return self._connection.cursor()
+
+    def _scan(self, dataset: str, start, end) -> Optional[str]:
+        """
+        Table expression reading `dataset` in place; None when no file can
+        hold rows in the date range
+        """
+        if self.lake.serves(dataset):
+            files = [
+                os.path.join(self.lake.source_dir(dataset), partition['key'], name)
+                for partition in self.lake.partitions(dataset, start, end)
+                for name in partition['files']
+            ]
+            if not files:
+                return None
+            # Partition directories are pruned above, so their names are not read as columns
+            listing = ', '.join("'" + path.replace("'", "''") + "'" for path in files)
+            return f'read_parquet([{listing}], union_by_name = true, hive_partitioning = false)'
+
+        path = processed_path(dataset)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No processed {dataset} data at {path}")
+        quoted = "'" + path.replace("'", "''") + "'"
+        if path.endswith('.parquet'):
+            return f'read_parquet({quoted})'
+        return f'read_csv({quoted}, header = true)'
+
+    def _table(self, cursor, source, start, end) -> Optional[str]:
+        if isinstance(source, pd.DataFrame):
+            cursor.register('frame', source)
+            return 'frame'
+        return self._scan(source, start, end)
+
+    @staticmethod
+    def _where(by: List[str], start, end, filters: Dict[str, list]) -> Tuple[str, list]:
+        # Rows without a group key are left out, as pandas groupby does
+        conditions, params = [f'{_quote(column)} IS NOT NULL' for column in by], []
+        if start is not None:
+            conditions.append('"date" >= ?')
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            conditions.append('"date" <= ?')
+            params.append(pd.Timestamp(end).to_pydatetime())
+        for column, values in filters.items():
+            conditions.append(f"CAST({_quote(column)} AS VARCHAR) IN ({', '.join('?' * len(values))})")
+            params.extend(str(value) for value in values)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def _duckdb(self, source, by: List[str], metrics: Metrics, start, end,
+                filters: Dict[str, list]) -> pd.DataFrame:
+        cursor = self._cursor()
+        try:
+            table = self._table(cursor, source, start, end)
+            if table is None:
+                return pd.DataFrame(columns=list(by) + list(metrics))
+            where, params = self._where(by, start, end, filters)
+
+            keys = ', '.join(_quote(column) for column in by)
+            aggregates = ', '.join(
+                f'{SQL_AGGREGATES[func].format(_quote(column))} AS {_quote(name)}'
+                for name, (column, func) in metrics.items()
+            )
+            sql = f'SELECT {keys}, {aggregates} FROM {table}{where} GROUP BY {keys} ORDER BY {keys}'
+            return cursor.execute(sql, params).df()
+        finally:
+            cursor.close()
+
+    def _duckdb_boxes(self, source, by: List[str], column: str, metrics: Metrics, start, end,
+                      filters: Dict[str, list]) -> pd.DataFrame:
+        cursor = self._cursor()
+        try:
+            table = self._table(cursor, source, start, end)
+            if table is None:
+                return pd.DataFrame(columns=list(by) + BOX_COLUMNS + list(metrics))
+            where, params = self._where(by, start, end, filters)
+
+            keys = ', '.join(_quote(key) for key in by)
+            value = _quote(column)
+            inputs = ', '.join(_quote(name) for name in
+                               dict.fromkeys([*by, column, *(name for name, _ in metrics.values())]))
+            aggregates = ''.join(
+                f', {SQL_AGGREGATES[func].format(_quote(input_column))} AS {_quote(name)}'
+                for name, (input_column, func) in metrics.items()
+            )
+            # Quartiles per group first, then the observations within and
+            # beyond 1.5 IQR of them
+            sql = f"""
+                WITH selected AS (SELECT {inputs} FROM {table}{where}),
+                quartiles AS (
+                    SELECT {keys}, quantile_cont({value}, 0.25) AS q1, quantile_cont({value}, 0.75) AS q3
+                    FROM selected GROUP BY {keys}
+                ),
+                fences AS (
+                    SELECT *, q1 - 1.5 * (q3 - q1) AS low, q3 + 1.5 * (q3 - q1) AS high FROM quartiles
+                )
+                SELECT {keys}, count({value}) AS "count", min({value}) AS "min", any_value(q1) AS q1,
+                    quantile_cont({value}, 0.5) AS median, any_value(q3) AS q3, max({value}) AS "max",
+                    min({value}) FILTER (WHERE {value} >= low) AS lower_fence,
+                    max({value}) FILTER (WHERE {value} <= high) AS upper_fence,
+                    list({value} ORDER BY {value}) FILTER (WHERE {value} < low OR {value} > high) AS outliers
+                    {aggregates}
+                FROM selected JOIN fences USING ({keys})
+                GROUP BY {keys} ORDER BY {keys}
+            """
+            boxes = cursor.execute(sql, params).df()
+        finally:
+            cursor.close()
+        boxes['outliers'] = [[] if values is None or values is pd.NA else [float(v) for v in values]
+                             for values in boxes['outliers']]
+        return boxes
+
+    def _select(self, source, columns: List[str], start, end,
+                filters: Dict[str, list]) -> pd.DataFrame:
+        if isinstance(source, pd.DataFrame):
+            df = source
+            if start is not None:
+                df = df[df['date'] >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df['date'] <= pd.Timestamp(end)]
+        else:
+            df = read_processed(source, start, end, columns=columns, lake=self.lake)
+        for column, values in filters.items():
+            df = df[df[column].astype(str).isin([str(value) for value in values])]
+        return df
+
+    def _pandas(self, source, by: List[str], metrics: Metrics, start, end,
+                filters: Dict[str, list]) -> pd.DataFrame:
+        columns = list(dict.fromkeys(list(by) + list(filters) + [column for column, _ in metrics.values()]))
+        df = self._select(source, columns, start, end, filters)
+        return df.groupby(list(by), observed=True, sort=True).agg(**{
+            name: (column, PANDAS_AGGREGATES[func]) for name, (column, func) in metrics.items()
+        }).reset_index()
+
+    def _pandas_boxes(self, source, by: List[str], column: str, metrics: Metrics, start, end,
+                      filters: Dict[str, list]) -> pd.DataFrame:
+        columns = list(dict.fromkeys([*by, *filters, column, *(name for name, _ in metrics.values())]))
+        df = self._select(source, columns, start, end, filters).reset_index(drop=True)
+        grouped = df.groupby(list(by), observed=True, sort=True)
+        boxes = grouped.agg(**{
+            name: (input_column, PANDAS_AGGREGATES[func])
+            for name, (input_column, func) in {**box_metrics(column), **metrics}.items()
+        })
+
+        values = df[column].astype('float64')
+        q1 = grouped[column].transform('quantile', 0.25)
+        q3 = grouped[column].transform('quantile', 0.75)
+        inside = values.between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+        keys = [df[key] for key in by]
+        boxes['lower_fence'] = values[inside].groupby(keys, observed=True).min()
+        boxes['upper_fence'] = values[inside].groupby(keys, observed=True).max()
+        beyond = values[~inside & values.notna() & q1.notna()]
+        outliers = beyond.groupby(keys, observed=True).agg(sorted)
+        boxes['outliers'] = [list(outliers.get(group, [])) for group in boxes.index]
+        return boxes[BOX_COLUMNS + list(metrics)].reset_index()
+
+    def boxes(self, source: Union[str, pd.DataFrame], by: List[str], column: str,
+              start=None, end=None, filters: Optional[Dict[str, list]] = None,
+              metrics: Optional[Metrics] = None) -> pd.DataFrame:
+        """
+        Box plot statistics of `column` per group, selected as by rollup: the
+        box_metrics columns, whisker ends at the most extreme observations
+        within 1.5 IQR of the quartiles (lower_fence, upper_fence) and the
+        sorted observations beyond them (outliers, a list per group). Extra
+        `metrics` are computed in the same pass.
+        """
+        metrics = dict(metrics or {})
+        unknown = {func for _, func in metrics.values()} - set(SQL_AGGREGATES)
+        if unknown:
+            raise ValueError(f"Unsupported aggregates: {sorted(unknown)}")
+        filters = {key: list(values) for key, values in (filters or {}).items() if values}
+        run = self._duckdb_boxes if self.backend == 'duckdb' else self._pandas_boxes
+        return run(source, list(by), column, metrics, start, end, filters)
+
+    def rollup(self, source: Union[str, pd.DataFrame], by: List[str], metrics: Metrics,
+               start=None, end=None, filters: Optional[Dict[str, list]] = None) -> pd.DataFrame:
+        """
+        Aggregate `source` (a processed dataset name or a DataFrame) grouped
+        by `by`, limited to rows dated within [start, end] and whose
+        `filters` columns take one of the listed values. Returns one row per
+        group, sorted by `by`.
+        """
+        unknown = {func for _, func in metrics.values()} - set(SQL_AGGREGATES)
+        if unknown:
+            raise ValueError(f"Unsupported aggregates: {sorted(unknown)}")
+        # An empty selection does not filter
+        filters = {column: list(values) for column, values in (filters or {}).items() if values}
+        run = self._duckdb if self.backend == 'duckdb' else self._pandas
+        return run(source, by, metrics, start, end, filters)
+
+
+def box_metrics(column: str) -> Metrics:
+    """
+    Metrics for drawing box plots of `column` from a rollup instead of its rows
+    """
+    return {name: (column, name) for name in ['count', 'min', 'q1', 'median', 'q3', 'max']}
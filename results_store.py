@@ -0,0 +1,223 @@
+import pandas as pd
+import numpy as np
+from collections.abc import Mapping
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import math
+import os
+
+# Numeric lists at least this long are stored as binary arrays
+ARRAY_MIN_LENGTH = 16
+
+
+def _is_numeric_list(value) -> bool:
+    return (
+        isinstance(value, (list, tuple))
+        and len(value) >= ARRAY_MIN_LENGTH
+        and all(v is None or (isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+                for v in value)
+    )
+
+
+def _encode_key(key):
+    if isinstance(key, tuple):
+        return {'__tuple__': [_encode_key(k) for k in key]}
+    return _encode_scalar(key)
+
+
+def _decode_key(key):
+    if isinstance(key, dict) and '__tuple__' in key:
+        return tuple(_decode_key(k) for k in key['__tuple__'])
+    return _decode_scalar(key)
+
+
+def _encode_scalar(value):
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        value = float(value)
+        return value if math.isfinite(value) else {'__float__': repr(value)}
+    if isinstance(value, (pd.Timestamp, datetime, date, np.datetime64)):
+        return {'__datetime__': pd.Timestamp(value).isoformat()} if not pd.isna(value) else None
+    if value is None or isinstance(value, str):
+        return value
+    # Anything else has no typed representation
+    return str(value)
+
+
+def _decode_scalar(value):
+    if isinstance(value, dict):
+        if '__float__' in value:
+            return float(value['__float__'])
+        if '__datetime__' in value:
+            return pd.Timestamp(value['__datetime__'])
+    return value
+
+
+class LazyResults(Mapping):
+    """
+    Read-only view over saved analysis results.
+
+    The metadata document is parsed up front; binary arrays referenced by a
+    top-level section are only read from the archive when that section is
+    first accessed.
+    """
+
+    def __init__(self, metadata: Dict, arrays_path: str):
+        self._metadata = metadata
+        self._arrays_path = arrays_path
+        self._arrays = None
+        self._cache = {}
+
+    def _load_array(self, key: str) -> np.ndarray:
+        if self._arrays is None:
+            self._arrays = np.load(self._arrays_path, allow_pickle=False)
+        return self._arrays[key]
+
+    def _decode(self, node):
+        if isinstance(node, dict):
+            if '__array__' in node:
+                return self._load_array(node['__array__'])
+            if '__items__' in node:
+                return {_decode_key(k): self._decode(v) for k, v in node['__items__']}
+            if '__float__' in node or '__datetime__' in node:
+                return _decode_scalar(node)
+            return {k: self._decode(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [self._decode(v) for v in node]
+        return node
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            self._cache[key] = self._decode(self._metadata[key])
+        return self._cache[key]
+
+    def __iter__(self):
+        return iter(self._metadata)
+
+    def __len__(self):
+        return len(self._metadata)
+
+
+class AnalysisResultsStore:
+    """
+    Typed on-disk store for analysis outputs.
+
+    Scalar results go into a small JSON metadata document and array results
+    into an uncompressed ``.npz`` archive, so each array can be read on its
+    own. NaN, infinities and datetimes round-trip with their types.
+
+    Per-row outputs (cluster labels, PCA coordinates) are written as columns
+    next to the analysis dataset in a Parquet file, so consumers can read just
+    the columns they need.
+    """
+
+    ROWS_FILE = 'analysis_rows.parquet'
+    METADATA_FILE = 'analysis_results_meta.json'
+    ARRAYS_FILE = 'analysis_results_arrays.npz'
+
+    def __init__(self, base_dir='data/analysis_results'):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+
+    @property
+    def rows_path(self) -> str:
+        return os.path.join(self.base_dir, self.ROWS_FILE)
+
+    @property
+    def metadata_path(self) -> str:
+        return os.path.join(self.base_dir, self.METADATA_FILE)
+
+    @property
+    def arrays_path(self) -> str:
+        return os.path.join(self.base_dir, self.ARRAYS_FILE)
+
+    def _split(self, node, path: str, arrays: Dict[str, np.ndarray]):
+        """
+        Move array-like values into `arrays` and return the JSON-safe remainder
+        """
+        if isinstance(node, (pd.Series, pd.Index)):
+            node = node.to_numpy()
+        if isinstance(node, np.ndarray) or _is_numeric_list(node):
+            array = np.asarray(node, dtype=float if isinstance(node, (list, tuple)) else None)
+            if array.dtype != object:
+                arrays[path] = array
+                return {'__array__': path}
+            # Object arrays have no binary form; keep them in the metadata
+            node = array.tolist()
+        if isinstance(node, Mapping):
+            if all(isinstance(k, str) for k in node):
+                return {k: self._split(v, f'{path}/{k}', arrays) for k, v in node.items()}
+            return {'__items__': [
+                [_encode_key(k), self._split(v, f'{path}/{i}', arrays)]
+                for i, (k, v) in enumerate(node.items())
+            ]}
+        if isinstance(node, (list, tuple)):
+            return [self._split(v, f'{path}/{i}', arrays) for i, v in enumerate(node)]
+        return _encode_scalar(node)
+
+    def save_results(self, results: Dict[str, Any]):
+        """
+        Save analysis results as a metadata document plus binary arrays
+        """
+        try:
+            arrays = {}
+            metadata = {key: self._split(value, key, arrays) for key, value in results.items()}
+
+            np.savez(self.arrays_path, **arrays)
+            with open(self.metadata_path, 'w') as f:
+                json.dump(metadata, f, allow_nan=False, separators=(',', ':'))
+
+            logging.info(f"Saved {len(metadata)} result sections and {len(arrays)} arrays")
+
+        except Exception as e:
+            logging.error(f"Error saving analysis results: {str(e)}")
+            raise
+
+    def load_results(self) -> LazyResults:
+        """
+        Load the metadata document; arrays are read on first access
+        """
+        try:
+            with open(self.metadata_path, 'r') as f:
+                metadata = json.load(f)
+            return LazyResults(metadata, self.arrays_path)
+
+        except Exception as e:
+            logging.error(f"Error loading analysis results: {str(e)}")
+            raise
+
+    def write_row_outputs(self, df: pd.DataFrame, outputs: Dict[str, np.ndarray]):
+        """
+        Persist the analysis dataset with per-row outputs attached as columns
+        """
+        try:
+            rows = df.reset_index(drop=True).copy()
+            for column, values in outputs.items():
+                if len(values) != len(rows):
+                    raise ValueError(
+                        f"Output '{column}' has {len(values)} rows, expected {len(rows)}"
+                    )
+                rows[column] = values
+
+            rows.to_parquet(self.rows_path, index=False)
+            logging.info(f"Wrote {len(outputs)} per-row outputs to {self.rows_path}")
+
+        except Exception as e:
+            logging.error(f"Error writing per-row outputs: {str(e)}")
+            raise
+
+    def read_rows(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read the analysis rows, loading only the requested columns
+        """
+        try:
+            return pd.read_parquet(self.rows_path, columns=columns)
+
+        except Exception as e:
+            logging.error(f"Error reading per-row outputs: {str(e)}")
+            raise
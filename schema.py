@@ -0,0 +1,287 @@
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Union
+import io
+import logging
+import os
+
+# Free text stays as Arrow-backed strings; low-cardinality labels become
+# categoricals; counts use nullable small ints; measurements use float32.
+TEXT = 'string[pyarrow]'
+DATETIME = 'datetime64[ns]'
+
+# Calendar attributes joined onto processed rows by integer date key
+TIME_FEATURES = {
+    'date_key': 'Int32',
+    'year': 'Int16',
+    'quarter': 'Int8',
+    'month': 'Int8',
+    'week': 'Int8',
+    'day_of_week': 'Int8',
+    'day_of_year': 'Int16',
+    'is_weekend': 'boolean',
+    'is_holiday': 'boolean',
+    'fiscal_year': 'Int16',
+    'fiscal_quarter': 'Int8',
+    'fiscal_period': 'Int8'
+}
+
+BOOLEAN_VALUES = {True: True, False: False, 'True': True, 'False': False}
+
+PROCESSED_DIR = 'data/processed_data'
+PROCESSED_FORMATS = ('parquet', 'csv')
+# read_csv options read_dataset also honours for Parquet files
+PARQUET_READ_OPTIONS = {'usecols', 'nrows'}
+
+DATASET_SCHEMAS: Dict[str, Dict[str, str]] = {
+    # Raw scraper outputs, before cleaning
+    'pubmed_raw': {
+        'pmid': TEXT,
+        'title': TEXT,
+        'authors': TEXT,
+        'date': TEXT,
+        'source': 'category',
+        # Search terms that found the article, separated by '; '
+        'queries': TEXT
+    },
+    'hospital_raw': {
+        'hospital_name': TEXT,
+        'date': TEXT,
+        'surgery_count': TEXT,
+        'location': 'category'
+    },
+    'statistics_raw': {
+        'source': 'category',
+        'metric': 'category',
+        'value': 'float32',
+        'unit': 'category',
+        # Free-text blob written by scrapers before tables were parsed
+        'data': TEXT,
+        'date': TEXT
+    },
+
+    # Processed datasets
+    'pubmed': {
+        'pmid': TEXT,
+        'title': TEXT,
+        'authors': TEXT,
+        'date': DATETIME,
+        'source': 'category',
+        'queries': TEXT,
+        'first_author': 'category',
+        **TIME_FEATURES
+    },
+    'hospital': {
+        'hospital_name': 'category',
+        'date': DATETIME,
+        'surgery_count': 'Int32',
+        'location': 'category',
+        'surgery_count_outlier': 'bool',
+        **TIME_FEATURES
+    },
+    'statistics': {
+        'source': 'category',
+        'metric': 'category',
+        'value': 'float32',
+        'unit': 'category',
+        'data': TEXT,
+        'date': DATETIME,
+        'mean_value': 'float32',
+        **TIME_FEATURES
+    },
+    'analysis': {
+        'hospital_name': 'category',
+        'date': DATETIME,
+        'surgery_count': 'float32',
+        'location': 'category',
+        'mean_value': 'float32',
+        'statistics_sources': 'Int16',
+        'publication_count': 'float32',
+        'surgery_rate': 'float32',
+        'surgery_count_scaled': 'float32',
+        'mean_value_scaled': 'float32',
+        'publication_count_scaled': 'float32',
+        'surgery_count_outlier': 'bool',
+        **TIME_FEATURES
+    },
+    'calendar': {
+        'date': DATETIME,
+        **TIME_FEATURES
+    },
+
+    # Synthetic test data used by the exploratory analyses
+    'test_data': {
+        'date': DATETIME,
+        'count': 'Int32',
+        'source': 'category',
+        'rate': 'float32',
+        'year': 'Int16',
+        'month': 'Int8'
+    }
+}
+
+
+def _convert(series: pd.Series, dtype: str) -> pd.Series:
+    if dtype == DATETIME:
+        return pd.to_datetime(series, errors='coerce')
+    if dtype == 'boolean':
+        if series.dtype == bool:
+            return series.astype(dtype)
+        # CSV columns with gaps come back as objects or strings
+        return series.map(BOOLEAN_VALUES).astype(dtype)
+    if dtype.startswith(('Int', 'UInt')):
+        return pd.to_numeric(series, errors='coerce').round().astype(dtype)
+    if dtype.startswith('float'):
+        return pd.to_numeric(series, errors='coerce').astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame, dataset: str) -> pd.DataFrame:
+    """
+    Cast the columns of `df` declared for `dataset`; other columns are left as-is
+    """
+    schema = DATASET_SCHEMAS[dataset]
+    for column, dtype in schema.items():
+        if column in df.columns and str(df[column].dtype) != dtype:
+            df[column] = _convert(df[column], dtype)
+    return df
+
+
+def read_dataset(path: str, dataset: str, **kwargs) -> pd.DataFrame:
+    """
+    Read a CSV or Parquet file with the dtypes declared for `dataset`.
+    Keyword arguments go to pd.read_csv; Parquet files accept `usecols`
+    and `nrows` and reject anything else.
+    """
+    if path.endswith('.parquet'):
+        unsupported = sorted(set(kwargs) - PARQUET_READ_OPTIONS)
+        if unsupported:
+            raise TypeError(f"Options {unsupported} are not supported for Parquet files")
+        return apply_schema(_read_parquet(path, kwargs.get('usecols'), kwargs.get('nrows')), dataset)
+
+    df = pd.read_csv(path, dtype=_read_dtypes(dataset), **kwargs)
+    return apply_schema(df, dataset)
+
+
+def _read_parquet(path: str, columns: Optional[List[str]] = None,
+                  nrows: Optional[int] = None) -> pd.DataFrame:
+    if nrows is None:
+        return pd.read_parquet(path, columns=columns)
+
+    # Stop after the batches holding the first `nrows` rows
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    batches, rows = [], 0
+    for batch in parquet.iter_batches(batch_size=max(nrows, 1), columns=columns):
+        if rows >= nrows:
+            break
+        batches.append(batch)
+        rows += batch.num_rows
+    schema = parquet.schema_arrow
+    if columns is not None:
+        schema = pa.schema([schema.field(column) for column in columns])
+    return pa.Table.from_batches(batches, schema=schema).slice(0, nrows).to_pandas()
+
+
+def _read_dtypes(dataset: str) -> Dict[str, str]:
+    # Strings and categoricals are parsed as Arrow strings; numbers and dates
+    # are coerced afterwards so malformed values become missing instead of
+    # failing. Categoricals are cast after the read because the parser infers
+    # float categories for blocks that are entirely empty.
+    return {
+        column: TEXT for column, dtype in DATASET_SCHEMAS[dataset].items()
+        if dtype == TEXT or dtype == 'category'
+    }
+
+
+def iter_dataset(path: str, dataset: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV or Parquet file in typed chunks of at most `chunk_size` rows
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield apply_schema(batch.to_pandas(), dataset)
+        return
+
+    with pd.read_csv(path, dtype=_read_dtypes(dataset), chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, dataset)
+
+
+def processed_path(dataset: str, fmt: Optional[str] = None,
+                   base_dir: str = PROCESSED_DIR) -> str:
+    """
+    Path of a processed dataset in `fmt`; without `fmt`, the most recently
+    written of the Parquet and CSV copies
+    """
+    if fmt:
+        return os.path.join(base_dir, f'{dataset}_processed.{fmt}')
+    candidates = [
+        os.path.join(base_dir, f'{dataset}_processed.{ext}') for ext in PROCESSED_FORMATS
+    ]
+    existing = [path for path in candidates if os.path.exists(path)]
+    return max(existing, key=os.path.getmtime) if existing else candidates[-1]
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Deep memory footprint of a DataFrame in bytes
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(sources: Dict[str, Union[str, pd.DataFrame]],
+                  nrows: Optional[int] = None) -> pd.DataFrame:
+    """
+    Compare the footprint of each dataset loaded untyped versus through its
+    schema. Sources are CSV or Parquet paths, or frames already read with
+    their schema (e.g. from the data lake); Parquet and frames are compared
+    against their rows parsed back from CSV text without a schema.
+    """
+    rows = []
+    for dataset, source in sources.items():
+        if isinstance(source, str) and source.endswith('.csv'):
+            untyped = pd.read_csv(source, nrows=nrows)
+            typed = read_dataset(source, dataset, nrows=nrows)
+        else:
+            if isinstance(source, pd.DataFrame):
+                typed = source.head(nrows) if nrows else source
+            else:
+                typed = read_dataset(source, dataset, nrows=nrows)
+            untyped = pd.read_csv(io.StringIO(typed.to_csv(index=False)))
+        before, after = memory_usage(untyped), memory_usage(typed)
+        rows.append({
+            'dataset': dataset,
+            'before_mb': before / 2 ** 20,
+            'after_mb': after / 2 ** 20,
+            'reduction': 1 - after / before if before else 0.0
+        })
+    return pd.DataFrame(rows).set_index('dataset').round(3)
+
+def main():
+    # The data lake reads through this module, so it is imported here
+    try:
+        from .data_lake import DataLake, read_processed
+        from .settings import load_config
+    except ImportError:
+        from data_lake import DataLake, read_processed
+        from settings import load_config
+
+    # Processed datasets come from the lake or flat files per processing.layout
+    lake = DataLake(layout=load_config().processing.layout)
+    sources = {}
+    for dataset in ['pubmed', 'hospital', 'statistics', 'analysis']:
+        try:
+            sources[dataset] = read_processed(dataset, lake=lake)
+        except FileNotFoundError:
+            logging.info(f"No processed {dataset} data; left out of the memory report")
+    test_data = 'data/raw_data/gallbladder_test_data.csv'
+    if os.path.exists(test_data):
+        sources['test_data'] = test_data
+    report = memory_report(sources)
+    logging.info(f"Memory report:\n{report}")
+    print(report)
+
+if __name__ == "__main__":
+    main()
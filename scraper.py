@@ -1,82 +1,357 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+import re
 import time
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import logging
+from typing import Dict, List, Optional
+from urllib.parse import quote_plus, urlencode
+
+try:
+    from .instrumentation import instrumented
+except ImportError:
+    from instrumentation import instrumented
+
+try:
+    from .settings import Config, StatisticsSource, load_config
+except ImportError:
+    from settings import Config, StatisticsSource, load_config
+
+try:
+    from .parsing import PUBMED_PAGES_DIR, extract_table, parse_pubmed_ids, parse_pubmed_page
+except ImportError:
+    from parsing import PUBMED_PAGES_DIR, extract_table, parse_pubmed_ids, parse_pubmed_page
+
+try:
+    from .http_client import CircuitOpenError, FetchError, HttpClient
+except ImportError:
+    from http_client import CircuitOpenError, FetchError, HttpClient
+
+try:
+    from .data_lake import DataLake
+except ImportError:
+    from data_lake import DataLake
+
+try:
+    from .schema import apply_schema
+except ImportError:
+    from schema import apply_schema
+
+PUBMED_COLUMNS = ['pmid', 'title', 'authors', 'date', 'source', 'queries']
+HOSPITAL_COLUMNS = ['hospital_name', 'date', 'surgery_count', 'location']
+STATISTICS_COLUMNS = ['source', 'metric', 'value', 'unit', 'date']
+# Raw file per scraped dataset
+RAW_FILES = {
+    'pubmed_data': 'data/raw_data/pubmed_data.csv',
+    'hospital_data': 'data/raw_data/hospital_data.csv',
+    'medical_statistics': 'data/raw_data/medical_statistics.csv'
+}
+# Lake dataset holding the history of a dated raw file
+RAW_DATASETS = {
+    'hospital_data': 'hospital_raw',
+    'medical_statistics': 'statistics_raw'
+}
+
+# Search terms that found an article, in the `queries` column
+QUERY_SEPARATOR = '; '
+# PubMed's largest result page
+ID_PAGE_SIZE = 200
+
+def pubmed_url(base_url: str, query: str, page: int, **params) -> str:
+    url = f"{base_url.rstrip('/')}/?term={quote_plus(query)}&page={page}"
+    return f"{url}&{urlencode(params)}" if params else url
+
+def merge_articles(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate article tables, keeping the first row per PMID and the union
+    of the queries that found it. Rows without a PMID are kept as they are.
+    """
+    df = pd.concat([frame.reindex(columns=PUBMED_COLUMNS) for frame in frames], ignore_index=True)
+    df['pmid'] = df['pmid'].astype('string')
+    identified = df[df['pmid'].notna()]
+    queries = (
+        identified[['pmid']]
+        .assign(query=identified['queries'].astype('string').str.split(QUERY_SEPARATOR))
+        .explode('query')
+        .dropna()
+        .drop_duplicates()
+        .groupby('pmid', sort=False)['query']
+        .agg(QUERY_SEPARATOR.join)
+    )
+    first = identified.drop_duplicates('pmid').copy()
+    first['queries'] = first['pmid'].map(queries)
+    return pd.concat([df[df['pmid'].isna()], first]).sort_index()
 
 class GallbladderDataScraper:
-    def __init__(self):
+    def __init__(self, config: Optional[Config] = None):
+        self.config = config or load_config()
+        
         # Set up logging
         logging.basicConfig(
             filename='scraping.log',
-            level=logging.INFO,
+            level=self.config.app.logging_level,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
         # Create directories if they don't exist
         os.makedirs('data/raw_data', exist_ok=True)
         
-        # Initialize selenium driver with headless option
-        self.chrome_options = Options()
-        self.chrome_options.add_argument("--headless")  # Run in headless mode
-        self.chrome_options.add_argument("--no-sandbox")
-        self.chrome_options.add_argument("--disable-dev-shm-usage")
+        # Selenium driver arguments; options are built when a driver is needed
+        self.chrome_arguments = [
+            "--headless",  # Run in headless mode
+            "--no-sandbox",
+            "--disable-dev-shm-usage"
+        ]
         
         # Headers for requests
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        
+        # Shared request layer with retries and per-host circuit breakers
+        self.http = HttpClient(self.config.data_sources.http, self.headers)
+        self.request_delay = self.config.data_sources.http.request_delay
+        
+        # Requests that failed for good; kept alongside the partial results
+        self.failures = []
+
+    def _record_failure(self, source: str, target: str, error: Exception):
+        reason = getattr(error, 'reason', str(error))
+        logging.error(f"Error scraping {source} ({target}): {reason}")
+        self.failures.append({
+            'source': source,
+            'target': target,
+            'error': reason,
+            'time': datetime.now().isoformat(timespec='seconds')
+        })
+
+    def _write_results(self, results, key: str, columns) -> pd.DataFrame:
+        """
+        Write whatever was collected, so one failure does not discard the rest
+        """
+        df = pd.DataFrame(results, columns=columns)
+        self._store_raw(df, key)
+        return df
+
+    def _store_raw(self, df: pd.DataFrame, key: str):
+        """
+        Add one run's rows to the raw file `key` of RAW_FILES.
+
+        Under the partitioned layout the rows go into the data lake under
+        RAW_DATASETS[key], replacing only the partitions from their earliest
+        date on, and the raw file is rewritten from the lake with every
+        run's rows. Under the flat layout the file holds the latest run.
+        """
+        path = RAW_FILES[key]
+        if self.config.processing.layout != 'partitioned':
+            df.to_csv(path, index=False)
+            return
+        lake, dataset = DataLake(), RAW_DATASETS[key]
+        if not lake.has(dataset) and os.path.exists(path):
+            # Start the history from the file earlier runs wrote
+            lake.ingest(path, dataset)
+        if not df.empty:
+            dates = pd.to_datetime(df['date'], errors='coerce')
+            # Undated rows only replace the undated rows of earlier runs
+            lake.write(dataset, [apply_schema(df.copy(), dataset)], since=dates.min() if dates.notna().any() else pd.Timestamp.max)
+        if lake.has(dataset):
+            df = lake.read(dataset)
+        df.to_csv(path, index=False)
+
+    @property
+    def chrome_options(self):
+        """
+        Headless Chrome options (imports Selenium on first use)
+        """
+        from selenium.webdriver.chrome.options import Options
+        options = Options()
+        for argument in self.chrome_arguments:
+            options.add_argument(argument)
+        return options
+
+    def scrape_pubmed_page(self, query: str, page: int):
+        """
+        Fetch and parse one PubMed result page (raises FetchError)
+        """
+        response = self.http.get(pubmed_url(self.config.data_sources.pubmed.base_url, query, page))
+        if self.config.data_sources.pubmed.save_pages:
+            self._save_page(query, page, response.content)
+        return [{**article, 'source': 'PubMed', 'queries': query}
+                for article in parse_pubmed_page(response.content)]
+
+    def _collect_articles(self, parsed, queries: Optional[Dict[str, List[str]]] = None,
+                          query: Optional[str] = None) -> List[Dict]:
+        """
+        Articles from finished parse jobs; `queries` maps PMIDs to the terms
+        that found them, otherwise every article is credited to `query`
+        """
+        results = []
+        for url, future in parsed:
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                self._record_failure('pubmed', url, future.exception())
+                continue
+            for article in future.result():
+                found_by = queries.get(article['pmid'], []) if queries else [query]
+                results.append({**article, 'source': 'PubMed',
+                                'queries': QUERY_SEPARATOR.join(found_by) or None})
+        return results
 
-    def scrape_pubmed(self, query="gallbladder surgery statistics", num_pages=5):
+    @staticmethod
+    def _read_articles(path: str) -> pd.DataFrame:
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=PUBMED_COLUMNS)
+        return pd.read_csv(path, dtype={'pmid': 'string'})
+
+    def _save_page(self, query: str, page: int, content: bytes):
+        os.makedirs(PUBMED_PAGES_DIR, exist_ok=True)
+        name = re.sub(r'\W+', '_', query).strip('_')
+        with open(os.path.join(PUBMED_PAGES_DIR, f'{name}_{page}.html'), 'wb') as f:
+            f.write(content)
+
+    @instrumented()
+    def scrape_pubmed(self, query=None, num_pages=5):
         """
-        Scrape PubMed for gallbladder-related research papers
+        Scrape PubMed for gallbladder-related research papers.
+
+        Pages are parsed in worker processes while the next page is fetched.
+        Pages that still fail after retries are recorded in `self.failures`
+        and skipped; the articles from every other page are merged into
+        pubmed_data.csv by PMID.
         """
         logging.info("Starting PubMed scraping...")
-        base_url = "https://pubmed.ncbi.nlm.nih.gov/"
+        pubmed = self.config.data_sources.pubmed
+        query = query or pubmed.search_terms[0]
+        parsed = []
         results = []
 
         try:
-            for page in range(1, num_pages + 1):
-                url = f"{base_url}/?term={query}&page={page}"
-                response = requests.get(url, headers=self.headers)
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                articles = soup.find_all('article', class_='full-docsum')
-                
-                for article in articles:
-                    title = article.find('a', class_='docsum-title').text.strip()
-                    authors = article.find('span', class_='docsum-authors').text.strip()
-                    date = article.find('span', class_='docsum-journal-cite').text.strip()
+            workers = min(self.config.performance.worker_count, num_pages)
+            with ProcessPoolExecutor(max_workers=max(1, workers)) as parse_pool:
+                for page in range(1, num_pages + 1):
+                    url = pubmed_url(pubmed.base_url, query, page)
+                    try:
+                        response = self.http.get(url)
+                    except CircuitOpenError as e:
+                        # The host is down; the remaining pages would fail the same way
+                        self._record_failure('pubmed', url, e)
+                        break
+                    except FetchError as e:
+                        self._record_failure('pubmed', url, e)
+                        continue
                     
-                    results.append({
-                        'title': title,
-                        'authors': authors,
-                        'date': date,
-                        'source': 'PubMed'
-                    })
-                
-                time.sleep(2)  # Respect rate limits
+                    parsed.append((url, parse_pool.submit(parse_pubmed_page, response.content)))
+                    if pubmed.save_pages:
+                        self._save_page(query, page, response.content)
                 
-            df_pubmed = pd.DataFrame(results)
-            df_pubmed.to_csv('data/raw_data/pubmed_data.csv', index=False)
-            logging.info(f"Successfully scraped {len(results)} articles from PubMed")
-            
-        except Exception as e:
-            logging.error(f"Error scraping PubMed: {str(e)}")
-            return None
+        finally:
+            # Leaving the pool waited for every submitted page
+            results = self._collect_articles(parsed, query=query)
+            path = RAW_FILES['pubmed_data']
+            df_pubmed = merge_articles([self._read_articles(path), pd.DataFrame(results)])
+            df_pubmed.to_csv(path, index=False)
+            logging.info(f"Scraped {len(results)} articles from PubMed")
+        
+        return df_pubmed
+
+    def _search_ids(self, term: str, max_results: int) -> List[str]:
+        """
+        Up to `max_results` PMIDs found by `term`, from PMID-only result pages
+        """
+        base_url = self.config.data_sources.pubmed.base_url
+        pmids = []
+        for page in range(1, -(-max_results // ID_PAGE_SIZE) + 1):
+            url = pubmed_url(base_url, term, page, format='pmid', size=ID_PAGE_SIZE)
+            try:
+                response = self.http.get(url)
+            except CircuitOpenError as e:
+                self._record_failure('pubmed', url, e)
+                break
+            except FetchError as e:
+                self._record_failure('pubmed', url, e)
+                continue
+            page_ids = parse_pubmed_ids(response.content)
+            pmids.extend(page_ids)
+            if len(page_ids) < ID_PAGE_SIZE:
+                break
+        return pmids[:max_results]
 
+    @instrumented()
+    def scrape_pubmed_queries(self, terms=None, max_results=None):
+        """
+        Ingest all configured search terms into pubmed_data.csv.
+
+        The PMIDs found by each term (up to `max_results`) are listed
+        concurrently. Details are fetched and parsed once per PMID that is
+        not in the file yet, in pages of several PMIDs. Rows are appended,
+        and `queries` records every term that found an article, including
+        articles ingested by earlier runs.
+        """
+        logging.info("Starting multi-query PubMed scraping...")
+        pubmed = self.config.data_sources.pubmed
+        terms = list(terms or pubmed.search_terms)
+        max_results = max_results or pubmed.max_results
+        path = RAW_FILES['pubmed_data']
+        existing = self._read_articles(path)
+        known = set(existing['pmid'].dropna()) if 'pmid' in existing else set()
+
+        # The client spaces requests to PubMed, so overlapping the terms
+        # hides latency without raising the request rate
+        with ThreadPoolExecutor(max_workers=max(1, len(terms))) as pool:
+            listings = list(pool.map(lambda term: self._search_ids(term, max_results), terms))
+        # PMID -> terms that found it; shared by all queries, in term order
+        queries: Dict[str, List[str]] = {}
+        for term, pmids in zip(terms, listings):
+            for pmid in pmids:
+                found_by = queries.setdefault(pmid, [])
+                if term not in found_by:
+                    found_by.append(term)
+        new = [pmid for pmid in queries if pmid not in known]
+        logging.info(f"{sum(map(len, listings))} results for {len(terms)} terms: "
+                     f"{len(queries)} distinct PMIDs, {len(new)} not ingested yet")
+
+        batches = [new[i:i + ID_PAGE_SIZE] for i in range(0, len(new), ID_PAGE_SIZE)]
+        parsed = []
+        try:
+            workers = min(self.config.performance.worker_count, len(batches))
+            with ProcessPoolExecutor(max_workers=max(1, workers)) as parse_pool:
+                for batch in batches:
+                    # A term made of PMIDs finds exactly those articles
+                    url = pubmed_url(pubmed.base_url, ' '.join(batch), 1, size=ID_PAGE_SIZE)
+                    try:
+                        response = self.http.get(url)
+                    except CircuitOpenError as e:
+                        self._record_failure('pubmed', url, e)
+                        break
+                    except FetchError as e:
+                        self._record_failure('pubmed', url, e)
+                        continue
+                    parsed.append((url, parse_pool.submit(parse_pubmed_page, response.content)))
+        
+        finally:
+            results = self._collect_articles(parsed, queries=queries)
+            # Known articles found again only add their new terms
+            hits = pd.DataFrame({
+                'pmid': [pmid for pmid in queries if pmid in known],
+                'queries': [QUERY_SEPARATOR.join(queries[pmid]) for pmid in queries if pmid in known]
+            })
+            df_pubmed = merge_articles([existing, pd.DataFrame(results), hits])
+            df_pubmed.to_csv(path, index=False)
+            logging.info(f"Added {len(results)} PubMed articles ({len(df_pubmed)} in total)")
+        
+        return df_pubmed
+
+    @instrumented()
     def scrape_hospital_data(self, hospitals_list):
         """
         Scrape gallbladder surgery data from hospital websites
         """
+        from selenium import webdriver
+        from selenium.common.exceptions import WebDriverException
+
         logging.info("Starting hospital data scraping...")
         results = []
         
@@ -84,95 +359,159 @@ class GallbladderDataScraper:
         
         try:
             for hospital in hospitals_list:
-                url = hospital['url']
-                driver.get(url)
-                
-                # Wait for the content to load
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "body"))
-                )
+                try:
+                    results.append(self.scrape_hospital(driver, hospital))
+                except WebDriverException as e:
+                    # One unreachable hospital does not stop the others
+                    self._record_failure('hospital', hospital['url'], e)
+                    continue
                 
-                # Extract data based on hospital-specific selectors
-                surgery_count = self._extract_surgery_data(driver, hospital['selectors'])
-                
-                results.append({
-                    'hospital_name': hospital['name'],
-                    'date': datetime.now().strftime('%Y-%m-%d'),
-                    'surgery_count': surgery_count,
-                    'location': hospital['location']
-                })
-                
-                time.sleep(2)  # Respect rate limits
-                
-            df_hospitals = pd.DataFrame(results)
-            df_hospitals.to_csv('data/raw_data/hospital_data.csv', index=False)
-            logging.info(f"Successfully scraped data from {len(results)} hospitals")
-            
-        except Exception as e:
-            logging.error(f"Error scraping hospital data: {str(e)}")
+                time.sleep(self.request_delay)  # Respect rate limits
         
         finally:
             driver.quit()
+            self._write_results(results, 'hospital_data', HOSPITAL_COLUMNS)
+            logging.info(f"Scraped data from {len(results)} of {len(hospitals_list)} hospitals")
+
+    def scrape_hospital(self, driver, hospital):
+        """
+        Load one hospital page in `driver` and read its surgery count
+        (raises WebDriverException when the page does not load)
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        driver.get(hospital['url'])
+        
+        # Wait for the content to load
+        WebDriverWait(driver, self.config.data_sources.http.timeout).until(
+            EC.presence_of_element_located((By.TAG_NAME, "body"))
+        )
+        
+        return {
+            'hospital_name': hospital['name'],
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            # Extract data based on hospital-specific selectors
+            'surgery_count': self._extract_surgery_data(driver, hospital['selectors']),
+            'location': hospital['location']
+        }
 
     def _extract_surgery_data(self, driver, selectors):
         """
         Extract surgery data using provided selectors
         """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
         try:
             element = WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, selectors['surgery_count']))
             )
             return element.text
-        except:
+        except TimeoutException:
+            # Page loaded but without the expected element: a missing value
+            logging.warning(f"No element matching {selectors['surgery_count']} on {driver.current_url}")
             return None
 
-    def scrape_medical_statistics(self):
+    def scrape_statistics_source(self, source: StatisticsSource):
+        """
+        One row per metric in the source's statistics table (raises
+        FetchError, or ValueError when the table is missing or changed)
+        """
+        response = self.http.get(source.url)
+        today = datetime.now().strftime('%Y-%m-%d')
+        return [
+            {'source': source.name, 'unit': None, **row, 'date': today}
+            for row in extract_table(response.content, source.table_class, source.columns)
+        ]
+
+    @staticmethod
+    def statistics_frame(results) -> pd.DataFrame:
+        df_stats = pd.DataFrame(results, columns=STATISTICS_COLUMNS)
+        # Values like '9.1%' or '1,204' become numbers; anything else is missing
+        df_stats['value'] = pd.to_numeric(
+            df_stats['value'].astype('string').str.replace(r'[%,\s]', '', regex=True),
+            errors='coerce'
+        )
+        return df_stats
+
+    @instrumented()
+    def scrape_medical_statistics(self, statistics_sources=None):
         """
-        Scrape medical statistics websites for gallbladder-related data
+        Scrape the configured statistics sources concurrently, reading their
+        tables into one typed row per metric
         """
         logging.info("Starting medical statistics scraping...")
-        results = []
-        
-        # Example statistics websites
-        statistics_sources = [
-            {
-                'url': 'https://example-medical-stats.com',
-                'selectors': {'data': '.statistics-table'}
-            }
+        settings = self.config.data_sources.statistics
+        sources = [
+            source if isinstance(source, StatisticsSource) else StatisticsSource(**source)
+            for source in (statistics_sources or settings.sources)
         ]
+        results = []
+        scraped = 0
         
         try:
-            for source in statistics_sources:
-                response = requests.get(source['url'], headers=self.headers)
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Extract statistics
-                stats_element = soup.select_one(source['selectors']['data'])
-                if stats_element:
-                    results.append({
-                        'source': source['url'],
-                        'data': stats_element.text.strip(),
-                        'date': datetime.now().strftime('%Y-%m-%d')
-                    })
-                
-                time.sleep(2)  # Respect rate limits
-            
-            df_stats = pd.DataFrame(results)
-            df_stats.to_csv('data/raw_data/medical_statistics.csv', index=False)
-            logging.info(f"Successfully scraped medical statistics from {len(results)} sources")
-            
-        except Exception as e:
-            logging.error(f"Error scraping medical statistics: {str(e)}")
+            # Sources live on different hosts, so their requests overlap
+            with ThreadPoolExecutor(max_workers=max(1, min(settings.max_workers, len(sources)))) as pool:
+                futures = {pool.submit(self.scrape_statistics_source, source): source
+                           for source in sources}
+                for future in as_completed(futures):
+                    source = futures[future]
+                    try:
+                        results.extend(future.result())
+                    except (FetchError, ValueError) as e:
+                        self._record_failure('statistics', source.url, e)
+                        continue
+                    scraped += 1
+        
+        finally:
+            df_stats = self.statistics_frame(results)
+            if results:
+                self._store_raw(df_stats, 'medical_statistics')
+            else:
+                # Keep the previous statistics rather than replacing them with a bare header
+                logging.warning(f"No statistics scraped from {len(sources)} sources; "
+                                f"{RAW_FILES['medical_statistics']} left unchanged")
+            logging.info(f"Scraped {len(df_stats)} statistics from {scraped} of "
+                         f"{len(sources)} sources")
+        
+        return df_stats
 
-    def combine_data(self):
+    @instrumented()
+    def combine_data(self, shards=False):
         """
-        Combine all scraped data into a single dataset
+        Combine all scraped data into a single dataset.
+
+        With `shards`, the per-task outputs of a work-queue crawl are first
+        merged into the raw files.
         """
         try:
-            # Read all scraped data
-            pubmed_data = pd.read_csv('data/raw_data/pubmed_data.csv')
-            hospital_data = pd.read_csv('data/raw_data/hospital_data.csv')
-            stats_data = pd.read_csv('data/raw_data/medical_statistics.csv')
+            if shards:
+                try:
+                    from .work_queue import read_shards
+                except ImportError:
+                    from work_queue import read_shards
+                for dataset, path in RAW_FILES.items():
+                    df = read_shards(dataset)
+                    if df is None:
+                        continue
+                    if dataset == 'pubmed_data':
+                        # Added to the articles of earlier runs; pages of
+                        # different terms list the same articles
+                        df = merge_articles([self._read_articles(path), df])
+                        df.to_csv(path, index=False)
+                    else:
+                        self._store_raw(df, dataset)
+                    logging.info(f"Merged {len(df)} rows of {dataset} shards into {path}")
+            
+            # Read all scraped data; a source that was not scraped counts as empty
+            pubmed_data, hospital_data, stats_data = [
+                pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+                for path in RAW_FILES.values()
+            ]
             
             # Combine relevant information
             combined_data = {
@@ -180,6 +519,8 @@ class GallbladderDataScraper:
                 'hospitals_reported': len(hospital_data),
                 'statistics_sources': len(stats_data),
                 'last_updated': datetime.now().strftime('%Y-%m-%d'),
+                'failed_requests': self.failures,
+                'request_stats': dict(self.http.stats),
                 'data_sources': {
                     'pubmed': pubmed_data.to_dict(orient='records'),
                     'hospitals': hospital_data.to_dict(orient='records'),
@@ -212,7 +553,7 @@ def main():
     ]
     
     # Run scraping operations
-    scraper.scrape_pubmed()
+    scraper.scrape_pubmed_queries()
     scraper.scrape_hospital_data(hospitals)
     scraper.scrape_medical_statistics()
     scraper.combine_data()
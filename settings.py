@@ -0,0 +1,475 @@
+import copy
+import dataclasses
+import functools
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union, get_args, get_origin, get_type_hints
+
+import yaml
+
+DEFAULT_CONFIG_PATH = 'config.yaml'
+
+# Config is often loaded before a class sets up its log file, so a module
+# logger is used rather than the root one (which would configure itself)
+logger = logging.getLogger(__name__)
+
+
+# Keys that earlier versions accepted but nothing reads; ignored with a warning
+# so existing config files keep loading
+RETIRED_KEYS = {
+    'data_sources.hospitals.base_url',
+    'data_sources.hospitals.endpoints',
+    'processing.feature_engineering.encode_categorical',
+    'analysis.temporal.trend_analysis',
+    'analysis.geographical',
+    'dashboard.default_view',
+    'dashboard.update_interval',
+    'reporting.format',
+    'reporting.template'
+}
+
+
+class ConfigError(ValueError):
+    """
+    Raised when config.yaml or an override does not match the typed schema
+    """
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    name: str = 'Gallbladder Analysis'
+    version: str = '1.0.0'
+    debug: bool = False
+    log_level: str = 'INFO'
+
+    @property
+    def logging_level(self) -> int:
+        return getattr(logging, self.log_level.upper())
+
+    def validate(self):
+        if self.log_level.upper() not in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'):
+            raise ConfigError(f"app.log_level: unknown level {self.log_level!r}")
+
+
+@dataclass(frozen=True)
+class PubMedSourceConfig:
+    base_url: str = 'https://pubmed.ncbi.nlm.nih.gov'
+    search_terms: List[str] = field(default_factory=lambda: ['gallbladder surgery statistics'])
+    max_results: int = 1000
+    # Keep the raw result pages (for re-parsing and the parse benchmark)
+    save_pages: bool = False
+
+    def validate(self):
+        if not self.search_terms:
+            raise ConfigError("data_sources.pubmed.search_terms must not be empty")
+        if self.max_results < 1:
+            raise ConfigError("data_sources.pubmed.max_results must be at least 1")
+
+
+@dataclass(frozen=True)
+class HospitalSourceConfig:
+    regions: List[str] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class StatisticsSource:
+    name: str = ''
+    url: str = ''
+    # Class of the table (or of an element wrapping it) holding the statistics
+    table_class: str = 'statistics-table'
+    # Output field -> header text of the column it is read from
+    columns: Dict[str, str] = field(default_factory=lambda: {
+        'metric': 'Metric', 'value': 'Value', 'unit': 'Unit'
+    })
+
+    def validate(self):
+        if not self.name or not self.url:
+            raise ConfigError("data_sources.statistics.sources entries need a name and a url")
+        if not {'metric', 'value'} <= set(self.columns):
+            raise ConfigError(f"data_sources.statistics source {self.name!r}: "
+                              "columns must map at least metric and value")
+
+
+@dataclass(frozen=True)
+class StatisticsSourcesConfig:
+    # Sources are fetched concurrently by up to this many threads
+    max_workers: int = 8
+    sources: List[StatisticsSource] = field(default_factory=lambda: [
+        StatisticsSource('example-medical-stats', 'https://example-medical-stats.com')
+    ])
+
+    def validate(self):
+        if self.max_workers < 1:
+            raise ConfigError("data_sources.statistics.max_workers must be at least 1")
+
+
+@dataclass(frozen=True)
+class HttpConfig:
+    connect_timeout: float = 5.0
+    timeout: float = 30.0
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    retry_statuses: List[int] = field(default_factory=lambda: [429, 500, 502, 503, 504])
+    # Consecutive failures that open a host's circuit, and seconds until a trial request
+    failure_threshold: int = 5
+    reset_timeout: float = 60.0
+    request_delay: float = 2.0
+
+    def validate(self):
+        if self.connect_timeout <= 0 or self.timeout <= 0:
+            raise ConfigError("data_sources.http timeouts must be positive")
+        if self.max_retries < 0:
+            raise ConfigError("data_sources.http.max_retries must not be negative")
+        if self.backoff_base < 0 or self.backoff_max < 0 or self.request_delay < 0:
+            raise ConfigError("data_sources.http delays must not be negative")
+        if self.failure_threshold < 1:
+            raise ConfigError("data_sources.http.failure_threshold must be at least 1")
+
+
+@dataclass(frozen=True)
+class QueueConfig:
+    path: str = 'data/queue/scrape_queue.db'
+    pages_per_term: int = 5
+    # Seconds a claimed task stays leased before another worker may take it over
+    lease_timeout: float = 300.0
+    max_attempts: int = 3
+    poll_interval: float = 1.0
+
+    def validate(self):
+        if not self.path:
+            raise ConfigError("data_sources.queue.path must not be empty")
+        if self.pages_per_term < 1:
+            raise ConfigError("data_sources.queue.pages_per_term must be at least 1")
+        if self.lease_timeout <= 0 or self.poll_interval <= 0:
+            raise ConfigError("data_sources.queue timeouts must be positive")
+        if self.max_attempts < 1:
+            raise ConfigError("data_sources.queue.max_attempts must be at least 1")
+
+
+@dataclass(frozen=True)
+class DataSourcesConfig:
+    pubmed: PubMedSourceConfig = field(default_factory=PubMedSourceConfig)
+    hospitals: HospitalSourceConfig = field(default_factory=HospitalSourceConfig)
+    statistics: StatisticsSourcesConfig = field(default_factory=StatisticsSourcesConfig)
+    http: HttpConfig = field(default_factory=HttpConfig)
+    queue: QueueConfig = field(default_factory=QueueConfig)
+
+
+@dataclass(frozen=True)
+class CleanDataConfig:
+    remove_duplicates: bool = True
+    handle_missing: str = 'mean'
+    outlier_method: str = 'zscore'
+    outlier_threshold: float = 3.0
+    # Grouping keys for outlier statistics and imputation, most specific first
+    group_by: List[str] = field(default_factory=lambda: ['hospital_name', 'location'])
+
+    def validate(self):
+        if self.outlier_method not in ('zscore', 'mad'):
+            raise ConfigError(
+                f"processing.clean_data.outlier_method must be zscore or mad (got {self.outlier_method!r})"
+            )
+        if self.handle_missing not in ('mean', 'median', 'zero', 'drop', 'none'):
+            raise ConfigError(
+                "processing.clean_data.handle_missing must be one of "
+                f"mean, median, zero, drop, none (got {self.handle_missing!r})"
+            )
+        if self.outlier_threshold <= 0:
+            raise ConfigError("processing.clean_data.outlier_threshold must be positive")
+
+
+@dataclass(frozen=True)
+class FeatureEngineeringConfig:
+    create_time_features: bool = True
+    normalize_numeric: bool = True
+    # Fit a new preprocessing model version instead of reusing the latest one
+    refit_preprocessing: bool = False
+    fiscal_year_start_month: int = 1
+    holiday_calendar: str = 'us_federal'
+
+    def validate(self):
+        if not 1 <= self.fiscal_year_start_month <= 12:
+            raise ConfigError("processing.feature_engineering.fiscal_year_start_month must be 1-12")
+        if self.holiday_calendar not in ('us_federal', 'none'):
+            raise ConfigError(
+                "processing.feature_engineering.holiday_calendar must be us_federal or none "
+                f"(got {self.holiday_calendar!r})"
+            )
+
+
+@dataclass(frozen=True)
+class ProcessingConfig:
+    output_format: str = 'csv'
+    # 'partitioned' writes processed datasets to the data lake by month;
+    # 'flat' writes one file per dataset
+    layout: str = 'partitioned'
+    # Check raw scraper outputs against the declared rules before loading them
+    validate_inputs: bool = True
+    clean_data: CleanDataConfig = field(default_factory=CleanDataConfig)
+    feature_engineering: FeatureEngineeringConfig = field(default_factory=FeatureEngineeringConfig)
+
+    def validate(self):
+        if self.output_format not in ('csv', 'parquet'):
+            raise ConfigError(f"processing.output_format must be csv or parquet (got {self.output_format!r})")
+        if self.layout not in ('flat', 'partitioned'):
+            raise ConfigError(f"processing.layout must be flat or partitioned (got {self.layout!r})")
+
+
+@dataclass(frozen=True)
+class TemporalConfig:
+    seasonality_period: int = 12
+
+    def validate(self):
+        if self.seasonality_period < 2:
+            raise ConfigError("analysis.temporal.seasonality_period must be at least 2")
+
+
+@dataclass(frozen=True)
+class StatisticalConfig:
+    correlation_threshold: float = 0.7
+    significance_level: float = 0.05
+
+    def validate(self):
+        if not 0 <= self.correlation_threshold <= 1:
+            raise ConfigError("analysis.statistical.correlation_threshold must be in [0, 1]")
+        if not 0 < self.significance_level < 1:
+            raise ConfigError("analysis.statistical.significance_level must be in (0, 1)")
+
+
+@dataclass(frozen=True)
+class ClusteringConfig:
+    algorithm: str = 'kmeans'
+    n_clusters: int = 3
+    random_state: Optional[int] = 42
+    # Extra cluster counts to fit in worker processes for an elbow comparison
+    sweep: List[int] = field(default_factory=list)
+
+    def validate(self):
+        if self.algorithm != 'kmeans':
+            raise ConfigError(f"analysis.clustering.algorithm: unsupported {self.algorithm!r}")
+        if self.n_clusters < 1:
+            raise ConfigError("analysis.clustering.n_clusters must be at least 1")
+        if any(k < 1 for k in self.sweep):
+            raise ConfigError("analysis.clustering.sweep values must be at least 1")
+
+
+@dataclass(frozen=True)
+class AnalysisConfig:
+    temporal: TemporalConfig = field(default_factory=TemporalConfig)
+    statistical: StatisticalConfig = field(default_factory=StatisticalConfig)
+    clustering: ClusteringConfig = field(default_factory=ClusteringConfig)
+
+
+@dataclass(frozen=True)
+class ChartConfig:
+    height: int = 400
+    width: int = 600
+
+    def validate(self):
+        if self.height <= 0 or self.width <= 0:
+            raise ConfigError("dashboard.charts sizes must be positive")
+
+
+@dataclass(frozen=True)
+class DashboardConfig:
+    theme: str = 'light'
+    charts: Dict[str, ChartConfig] = field(default_factory=dict)
+
+    def validate(self):
+        if self.theme not in ('light', 'dark'):
+            raise ConfigError(f"dashboard.theme must be light or dark (got {self.theme!r})")
+
+    def chart(self, name: str) -> ChartConfig:
+        return self.charts.get(name, ChartConfig())
+
+
+@dataclass(frozen=True)
+class ReportingConfig:
+    sections: List[str] = field(default_factory=lambda: [
+        'executive_summary', 'methodology', 'results', 'conclusions'
+    ])
+    charts_per_page: int = 2
+    # Interactive charts: 'shared' loads one plotly.js bundle and stores trace
+    # arrays in binary; 'standalone' embeds both in every file
+    html_export: str = 'shared'
+    # Also combine the charts into one lazily drawn report.html
+    html_report: bool = True
+
+    def validate(self):
+        if self.charts_per_page < 1:
+            raise ConfigError("reporting.charts_per_page must be at least 1")
+        if self.html_export not in ('shared', 'standalone'):
+            raise ConfigError(f"reporting.html_export must be shared or standalone (got {self.html_export!r})")
+
+
+@dataclass(frozen=True)
+class PerformanceConfig:
+    workers: Optional[int] = None
+    chunk_size: int = 1_000_000
+    cache_size: int = 32
+    # Rollup backend: auto uses DuckDB when installed, else pandas
+    query_engine: str = 'auto'
+
+    def validate(self):
+        if self.workers is not None and self.workers < 1:
+            raise ConfigError("performance.workers must be at least 1")
+        if self.chunk_size < 1:
+            raise ConfigError("performance.chunk_size must be at least 1")
+        if self.cache_size < 0:
+            raise ConfigError("performance.cache_size must not be negative")
+        if self.query_engine not in ('auto', 'duckdb', 'pandas'):
+            raise ConfigError(f"performance.query_engine must be auto, duckdb or pandas (got {self.query_engine!r})")
+
+    @property
+    def worker_count(self) -> int:
+        return self.workers or os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class Config:
+    app: AppConfig = field(default_factory=AppConfig)
+    data_sources: DataSourcesConfig = field(default_factory=DataSourcesConfig)
+    processing: ProcessingConfig = field(default_factory=ProcessingConfig)
+    analysis: AnalysisConfig = field(default_factory=AnalysisConfig)
+    dashboard: DashboardConfig = field(default_factory=DashboardConfig)
+    reporting: ReportingConfig = field(default_factory=ReportingConfig)
+    performance: PerformanceConfig = field(default_factory=PerformanceConfig)
+
+
+def _coerce(value: Any, hint: Any, where: str) -> Any:
+    """
+    Check `value` against a type hint, converting nested mappings to dataclasses
+    """
+    origin = get_origin(hint)
+    if origin is Union:
+        options = get_args(hint)
+        if value is None and type(None) in options:
+            return None
+        hint = next(option for option in options if option is not type(None))
+        origin = get_origin(hint)
+
+    if dataclasses.is_dataclass(hint):
+        return _build(hint, value, where)
+    if origin in (list, List):
+        if not isinstance(value, list):
+            raise ConfigError(f"{where}: expected a list, got {value!r}")
+        item = get_args(hint)[0]
+        return [_coerce(v, item, f'{where}[{i}]') for i, v in enumerate(value)]
+    if origin in (dict, Dict):
+        if not isinstance(value, dict):
+            raise ConfigError(f"{where}: expected a mapping, got {value!r}")
+        item = get_args(hint)[1]
+        return {str(k): _coerce(v, item, f'{where}.{k}') for k, v in value.items()}
+
+    # bool is an int subclass, so it is checked explicitly both ways
+    if hint is bool:
+        if not isinstance(value, bool):
+            raise ConfigError(f"{where}: expected true/false, got {value!r}")
+        return value
+    if hint is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ConfigError(f"{where}: expected an integer, got {value!r}")
+        return value
+    if hint is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ConfigError(f"{where}: expected a number, got {value!r}")
+        return float(value)
+    if hint is str:
+        if value is None or isinstance(value, (dict, list)):
+            raise ConfigError(f"{where}: expected a string, got {value!r}")
+        return str(value)
+    return value
+
+
+def _build(cls, data: Optional[Dict], where: str = ''):
+    """
+    Instantiate config dataclass `cls` from a parsed YAML mapping and validate it
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ConfigError(f"{where or 'config'}: expected a mapping, got {data!r}")
+
+    hints = get_type_hints(cls)
+    names = {f.name for f in dataclasses.fields(cls)}
+    for name in set(data) - names:
+        key = f'{where}.{name}' if where else name
+        if key in RETIRED_KEYS:
+            logger.warning(f"Config key {key} is no longer used and is ignored")
+            data = {k: v for k, v in data.items() if k != name}
+    unknown = set(data) - names
+    if unknown:
+        raise ConfigError(f"{where or 'config'}: unknown keys {sorted(unknown)}")
+
+    values = {
+        name: _coerce(value, hints[name], f'{where}.{name}' if where else name)
+        for name, value in data.items()
+    }
+    instance = cls(**values)
+    if hasattr(instance, 'validate'):
+        instance.validate()
+    return instance
+
+
+@functools.lru_cache(maxsize=8)
+def _parse(path: str, mtime: float) -> Dict:
+    # Keyed on modification time so an edited file is parsed again
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: top level must be a mapping")
+    return data
+
+
+def parse_overrides(items: List[str]) -> Dict[str, Any]:
+    """
+    Turn `section.key=value` strings into overrides; values are parsed as YAML
+    """
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep or not key.strip():
+            raise ConfigError(f"Override must look like section.key=value: {item!r}")
+        overrides[key.strip()] = yaml.safe_load(value)
+    return overrides
+
+
+def _apply_overrides(data: Dict, overrides: Dict[str, Any]) -> Dict:
+    data = copy.deepcopy(data)
+    for key, value in overrides.items():
+        *parents, leaf = key.split('.')
+        node = data
+        for part in parents:
+            child = node.get(part)
+            if child is None:
+                child = node[part] = {}
+            if not isinstance(child, dict):
+                raise ConfigError(f"Override {key!r}: {part!r} is not a section")
+            node = child
+        node[leaf] = value
+    return data
+
+
+def load_config(path: Optional[str] = None,
+                overrides: Optional[Dict[str, Any]] = None) -> Config:
+    """
+    Load and validate config.yaml into a typed Config.
+
+    Parsing is cached per file version; `overrides` maps dotted keys such as
+    'analysis.clustering.n_clusters' to values for this run only. A missing
+    file gives the built-in defaults.
+    """
+    path = path or os.environ.get('GALLBLADDER_CONFIG', DEFAULT_CONFIG_PATH)
+    try:
+        data = _parse(os.path.abspath(path), os.path.getmtime(path))
+    except FileNotFoundError:
+        logger.warning(f"Config file {path} not found; using defaults")
+        data = {}
+    except yaml.YAMLError as e:
+        raise ConfigError(f"Could not parse {path}: {str(e)}") from e
+
+    if overrides:
+        data = _apply_overrides(data, overrides)
+    return _build(Config, data)
@@ -1,5 +1,5 @@
 # Create setup.py
-from setuptools import setup, find_packages
+from setuptools import setup
 
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
@@ -16,7 +16,9 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/gallbladder_analysis",
-    packages=find_packages(),
+    # The repository root is the gallbladder_analysis package
+    package_dir={"gallbladder_analysis": "."},
+    packages=["gallbladder_analysis"],
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Healthcare Industry",
@@ -30,8 +32,12 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        "duckdb": ["duckdb>=0.9"],
+    },
     entry_points={
         "console_scripts": [
+            "gallbladder=gallbladder_analysis.cli:main",
             "gallbladder-scrape=gallbladder_analysis.cli:scrape",
             "gallbladder-process=gallbladder_analysis.cli:process",
             "gallbladder-analyze=gallbladder_analysis.cli:analyze",
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .data_lake import switch_directory
+except ImportError:
+    from data_lake import switch_directory
+
+SHARED_DIR = 'data/shared'
+MANIFEST = 'manifest.json'
+# Nullable arrays are stored as their value buffer plus a separate mask
+MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+
+def _column_arrays(series: pd.Series) -> Dict:
+    """
+    Split a column into plain NumPy arrays that can be memory-mapped, plus
+    the metadata needed to rebuild it
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return {
+            'kind': 'category',
+            'arrays': {'codes': series.cat.codes.to_numpy()},
+            'categories': [str(c) for c in dtype.categories],
+            'categories_dtype': str(dtype.categories.dtype)
+        }
+    values = series.array
+    if isinstance(values, MASKED_ARRAYS):
+        return {
+            'kind': 'masked',
+            'dtype': str(dtype),
+            'arrays': {'values': values._data, 'mask': values._mask}
+        }
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return {'kind': 'datetime', 'arrays': {'values': series.to_numpy()}}
+    if pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return {'kind': 'numeric', 'arrays': {'values': series.to_numpy()}}
+    raise TypeError(f"Column {series.name!r} of dtype {dtype} cannot be shared")
+
+
+def shareable_columns(df: pd.DataFrame) -> List[str]:
+    """
+    Columns of `df` that export_shared can store (no free-text columns)
+    """
+    columns = []
+    for column in df.columns:
+        try:
+            _column_arrays(df[column].iloc[:0])
+            columns.append(column)
+        except TypeError:
+            continue
+    return columns
+
+
+def export_shared(df: pd.DataFrame, name: str, columns: Optional[Sequence[str]] = None,
+                  directory: str = SHARED_DIR) -> str:
+    """
+    Write the columns of `df` as .npy files that worker processes memory-map.
+
+    The dataset is written to a new directory and the `name` symlink is
+    switched to it in one rename, so attaching readers find the previous or
+    the new export, never a partial or missing one.
+    """
+    try:
+        columns = list(columns) if columns is not None else shareable_columns(df)
+        target = os.path.join(directory, name)
+        staging = f'{target}.{uuid.uuid4().hex[:8]}'
+        os.makedirs(staging)
+
+        manifest = {'rows': len(df), 'columns': {}}
+        for column in columns:
+            spec = _column_arrays(df[column])
+            arrays = spec.pop('arrays')
+            for part, values in arrays.items():
+                np.save(os.path.join(staging, f'{column}.{part}.npy'), np.ascontiguousarray(values))
+            manifest['columns'][column] = spec
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+        switch_directory(target, staging)
+        logging.info(f"Exported {len(columns)} shared columns of {name} ({len(df)} rows)")
+        return target
+
+    except Exception as e:
+        logging.error(f"Error exporting shared dataset {name}: {str(e)}")
+        raise
+
+
+def _load(path: str, column: str, part: str) -> np.ndarray:
+    return np.load(os.path.join(path, f'{column}.{part}.npy'), mmap_mode='r')
+
+
+def attach(name: str, columns: Optional[Sequence[str]] = None,
+           directory: str = SHARED_DIR) -> pd.DataFrame:
+    """
+    Read-only DataFrame over the memory-mapped columns of a shared dataset.
+
+    Pages are shared through the OS page cache, so any number of worker
+    processes can attach without copying or unpickling the data.
+    """
+    path = os.path.join(directory, name)
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    data = {}
+    for column in columns if columns is not None else manifest['columns']:
+        spec = manifest['columns'][column]
+        if spec['kind'] == 'category':
+            categories = pd.Index(spec['categories'], dtype=spec['categories_dtype'])
+            data[column] = pd.Categorical.from_codes(_load(path, column, 'codes'), categories)
+        elif spec['kind'] == 'masked':
+            array_type = pd.api.types.pandas_dtype(spec['dtype']).construct_array_type()
+            data[column] = array_type(_load(path, column, 'values'), _load(path, column, 'mask'))
+        else:
+            data[column] = _load(path, column, 'values')
+    # copy=False keeps each column backed by its own memory map
+    return pd.DataFrame(data, copy=False)
+
@@ -0,0 +1,387 @@
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .cleaning import iter_chunks
+except ImportError:
+    from cleaning import iter_chunks
+
+SKETCH_DIR = 'data/analysis_results/sketches'
+QUANTILE_K = 200
+HLL_PRECISION = 12
+DESCRIBE_QUANTILES = {'25%': 0.25, '50%': 0.5, '75%': 0.75}
+# Key of the monthly summary of rows without a date
+UNDATED = 'undated'
+
+
+def sketch_path(dataset: str, directory: str = SKETCH_DIR) -> str:
+    return os.path.join(directory, f'{dataset}.npz')
+
+
+def month_dir(dataset: str, directory: str = SKETCH_DIR) -> str:
+    return os.path.join(directory, dataset)
+
+
+class Moments:
+    """
+    Count, mean, variance, min and max updated with Welford's method and
+    merged with Chan's parallel formula
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray) -> 'Moments':
+        if len(values):
+            batch = Moments()
+            batch.count = len(values)
+            batch.mean = float(values.mean())
+            batch.m2 = float(((values - batch.mean) ** 2).sum())
+            batch.min = float(values.min())
+            batch.max = float(values.max())
+            self.merge(batch)
+        return self
+
+    def merge(self, other: 'Moments') -> 'Moments':
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+            self.count = count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self) -> float:
+        # Sample standard deviation, as in DataFrame.describe()
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def state(self) -> np.ndarray:
+        return np.array([self.count, self.mean, self.m2, self.min, self.max])
+
+    @classmethod
+    def from_state(cls, state: np.ndarray) -> 'Moments':
+        moments = cls()
+        moments.count = int(state[0])
+        moments.mean, moments.m2, moments.min, moments.max = (float(v) for v in state[1:])
+        return moments
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: level h holds items of weight 2**h, and a full level
+    is compacted by sorting it and promoting every other item. Rank error is
+    about 1.7 / k, independent of the number of rows.
+    """
+
+    def __init__(self, k: int = QUANTILE_K, seed: int = 0):
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            items = np.sort(items)
+            # An odd item out stays behind so total weight is preserved
+            keep, items = (items[:1], items[1:]) if len(items) % 2 else (items[:0], items)
+            promoted = items[self._rng.integers(2)::2]
+            self.levels[level] = keep
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # A new top level shrinks the capacities below it, so start over
+            level = 0
+
+    def update(self, values: np.ndarray) -> 'QuantileSketch':
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return [math.nan] * len(qs)
+        if len(self.levels) == 1:
+            # Nothing compacted yet: exact, interpolated like pandas
+            return [float(v) for v in np.quantile(items, qs)]
+        weights = np.concatenate([np.full(len(items), 2.0 ** level)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, ranks = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(ranks, np.asarray(qs) * ranks[-1], side='left')
+        return [float(v) for v in items[np.minimum(positions, len(items) - 1)]]
+
+
+class DistinctSketch:
+    """
+    HyperLogLog distinct count over 64-bit value hashes; merging takes the
+    register-wise maximum. Standard error is about 1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype='uint8')
+
+    def update(self, values: pd.Series) -> 'DistinctSketch':
+        values = values.dropna()
+        if len(values):
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+            p = self.precision
+            index = (hashes >> np.uint64(64 - p)).astype('int64')
+            rest = hashes << np.uint64(p)
+            # Leading zeros of the remaining bits, from two exact 32-bit halves
+            high = (rest >> np.uint64(32)).astype('float64')
+            low = (rest & np.uint64(0xFFFFFFFF)).astype('float64')
+            with np.errstate(divide='ignore'):
+                zeros = np.where(high > 0, 31 - np.floor(np.log2(high)),
+                                 np.where(low > 0, 63 - np.floor(np.log2(low)), 64))
+            rank = np.minimum(zeros + 1, 64 - p + 1).astype('uint8')
+            np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: 'DistinctSketch') -> 'DistinctSketch':
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype('float64'))
+        empty = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and empty:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / empty)
+        return int(round(estimate))
+
+
+class DatasetSummary:
+    """
+    Mergeable one-pass summary of a dataset: moments and quantiles for the
+    numeric columns, distinct and missing counts for every column. Summaries
+    of chunks or partitions merge into the summary of their union, so saved
+    summaries of unchanged partitions need not be recomputed.
+    """
+
+    def __init__(self, columns: Sequence[str], numeric: Sequence[str] = ()):
+        self.rows = 0
+        self.columns = list(columns)
+        self.numeric = [column for column in self.columns if column in set(numeric)]
+        self.missing = {column: 0 for column in self.columns}
+        self.moments = {column: Moments() for column in self.numeric}
+        self.quantiles = {column: QuantileSketch() for column in self.numeric}
+        self.distinct = {column: DistinctSketch() for column in self.columns}
+
+    def update(self, df: pd.DataFrame) -> 'DatasetSummary':
+        self.rows += len(df)
+        for column in self.columns:
+            self.missing[column] += int(df[column].isna().sum())
+            self.distinct[column].update(df[column])
+        for column in self.numeric:
+            values = df[column].to_numpy(dtype='float64', na_value=np.nan)
+            values = values[~np.isnan(values)]
+            self.moments[column].update(values)
+            self.quantiles[column].update(values)
+        return self
+
+    def merge(self, other: 'DatasetSummary') -> 'DatasetSummary':
+        if other.columns != self.columns or other.numeric != self.numeric:
+            raise ValueError("Cannot merge summaries of different columns")
+        self.rows += other.rows
+        for column in self.columns:
+            self.missing[column] += other.missing[column]
+            self.distinct[column].merge(other.distinct[column])
+        for column in self.numeric:
+            self.moments[column].merge(other.moments[column])
+            self.quantiles[column].merge(other.quantiles[column])
+        return self
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        """
+        DataFrame.describe()-style statistics per numeric column (quantiles approximate)
+        """
+        stats = {}
+        for column in self.numeric:
+            moments = self.moments[column]
+            quantiles = self.quantiles[column].quantiles(list(DESCRIBE_QUANTILES.values()))
+            stats[column] = {
+                'count': float(moments.count),
+                'mean': moments.mean if moments.count else math.nan,
+                'std': moments.std,
+                'min': moments.min if moments.count else math.nan,
+                **dict(zip(DESCRIBE_QUANTILES, quantiles)),
+                'max': moments.max if moments.count else math.nan
+            }
+        return stats
+
+    def missing_values(self) -> Dict[str, int]:
+        return dict(self.missing)
+
+    def unique_values(self) -> Dict[str, int]:
+        return {column: sketch.estimate() for column, sketch in self.distinct.items()}
+
+    def save(self, path: str):
+        """
+        Write the sketch state to one .npz file, replacing it atomically
+        """
+        try:
+            arrays = {}
+            for i, column in enumerate(self.columns):
+                arrays[f'distinct_{i}'] = self.distinct[column].registers
+            for i, column in enumerate(self.numeric):
+                arrays[f'moments_{i}'] = self.moments[column].state()
+                for level, items in enumerate(self.quantiles[column].levels):
+                    arrays[f'quantiles_{i}_{level}'] = items
+            meta = {
+                'rows': self.rows,
+                'columns': self.columns,
+                'numeric': self.numeric,
+                'missing': self.missing,
+                'levels': [len(self.quantiles[column].levels) for column in self.numeric]
+            }
+            arrays['meta'] = np.array(json.dumps(meta))
+
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(f'{path}.tmp', 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(f'{path}.tmp', path)
+
+        except Exception as e:
+            logging.error(f"Error saving summary sketches to {path}: {str(e)}")
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'DatasetSummary':
+        with np.load(path) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            summary = cls(meta['columns'], meta['numeric'])
+            summary.rows = meta['rows']
+            summary.missing = meta['missing']
+            for i, column in enumerate(summary.columns):
+                summary.distinct[column].registers = arrays[f'distinct_{i}'].copy()
+            for i, column in enumerate(summary.numeric):
+                summary.moments[column] = Moments.from_state(arrays[f'moments_{i}'])
+                summary.quantiles[column].levels = [
+                    arrays[f'quantiles_{i}_{level}'] for level in range(meta['levels'][i])
+                ]
+        return summary
+
+
+def _summarize_chunk(chunk: pd.DataFrame, columns: List[str], numeric: List[str]) -> DatasetSummary:
+    return DatasetSummary(columns, numeric).update(chunk)
+
+
+def summarize(df: pd.DataFrame, numeric: Optional[Sequence[str]] = None,
+              chunk_size: int = 1_000_000, max_workers: Optional[int] = 1) -> DatasetSummary:
+    """
+    Summarize `df` in `chunk_size` slices, in worker processes when there is
+    more than one chunk and `max_workers` allows, and merge the partial
+    summaries. `numeric` defaults to the numeric columns of `df`.
+    """
+    columns = list(df.columns)
+    if numeric is None:
+        numeric = df.select_dtypes(include=[np.number]).columns
+    numeric = [column for column in columns if column in set(numeric)]
+
+    summary = DatasetSummary(columns, numeric)
+    chunks = list(iter_chunks(df, chunk_size))
+    if len(chunks) == 1 or max_workers == 1:
+        for chunk in chunks:
+            summary.update(chunk)
+        return summary
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for partial in pool.map(_summarize_chunk, chunks, repeat(columns), repeat(numeric)):
+            summary.merge(partial)
+    return summary
+
+
+def summarize_months(df: pd.DataFrame, directory: str, since=None,
+                     numeric: Optional[Sequence[str]] = None, chunk_size: int = 1_000_000,
+                     max_workers: Optional[int] = 1) -> DatasetSummary:
+    """
+    Summary of a dated dataset merged from one saved summary per month of
+    `date` (and one for undated rows) in `directory`.
+
+    Without `since`, `df` is the whole dataset and every month is summarized
+    and saved again. With `since`, `df` holds the rows dated from the first
+    day of the cutoff's month on, as after an incremental run: those months
+    are summarized and replace their saved summaries (months no longer
+    present are removed), and the saved earlier months and undated rows are
+    merged in unchanged. Undated rows in `df` replace the saved ones.
+    """
+    columns = list(df.columns)
+    if numeric is None:
+        numeric = df.select_dtypes(include=[np.number]).columns
+    numeric = [column for column in columns if column in set(numeric)]
+    keys = df['date'].dt.strftime('%Y-%m').fillna(UNDATED)
+
+    os.makedirs(directory, exist_ok=True)
+    saved = {name[:-len('.npz')] for name in os.listdir(directory) if name.endswith('.npz')}
+    first = pd.Timestamp(since).strftime('%Y-%m') if since is not None else None
+    present = set(keys.unique())
+    kept = {
+        month for month in saved
+        if first is not None and month not in present and (month == UNDATED or month < first)
+    }
+    for month in saved - kept:
+        os.remove(os.path.join(directory, f'{month}.npz'))
+
+    tasks = [(month, chunk) for month, rows in df.groupby(keys, sort=True)
+             for chunk in iter_chunks(rows, chunk_size)]
+    months: Dict[str, DatasetSummary] = {}
+    if len(tasks) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            partials = list(pool.map(_summarize_chunk, [chunk for _, chunk in tasks],
+                                     repeat(columns), repeat(numeric)))
+    else:
+        partials = [_summarize_chunk(chunk, columns, numeric) for _, chunk in tasks]
+    for (month, _), partial in zip(tasks, partials):
+        if month in months:
+            months[month].merge(partial)
+        else:
+            months[month] = partial
+    for month, summary in months.items():
+        summary.save(os.path.join(directory, f'{month}.npz'))
+
+    summary = DatasetSummary(columns, numeric)
+    for month in sorted(kept):
+        previous = DatasetSummary.load(os.path.join(directory, f'{month}.npz'))
+        if previous.columns != columns or previous.numeric != numeric:
+            raise ValueError(f"Saved summary of {month} in {directory} has other columns; "
+                             f"run without since to rebuild it")
+        summary.merge(previous)
+    for month in sorted(months):
+        summary.merge(months[month])
+    return summary
@@ -0,0 +1,203 @@
+import argparse
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+ARTICLES_PER_PAGE = 10
+# Search results are drawn from this many articles, so different terms overlap
+PMID_BASE = 30000000
+ARTICLE_POOL = 1500
+MATCHES_PER_TERM = 600
+
+
+class FaultConfig:
+    """
+    Faults injected by the stub server: random 503s (with Retry-After),
+    responses slower than a client timeout, dropped connections, and a
+    fixed number of failures for the first requests to each path
+    """
+
+    def __init__(self, error_rate: float = 0.0, slow_rate: float = 0.0, delay: float = 0.0,
+                 drop_rate: float = 0.0, fail_first: int = 0, retry_after: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.delay = delay
+        self.drop_rate = drop_rate
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+def search_pmids(term: str) -> List[int]:
+    """
+    PMIDs matching `term`, newest first. A term made only of numbers is a
+    list of PMIDs and matches exactly those.
+    """
+    if re.fullmatch(r'[\d\s,]+', term.strip()):
+        return [int(pmid) for pmid in re.findall(r'\d+', term)]
+    matches = random.Random(term.lower()).sample(range(ARTICLE_POOL), MATCHES_PER_TERM)
+    return sorted((PMID_BASE + i for i in matches), reverse=True)
+
+
+def _page_slice(pmids: List[int], page: int, size: int) -> List[int]:
+    return pmids[(page - 1) * size:page * size]
+
+
+def pmid_page(term: str, page: int, size: int) -> str:
+    """
+    The PMID-only listing (format=pmid) of one result page
+    """
+    pmids = '\n'.join(str(pmid) for pmid in _page_slice(search_pmids(term), page, size))
+    return f'<html><body><pre class="search-results-chunk">{pmids}</pre></body></html>'
+
+
+def pubmed_page(term: str, page: int, size: int = ARTICLES_PER_PAGE) -> str:
+    """
+    A search results page shaped like PubMed's: the articles sit among
+    scripts, navigation and a filter sidebar that make up most of the page
+    """
+    articles = ''.join(
+        f'<article class="full-docsum"><div class="docsum-wrap"><div class="docsum-content">'
+        f'<a class="docsum-title" href="/{pmid}/">Gallbladder surgery outcomes: cohort {pmid}</a>'
+        f'<div class="docsum-citation"><span class="docsum-authors">Author{pmid % 97} A, '
+        f'Author{pmid % 13} B</span>'
+        f'<span class="docsum-journal-cite">Ann Surg. {2015 + pmid % 8} Jan</span>'
+        f'<span class="citation-part">PMID: <span class="docsum-pmid">{pmid}</span></span></div>'
+        f'<div class="full-view-snippet">{"Outcomes after elective surgery were compared. " * 8}</div>'
+        f'</div></div></article>'
+        for pmid in _page_slice(search_pmids(term), page, size)
+    )
+    filters = ''.join(
+        f'<li class="filter-item"><input type="checkbox" id="filter-{i}">'
+        f'<label for="filter-{i}">Filter option {i}</label><span class="count">{i * 37}</span></li>'
+        for i in range(400)
+    )
+    script = '<script>window.config = {' + ','.join(f'"k{i}": {i}' for i in range(3000)) + '};</script>'
+    return (f'<html><head><title>{term} - Search Results</title>{script}</head><body>'
+            f'<nav class="header">{"<a href=/x>Link</a>" * 50}</nav>'
+            f'<aside class="side-timeline-filters"><ul>{filters}</ul></aside>'
+            f'<div class="search-results">{articles}</div>'
+            f'<footer>{"<p>Footer text</p>" * 50}</footer></body></html>')
+
+
+def statistics_page(name: str) -> str:
+    rows = ''.join(
+        f'<tr><td>{metric}</td><td>{value}</td><td>%</td></tr>'
+        for metric, value in [('Cholecystectomy rate', '9.1%'), ('Complication rate', '2.3'),
+                              ('Readmission rate', 'n/a')]
+    )
+    return (f'<html><body><h1>{name}</h1><div class="statistics-table"><table>'
+            f'<thead><tr><th>Metric</th><th>Value</th><th>Unit</th></tr></thead>'
+            f'<tbody>{rows}</tbody></table></div></body></html>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves PubMed-style search pages (and PMID listings with format=pmid)
+    under /pubmed/ and statistics pages under /stats/<name>, subject to the
+    server's FaultConfig
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        faults: FaultConfig = server.faults
+        parts = urlsplit(self.path)
+        with server.lock:
+            server.stats['requests'] += 1
+            seen = server.seen[parts.path]
+            server.seen[parts.path] += 1
+            roll = faults.random.random()
+
+        if seen < faults.fail_first or roll < faults.error_rate:
+            server.stats['errors'] += 1
+            self.send_response(503)
+            if faults.retry_after is not None:
+                self.send_header('Retry-After', str(faults.retry_after))
+            self.end_headers()
+            return
+        if roll < faults.error_rate + faults.drop_rate:
+            server.stats['dropped'] += 1
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if roll < faults.error_rate + faults.drop_rate + faults.slow_rate:
+            server.stats['slow'] += 1
+            time.sleep(faults.delay)
+
+        if parts.path.rstrip('/') == '/pubmed':
+            query = parse_qs(parts.query)
+            term, page = query.get('term', [''])[0], int(query.get('page', ['1'])[0])
+            size = int(query.get('size', [str(ARTICLES_PER_PAGE)])[0])
+            if query.get('format') == ['pmid']:
+                body = pmid_page(term, page, size)
+            else:
+                body = pubmed_page(term, page, size)
+        elif parts.path.startswith('/stats/'):
+            body = statistics_page(parts.path.rsplit('/', 1)[-1])
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        data = body.encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting (timeout)
+            pass
+
+
+def start_stub_server(port: int = 0, faults: Optional[FaultConfig] = None) -> ThreadingHTTPServer:
+    """
+    Start the stub server on a background thread; `server.server_address`
+    gives the bound port and `server.shutdown()` stops it
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.faults = faults or FaultConfig()
+    server.lock = threading.Lock()
+    server.stats = Counter()
+    server.seen = Counter()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fault-injecting server for scraper testing')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='share of connections dropped')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='share of responses delayed')
+    parser.add_argument('--delay', type=float, default=5.0, help='seconds a slow response takes')
+    parser.add_argument('--fail-first', type=int, default=0, help='503s before each path succeeds')
+    parser.add_argument('--retry-after', type=float, help='Retry-After seconds sent with 503s')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    faults = FaultConfig(args.error_rate, args.slow_rate, args.delay, args.drop_rate,
+                         args.fail_first, args.retry_after, args.seed)
+    server = start_stub_server(args.port, faults)
+    print(f"Stub server on http://127.0.0.1:{server.server_address[1]} "
+          f"(PubMed: /pubmed, statistics: /stats/<name>); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(dict(server.stats))
+
+if __name__ == "__main__":
+    main()
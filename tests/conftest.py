@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The repository root is the gallbladder_analysis package; register it under
+# that name so the root-level gallbladder_analysis.py script does not shadow it
+if 'gallbladder_analysis' not in sys.modules or not hasattr(sys.modules['gallbladder_analysis'], '__path__'):
+    spec = importlib.util.spec_from_file_location(
+        'gallbladder_analysis', os.path.join(ROOT, '__init__.py'), submodule_search_locations=[ROOT]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules['gallbladder_analysis'] = package
+    spec.loader.exec_module(package)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Run in an empty directory; the pipeline reads and writes under data/
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def repo_config():
+    """
+    The repository's config.yaml, which lists the accepted regions
+    """
+    from gallbladder_analysis.settings import load_config
+    return load_config(os.path.join(ROOT, 'config.yaml'))
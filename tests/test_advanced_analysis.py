@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from gallbladder_analysis.advanced_analysis import AdvancedGallbladderAnalysis
+
+
+class _Exporter:
+    def __init__(self):
+        self.figures = {}
+
+    def export(self, fig, name):
+        self.figures[name] = fig
+
+
+def test_seasonal_analysis_handles_per_hospital_rows_with_gaps(workdir):
+    os.makedirs('data/analysis_results')
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2018-01-01', periods=2 * 365)
+    df = pd.DataFrame({
+        'date': np.tile(dates, 3),
+        'count': rng.poisson(20, 3 * len(dates)).astype('float64'),
+        'source': np.repeat(['Hospital A', 'Hospital B', 'Hospital C'], len(dates))
+    })
+    df.loc[rng.random(len(df)) < 0.05, 'count'] = np.nan
+
+    exporter = _Exporter()
+    analysis = AdvancedGallbladderAnalysis(df=df, exporter=exporter)
+    analysis.seasonal_analysis()
+    analysis.stationarity_test()
+
+    observed = exporter.figures['seasonal_decomposition'].data[0]
+    assert len(observed.x) == len(dates)
+    assert os.path.exists('data/analysis_results/stationarity_test.txt')
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from gallbladder_analysis.analysis import GallbladderAnalysis, daily_counts
+
+
+class _Exporter:
+    def __init__(self):
+        self.figures = {}
+
+    def export(self, fig, name):
+        self.figures[name] = fig
+
+
+def _per_hospital(days=60):
+    dates = pd.date_range('2019-01-01', periods=days)
+    df = pd.DataFrame({
+        'date': np.tile(dates, 3),
+        'count': np.repeat([10.0, 20.0, 30.0], days),
+        'source': np.repeat(['Hospital A', 'Hospital B', 'Hospital C'], days)
+    })
+    df.loc[[5, days + 5, 2 * days + 5], 'count'] = np.nan
+    df.loc[7, 'count'] = np.nan
+    return df
+
+
+def test_daily_counts_totals_sources_and_interpolates_empty_days():
+    counts = daily_counts(_per_hospital())
+
+    assert counts.index.is_unique and len(counts) == 60
+    assert counts.iloc[0] == 60
+    assert counts.loc['2019-01-06'] == 60  # no source observed that day
+    assert counts.loc['2019-01-08'] == 50  # one source missing
+
+
+def test_time_series_plots_one_point_per_day(workdir):
+    exporter = _Exporter()
+    analysis = GallbladderAnalysis(df=_per_hospital(), exporter=exporter)
+    analysis.basic_time_series_plot()
+    analysis.monthly_trends()
+
+    assert len(exporter.figures['time_series'].data[0].x) == 60
+    assert exporter.figures['monthly_trends'].data[0].y.max() > 50
@@ -0,0 +1,15 @@
+import pandas as pd
+
+from gallbladder_analysis.analyzer import GallbladderAnalyzer
+
+
+def test_measures_leave_out_calendar_and_scaled_columns():
+    df = pd.DataFrame({
+        'surgery_count': [1.0, 2.0],
+        'surgery_count_scaled': [-1.0, 1.0],
+        'mean_value': [0.5, 0.7],
+        'month': [1, 2],
+        'location': ['North', 'South']
+    })
+
+    assert list(GallbladderAnalyzer._measures(df).columns) == ['surgery_count', 'mean_value']
@@ -0,0 +1,66 @@
+import glob
+import os
+
+import pandas as pd
+
+from gallbladder_analysis.data_lake import UNDATED, DataLake
+
+
+def _hospital(dates, count):
+    return pd.DataFrame({
+        'hospital_name': [f'Hospital {i}' for i in range(len(dates))],
+        'date': pd.to_datetime(dates),
+        'surgery_count': count
+    })
+
+
+def test_incremental_write_keeps_undated_rows(workdir):
+    lake = DataLake()
+    lake.write('hospital', [_hospital(['2019-01-15', '2019-02-15', None, None], 1)])
+    lake.write('hospital', [_hospital(['2019-02-15', '2019-03-15'], 2)], since='2019-02-01')
+
+    df = lake.read('hospital')
+    assert len(df) == 5
+    assert df['date'].isna().sum() == 2
+    assert df.loc[df['date'] >= '2019-02-01', 'surgery_count'].eq(2).all()
+
+    # Undated rows in the new data replace the old ones
+    lake.write('hospital', [_hospital(['2019-03-15', None], 3)], since='2019-03-01')
+    undated = [partition for partition in lake.partitions('hospital') if partition['key'] == UNDATED]
+    assert undated[0]['rows'] == 1
+    assert len(lake.read('hospital')) == 4
+
+
+def test_writes_switch_versions_through_a_symlink(workdir):
+    lake = DataLake()
+    target = lake.source_dir('hospital')
+    # A source directory written before versioned writes
+    lake.write('hospital', [_hospital(['2019-01-15'], 1)])
+    os.replace(os.path.realpath(target), f'{target}.legacy')
+    os.remove(target)
+    os.replace(f'{target}.legacy', target)
+    # Left behind by an interrupted write
+    os.makedirs(f'{target}.123')
+
+    for count in (2, 3):
+        lake.write('hospital', [_hospital(['2019-01-15'], count)])
+        assert os.path.islink(target)
+        version = os.path.join(lake.base_dir, os.readlink(target))
+        assert sorted(glob.glob(f'{target}*')) == [target, version]
+        assert lake.read('hospital')['surgery_count'].tolist() == [count]
+
+    lake.drop('hospital')
+    assert glob.glob(f'{target}*') == []
+
+
+def test_reingests_a_changed_source_file(workdir):
+    lake = DataLake()
+    _hospital(['2019-01-15'], 1).to_csv('hospital.csv', index=False)
+    lake.ingest('hospital.csv', 'hospital')
+    assert lake.is_current('hospital', 'hospital.csv')
+
+    # Same size, one nanosecond later
+    _hospital(['2019-01-15'], 2).to_csv('hospital.csv', index=False)
+    stat = os.stat('hospital.csv')
+    os.utime('hospital.csv', ns=(stat.st_atime_ns, lake.manifest('hospital')['source_stat'][0] + 1))
+    assert not lake.is_current('hospital', 'hospital.csv')
@@ -0,0 +1,37 @@
+import pytest
+
+from gallbladder_analysis.generate_test_data import generate_fixtures
+from gallbladder_analysis.validation import rules_for, validate_file
+
+
+def test_fixtures_for_every_region_pass_validation(workdir, repo_config):
+    regions = repo_config.data_sources.hospitals.regions
+    generate_fixtures(n_hospitals=12, n_locations=len(regions), years=1, n_articles=50,
+                      n_sources=2, output_dir='data/raw_data', regions=regions)
+
+    rules = rules_for('hospital_raw', repo_config)
+    assert any(rule['check'] == 'allowed' for rule in rules)
+    report = validate_file('data/raw_data/hospital_data.csv', 'hospital_raw', rules, report_dir=None)
+
+    assert report['passed'], report['issues']
+
+
+def test_more_locations_than_regions_are_rejected(workdir, repo_config):
+    regions = repo_config.data_sources.hospitals.regions
+    with pytest.raises(ValueError, match='regions'):
+        generate_fixtures(n_hospitals=12, n_locations=len(regions) + 1, years=1,
+                          output_dir='data/raw_data', regions=regions)
+
+
+def test_duplicates_are_only_injected_into_the_raw_scrapes(workdir, repo_config):
+    rows = generate_fixtures(n_hospitals=12, n_locations=2, years=1, n_articles=50, n_sources=2,
+                             duplicate_rate=0.05, output_dir='data/raw_data',
+                             regions=repo_config.data_sources.hospitals.regions)
+    assert rows['hospital_data.csv'] > rows['gallbladder_test_data.csv'] == 12 * 365
+
+    hospital = validate_file('data/raw_data/hospital_data.csv', 'hospital_raw',
+                             rules_for('hospital_raw', repo_config), report_dir=None)
+    assert hospital['passed'] and hospital['warnings'] == 1
+    test_data = validate_file('data/raw_data/gallbladder_test_data.csv', 'test_data',
+                              rules_for('test_data', repo_config), report_dir=None)
+    assert test_data['passed'], test_data['issues']
@@ -0,0 +1,75 @@
+import base64
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from gallbladder_analysis.html_export import HtmlExporter, compact_figure, supports_typed_arrays
+
+
+def _decode(spec):
+    dtype = {'f4': 'float32', 'f8': 'float64', 'i1': 'int8', 'i2': 'int16', 'i4': 'int32'}[spec['dtype']]
+    return np.frombuffer(base64.b64decode(spec['bdata']), dtype)
+
+
+@pytest.fixture
+def figure():
+    dates = pd.date_range('2023-01-01', periods=50, freq='D')
+    fig = go.Figure(go.Scatter(x=dates.to_numpy(), y=np.linspace(0, 1, 50), mode='lines'))
+    fig.add_bar(x=['North', 'South'], y=[3, 400])
+    fig.update_layout(title='Daily surgeries')
+    return fig
+
+
+def test_compact_figure_encodes_numbers_and_dates(figure):
+    compact = compact_figure(figure)
+    line, bars = compact['data']
+
+    assert line['y']['dtype'] == 'f4'
+    np.testing.assert_allclose(_decode(line['y']), np.linspace(0, 1, 50), rtol=1e-6)
+    assert line['x']['dtype'] == 'f8'
+    assert _decode(line['x'])[0] == pd.Timestamp('2023-01-01').value // 10 ** 6
+    assert compact['layout']['xaxis']['type'] == 'date'
+    # Small integers narrow to the smallest fitting type; categories stay as-is
+    assert bars['y']['dtype'] == 'i2'
+    assert list(bars['x']) == ['North', 'South']
+
+
+def test_typed_arrays_need_a_recent_plotlyjs():
+    assert supports_typed_arrays('2.28.0') and supports_typed_arrays('3.0.1')
+    assert not supports_typed_arrays('2.27.1')
+
+
+def test_shared_mode_writes_one_bundle_and_a_lazy_report(figure, tmp_path):
+    exporter = HtmlExporter('shared', output_dir=str(tmp_path))
+    exporter.export(figure, 'time_series')
+    exporter.export(figure, 'custom_chart')
+    exporter.export(figure, 'hospital_comparison')
+
+    bundles = [name for name in os.listdir(tmp_path) if name.startswith('plotly-')]
+    assert len(bundles) == 1
+    chart = (tmp_path / 'time_series.html').read_text()
+    assert f'src="{bundles[0]}"' in chart and 'bdata' in chart
+
+    with open(exporter.write_report()) as f:
+        page = f.read()
+    assert page.count('<section') == 3
+    # Pipeline charts come first, in pipeline order
+    assert page.index('id="time_series"') < page.index('id="hospital_comparison"') < page.index('id="custom_chart"')
+    assert '<h2>Daily surgeries</h2>' in page
+    assert page.count('application/json') == 3 and 'IntersectionObserver' in page
+    with open(tmp_path / 'charts' / 'time_series.json') as f:
+        assert json.load(f)['data'][0]['y']['dtype'] == 'f4'
+
+
+def test_standalone_mode_without_report(figure, tmp_path):
+    exporter = HtmlExporter('standalone', report=False, output_dir=str(tmp_path))
+    exporter.export(figure, 'time_series')
+
+    assert os.listdir(tmp_path) == ['time_series.html']
+    assert exporter.write_report() is None
+    with pytest.raises(ValueError):
+        HtmlExporter('inline', output_dir=str(tmp_path))
@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from gallbladder_analysis.http_client import CircuitBreaker, CircuitOpenError, FetchError, HttpClient
+from gallbladder_analysis.settings import HttpConfig
+from gallbladder_analysis.stub_server import FaultConfig, start_stub_server
+
+
+class RecordingSession:
+    def __init__(self):
+        self.started = []
+
+    def get(self, url, **kwargs):
+        self.started.append((url, time.monotonic()))
+        return SimpleNamespace(status_code=200, headers={})
+
+
+def test_requests_to_one_host_are_spaced_across_threads():
+    session = RecordingSession()
+    client = HttpClient(HttpConfig(request_delay=0.05), session=session)
+
+    urls = [f'http://pubmed.test/?page={page}' for page in range(4)] + ['http://stats.test/table']
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        list(pool.map(client.get, urls))
+
+    starts = {url: start for url, start in session.started}
+    pubmed = sorted(start for url, start in starts.items() if 'pubmed' in url)
+    # Allowing for thread scheduling between the slot and the recorded start
+    assert all(later - earlier > 0.04 for earlier, later in zip(pubmed, pubmed[1:]))
+    # Another host does not wait for PubMed's slots
+    assert starts['http://stats.test/table'] - min(pubmed) < 0.05
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**faults):
+        server = start_stub_server(port=0, faults=FaultConfig(seed=0, **faults))
+        servers.append(server)
+        return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(clock=time.monotonic, **config):
+    delays = []
+    client = HttpClient(HttpConfig(request_delay=0, **config), sleep=delays.append, clock=clock)
+    return client, delays
+
+
+def test_retries_honour_retry_after(stub):
+    server, base = stub(fail_first=2, retry_after=0.25)
+    client, delays = _client()
+
+    response = client.get(f'{base}/stats/cdc')
+    assert response.status_code == 200
+    assert delays == [0.25, 0.25]
+    assert server.stats['requests'] == 3
+    assert client.stats == {'requests': 3, 'retries': 2, 'failures': 0, 'rejected': 0}
+
+
+def test_backoff_is_jittered_below_an_exponential_ceiling(stub):
+    server, base = stub(fail_first=10)
+    client, delays = _client(max_retries=4, backoff_base=0.1, backoff_max=0.5, failure_threshold=10)
+
+    with pytest.raises(FetchError) as raised:
+        client.get(f'{base}/stats/cdc')
+    assert raised.value.status == 503
+    assert 'after 5 attempts' in raised.value.reason
+    assert len(delays) == 4
+    assert all(0 <= delay <= min(0.5, 0.1 * 2 ** attempt) for attempt, delay in enumerate(delays, 1))
+    assert client.stats['failures'] == 1
+
+
+def test_read_timeouts_are_retried(stub):
+    server, base = stub(slow_rate=1.0, delay=0.5)
+    client, delays = _client(timeout=0.1, max_retries=1)
+
+    with pytest.raises(FetchError) as raised:
+        client.get(f'{base}/stats/cdc')
+    assert raised.value.reason.startswith('ReadTimeout')
+    assert raised.value.status is None
+    assert server.stats['slow'] == 2
+
+
+def test_client_errors_are_not_retried(stub):
+    server, base = stub()
+    client, delays = _client()
+
+    with pytest.raises(FetchError) as raised:
+        client.get(f'{base}/missing')
+    assert raised.value.status == 404
+    assert server.stats['requests'] == 1 and delays == []
+    # The host answered, so its breaker stays closed
+    assert client.breaker(base).failures == 0
+
+
+def test_breaker_opens_per_host_and_closes_after_a_trial(stub):
+    now = [0.0]
+    server, base = stub(fail_first=2)
+    client, delays = _client(clock=lambda: now[0], max_retries=0, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(2):
+        with pytest.raises(FetchError):
+            client.get(f'{base}/stats/cdc')
+    with pytest.raises(CircuitOpenError):
+        client.get(f'{base}/stats/cdc')
+    assert server.stats['requests'] == 2
+    assert client.breaker(base).state == 'open'
+    assert client.stats['rejected'] == 1
+
+    # Other hosts are unaffected by this host's breaker
+    assert client.breaker('http://localhost:1/').state == 'closed'
+
+    now[0] = 61.0
+    assert client.breaker(base).state == 'half_open'
+    assert client.get(f'{base}/stats/cdc').status_code == 200
+    assert client.breaker(base).state == 'closed'
+
+
+def test_a_failed_trial_reopens_the_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=lambda: now[0])
+    for _ in range(3):
+        breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    # Only one trial request at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    now[0] = 19.0
+    assert not breaker.allow()
@@ -0,0 +1,51 @@
+import json
+import threading
+
+from gallbladder_analysis import instrumentation
+
+
+def test_nested_stages_profile_only_the_outermost(workdir, monkeypatch):
+    for attribute in ['METRICS_PATH', 'PROFILER', 'PROFILE_DIR', 'RUN_ID']:
+        monkeypatch.setattr(instrumentation, attribute, getattr(instrumentation, attribute))
+    instrumentation.configure(metrics_path='metrics.jsonl', profiler='cprofile',
+                              profile_dir='profiles', run_id='test')
+
+    with instrumentation.stage('outer'):
+        with instrumentation.stage('inner'):
+            sum(range(1000))
+        with instrumentation.stage('inner'):
+            pass
+
+    assert sorted(path.name for path in (workdir / 'profiles').iterdir()) == ['test_outer.prof']
+    with open('metrics.jsonl') as f:
+        records = [json.loads(line) for line in f]
+    assert [record['stage'] for record in records] == ['inner', 'inner', 'outer']
+    assert all(record['status'] == 'ok' for record in records)
+    assert records[-1]['peak_rss_mb'] >= max(record['peak_rss_mb'] for record in records[:-1])
+
+
+def test_concurrent_stages_do_not_reset_each_others_peak(workdir, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'METRICS_PATH', 'metrics.jsonl')
+    resets = []
+    monkeypatch.setattr(instrumentation, 'reset_peak_rss', lambda: resets.append(1))
+    started, release = threading.Event(), threading.Event()
+
+    def first():
+        with instrumentation.stage('first'):
+            started.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait(5)
+    with instrumentation.stage('second'):
+        pass
+    release.set()
+    thread.join()
+    with instrumentation.stage('alone'):
+        pass
+
+    assert len(resets) == 2
+    with open('metrics.jsonl') as f:
+        scopes = {record['stage']: record['peak_rss_scope'] for record in map(json.loads, f)}
+    assert scopes == {'first': 'process', 'second': 'process', 'alone': 'stage'}
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gallbladder_analysis.joins import KeyIndex
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(5)
+    keys = np.sort(rng.choice(np.arange(0, 10_000, 3), 500, replace=False))
+    values = pd.DataFrame({'rate': rng.normal(size=len(keys)), 'label': [f'k{k}' for k in keys]})
+    shuffled = rng.permutation(len(keys))
+    return keys, values, KeyIndex(keys[shuffled], values.iloc[shuffled])
+
+
+@pytest.fixture
+def probes():
+    rng = np.random.default_rng(6)
+    return pd.Series(rng.integers(-100, 10_100, 2_000), dtype='Int64')
+
+
+def test_lookup_matches_a_left_merge(index, probes):
+    keys, values, key_index = index
+    expected = pd.DataFrame({'key': probes.astype('int64')}).merge(
+        values.assign(key=keys), on='key', how='left'
+    )
+
+    result = key_index.lookup(probes)
+    np.testing.assert_array_equal(result['rate'].to_numpy(), expected['rate'].to_numpy())
+    assert result['label'].isna().sum() == expected['label'].isna().sum()
+
+
+@pytest.mark.parametrize('direction', ['backward', 'forward', 'nearest'])
+@pytest.mark.parametrize('tolerance', [None, 2])
+def test_asof_matches_merge_asof(index, probes, direction, tolerance):
+    keys, values, key_index = index
+    left = pd.DataFrame({'key': probes.astype('int64'), 'row': range(len(probes))}).sort_values('key')
+    expected = pd.merge_asof(left, values.assign(key=keys), on='key',
+                             direction=direction, tolerance=tolerance).sort_values('row')
+
+    result = key_index.asof(probes, ['rate'], direction=direction, tolerance=tolerance)
+    np.testing.assert_array_equal(result['rate'].to_numpy(), expected['rate'].to_numpy())
+
+
+def test_missing_keys_and_empty_indexes_give_na():
+    key_index = KeyIndex.from_frame(pd.DataFrame({'key': [1.0, None, 5.0], 'value': [10, 20, 50]}),
+                                    'key', ['value'])
+    assert len(key_index) == 2
+
+    probes = pd.Series([5, None, 2], dtype='Int64')
+    assert key_index.lookup(probes)['value'].tolist()[0] == 50
+    assert key_index.lookup(probes)['value'].isna().tolist() == [False, True, True]
+    assert key_index.asof(probes)['value'].isna().tolist() == [False, True, False]
+
+    empty = KeyIndex([], pd.DataFrame({'value': pd.Series([], dtype='float64')}))
+    assert empty.asof([1, 2])['value'].isna().all()
+
+
+def test_duplicate_keys_and_unknown_directions_are_rejected():
+    with pytest.raises(ValueError):
+        KeyIndex([1, 1], pd.DataFrame({'value': [1, 2]}))
+    with pytest.raises(ValueError):
+        KeyIndex([1], pd.DataFrame({'value': [1]})).asof([1], direction='sideways')
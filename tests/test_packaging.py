@@ -0,0 +1,27 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def test_installed_console_script_runs(tmp_path):
+    # Build from a copy; setuptools writes build/ into the source tree
+    source = tmp_path / 'source'
+    shutil.copytree(ROOT, source, ignore=shutil.ignore_patterns(
+        '.git', 'tests', 'data', 'build', '*.egg-info', '__pycache__', '.pytest_cache'))
+    target = tmp_path / 'site'
+    install = subprocess.run(
+        [sys.executable, '-m', 'pip', 'install', '--quiet', '--no-deps', '--target', str(target), str(source)],
+        capture_output=True, text=True
+    )
+    assert install.returncode == 0, install.stderr
+    assert (target / 'gallbladder_analysis' / 'cli.py').exists()
+
+    # Run from an unrelated directory so only the installed copy is importable
+    env = {**os.environ, 'PYTHONPATH': str(target)}
+    result = subprocess.run([str(target / 'bin' / 'gallbladder'), '--help'],
+                            capture_output=True, text=True, cwd=tmp_path, env=env)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith('usage: gallbladder')
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gallbladder_analysis.preprocessing import PreprocessingModel, load_or_fit
+
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(11)
+    base = rng.normal(size=3_000)
+    df = pd.DataFrame({
+        'surgery_count': 40 + 10 * base + rng.normal(size=3_000),
+        'mean_value': 5 - 2 * base + rng.normal(size=3_000),
+        'publication_count': rng.poisson(3, 3_000).astype('float64')
+    })
+    df.loc[[3, 700], 'mean_value'] = np.nan
+    return df
+
+
+def test_chunked_fit_matches_sklearn(features):
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+
+    model = PreprocessingModel().fit(features, chunk_size=500)
+    result = model.transform(features, chunk_size=700)
+
+    complete = features.dropna()
+    scaled = StandardScaler().fit_transform(complete)
+    components = PCA(n_components=2).fit_transform(scaled)
+    np.testing.assert_allclose(result.loc[complete.index, model.scaled_columns], scaled, atol=1e-5)
+    # Component signs are arbitrary
+    np.testing.assert_allclose(np.abs(result.loc[complete.index, model.component_columns]),
+                               np.abs(components), atol=1e-3)
+    assert result.loc[[3, 700], ['mean_value_scaled'] + model.component_columns].isna().all(axis=None)
+    assert model.n_samples_ == len(complete)
+
+
+def test_saved_versions_round_trip(features, tmp_path):
+    directory = str(tmp_path / 'models')
+    model = PreprocessingModel().fit(features)
+    first = model.save(directory)
+    second = PreprocessingModel().fit(features.iloc[:1_000]).save(directory)
+
+    assert os.path.basename(first) == 'v0001' and os.path.basename(second) == 'v0002'
+    assert PreprocessingModel.load(directory=directory).version == 'v0002'
+    loaded = PreprocessingModel.load('v0001', directory=directory)
+    pd.testing.assert_frame_equal(loaded.transform(features), model.transform(features))
+
+
+def test_load_or_fit_reuses_the_model_for_the_same_features(features, tmp_path):
+    directory = str(tmp_path / 'models')
+    fitted = load_or_fit(features, directory=directory)
+    assert load_or_fit(features, directory=directory).version == fitted.version
+
+    refitted = load_or_fit(features, ['surgery_count', 'mean_value'], directory=directory)
+    assert refitted.version == 'v0002'
+    assert load_or_fit(features, ['surgery_count', 'mean_value'], refit=True,
+                       directory=directory).version == 'v0003'
+
+
+def test_unfitted_or_empty_models_are_rejected():
+    with pytest.raises(ValueError):
+        PreprocessingModel().transform(pd.DataFrame({'surgery_count': [1.0]}))
+    with pytest.raises(ValueError):
+        PreprocessingModel().fit(pd.DataFrame({'surgery_count': [np.nan], 'mean_value': [1.0],
+                                               'publication_count': [1.0]}))
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gallbladder_analysis.query_engine import BOX_COLUMNS, QueryEngine, duckdb_available
+
+BACKENDS = ['pandas', pytest.param('duckdb', marks=pytest.mark.skipif(
+    not duckdb_available(), reason='DuckDB is not installed'))]
+
+
+@pytest.fixture
+def hospital():
+    rng = np.random.default_rng(7)
+    locations = pd.Series(rng.choice(['Northeast', 'South', None], 300), dtype='category')
+    counts = pd.Series(rng.normal(50, 5, 300).round()).astype('Int32')
+    counts[[0, 1]] = [400, -300]
+    counts[2] = pd.NA
+    return pd.DataFrame({
+        'date': pd.date_range('2019-01-01', periods=300, freq='D'),
+        'location': locations,
+        'surgery_count': counts
+    })
+
+
+@pytest.mark.parametrize('engine', BACKENDS)
+def test_rollups_leave_out_rows_without_a_group_key(workdir, hospital, engine):
+    totals = QueryEngine(engine).rollup(hospital, ['location'], {'total': ('surgery_count', 'sum')})
+
+    assert totals['location'].astype(str).tolist() == ['Northeast', 'South']
+    expected = hospital.groupby('location', observed=True)['surgery_count'].sum()
+    assert totals['total'].tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize('engine', BACKENDS)
+def test_box_whiskers_end_at_observations_within_the_fences(workdir, hospital, engine):
+    boxes = QueryEngine(engine).boxes(hospital, ['location'], 'surgery_count',
+                                      start='2019-01-01', metrics={'mean': ('surgery_count', 'mean')})
+
+    assert list(boxes.columns) == ['location'] + BOX_COLUMNS + ['mean']
+    for _, box in boxes.iterrows():
+        values = hospital.loc[hospital['location'] == box['location'], 'surgery_count'].dropna()
+        values = values.astype('float64')
+        q1, q3 = values.quantile([0.25, 0.75])
+        inside = values[values.between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))]
+        assert box['lower_fence'] == inside.min() and box['upper_fence'] == inside.max()
+        assert box['outliers'] == sorted(values[~values.index.isin(inside.index)])
+        assert box['count'] == len(values)
+    assert any(400.0 in outliers or -300.0 in outliers for outliers in boxes['outliers'])
+
+
+def test_backends_agree(workdir, hospital):
+    if not duckdb_available():
+        pytest.skip('DuckDB is not installed')
+    metrics = {'mean': ('surgery_count', 'mean'), 'var': ('surgery_count', 'var')}
+    pandas, duckdb = (QueryEngine(engine).boxes(hospital, ['location'], 'surgery_count', metrics=metrics,
+                                                filters={'location': ['South']})
+                      for engine in ('pandas', 'duckdb'))
+
+    assert pandas['location'].astype(str).tolist() == duckdb['location'].astype(str).tolist() == ['South']
+    numeric = [column for column in BOX_COLUMNS + list(metrics) if column != 'outliers']
+    np.testing.assert_allclose(pandas[numeric].astype('float64'), duckdb[numeric].astype('float64'))
+    assert pandas['outliers'].tolist() == duckdb['outliers'].tolist()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gallbladder_analysis.results_store import AnalysisResultsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalysisResultsStore(str(tmp_path / 'results'))
+
+
+def test_results_round_trip_with_types(store):
+    results = {
+        'summary': {'mean': np.float64(2.5), 'missing': float('nan'), 'upper': float('inf'),
+                    'rows': np.int64(12), 'flag': np.bool_(True)},
+        'range': [pd.Timestamp('2023-01-01'), pd.NaT],
+        'by_pair': {('North', 2023): 4.0, ('South', 2024): 5.0},
+        'pca': {'explained_variance': np.array([0.7, 0.2]), 'loadings': np.eye(3)},
+        'monthly': list(range(24)),
+        'labels': np.array(['a', 'b'], dtype=object)
+    }
+    store.save_results(results)
+    loaded = store.load_results()
+
+    assert loaded['summary']['mean'] == 2.5 and np.isnan(loaded['summary']['missing'])
+    assert loaded['summary']['upper'] == float('inf')
+    assert loaded['summary']['rows'] == 12 and loaded['summary']['flag'] is True
+    assert loaded['range'] == [pd.Timestamp('2023-01-01'), None]
+    assert loaded['by_pair'] == {('North', 2023): 4.0, ('South', 2024): 5.0}
+    np.testing.assert_array_equal(loaded['pca']['loadings'], np.eye(3))
+    np.testing.assert_array_equal(loaded['monthly'], np.arange(24.0))
+    assert loaded['labels'] == ['a', 'b']
+    assert sorted(loaded) == sorted(results)
+
+
+def test_arrays_are_read_on_first_access(store):
+    store.save_results({'summary': {'rows': 3}, 'pca': {'loadings': np.ones((4, 2))}})
+    loaded = store.load_results()
+
+    assert loaded['summary'] == {'rows': 3}
+    assert loaded._arrays is None
+    assert loaded['pca']['loadings'].shape == (4, 2)
+    assert loaded._arrays is not None
+
+
+def test_row_outputs_are_stored_as_columns(store):
+    rows = pd.DataFrame({'date': pd.date_range('2023-01-01', periods=4), 'surgery_count': [1, 2, 3, 4]},
+                        index=[10, 11, 12, 13])
+    store.write_row_outputs(rows, {'cluster': np.array([0, 1, 1, 0]),
+                                   'pca_1': np.linspace(0, 1, 4, dtype='float32')})
+
+    outputs = store.read_rows(['cluster', 'pca_1'])
+    assert list(outputs.columns) == ['cluster', 'pca_1']
+    assert outputs['cluster'].tolist() == [0, 1, 1, 0]
+    assert store.read_rows()['surgery_count'].tolist() == [1, 2, 3, 4]
+
+    with pytest.raises(ValueError):
+        store.write_row_outputs(rows, {'cluster': np.array([0, 1])})
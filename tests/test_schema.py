@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from gallbladder_analysis.schema import memory_report, read_dataset
+
+
+def test_memory_report_accepts_parquet_and_frames(workdir):
+    pd.DataFrame({
+        'hospital_name': ['Hospital 1', 'Hospital 2'] * 50,
+        'date': ['2019-01-01', '2019-01-02'] * 50,
+        'surgery_count': range(100),
+        'location': ['North', 'South'] * 50
+    }).to_csv('hospital.csv', index=False)
+    typed = read_dataset('hospital.csv', 'hospital')
+    typed.to_parquet('hospital.parquet', index=False)
+
+    report = memory_report({'hospital': 'hospital.parquet', 'analysis': typed}, nrows=10)
+
+    assert list(report.index) == ['hospital', 'analysis']
+    assert (report['after_mb'] < report['before_mb']).all()
+
+
+def test_read_dataset_limits_parquet_rows_and_columns(workdir):
+    pd.DataFrame({
+        'hospital_name': [f'Hospital {i}' for i in range(100)],
+        'date': pd.date_range('2019-01-01', periods=100),
+        'surgery_count': range(100)
+    }).to_parquet('hospital.parquet', index=False, row_group_size=30)
+
+    df = read_dataset('hospital.parquet', 'hospital', usecols=['date', 'surgery_count'], nrows=45)
+
+    assert list(df.columns) == ['date', 'surgery_count']
+    assert df['surgery_count'].tolist() == list(range(45))
+    with pytest.raises(TypeError):
+        read_dataset('hospital.parquet', 'hospital', skiprows=1)
@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+from conftest import ROOT
+from gallbladder_analysis.data_lake import DataLake
+from gallbladder_analysis.scraper import HOSPITAL_COLUMNS, PUBMED_COLUMNS, RAW_FILES, GallbladderDataScraper
+from gallbladder_analysis.settings import load_config
+
+
+def _visit(date, hospitals):
+    return [{'hospital_name': name, 'date': date, 'surgery_count': str(count), 'location': 'Northeast'}
+            for name, count in hospitals]
+
+
+def test_hospital_runs_accumulate_in_the_lake(workdir, repo_config):
+    os.makedirs('data/raw_data')
+    # A file from before the lake held raw data
+    pd.DataFrame(_visit('2019-01-31', [('A', 1)]), columns=HOSPITAL_COLUMNS).to_csv(
+        RAW_FILES['hospital_data'], index=False)
+    scraper = GallbladderDataScraper(repo_config)
+
+    scraper._write_results(_visit('2019-02-01', [('A', 2), ('B', 3)]), 'hospital_data', HOSPITAL_COLUMNS)
+    # Scraping the same day again replaces that day's rows only
+    scraper._write_results(_visit('2019-02-01', [('A', 4)]), 'hospital_data', HOSPITAL_COLUMNS)
+    scraper._write_results([], 'hospital_data', HOSPITAL_COLUMNS)
+
+    df = pd.read_csv(RAW_FILES['hospital_data']).sort_values('date')
+    assert df[['hospital_name', 'date', 'surgery_count']].values.tolist() == [
+        ['A', '2019-01-31', 1], ['A', '2019-02-01', 4]
+    ]
+    assert DataLake().manifest('hospital_raw')['rows'] == 2
+
+
+def test_flat_layout_keeps_the_latest_run(workdir):
+    os.makedirs('data/raw_data')
+    scraper = GallbladderDataScraper(load_config(os.path.join(ROOT, 'config.yaml'), {'processing.layout': 'flat'}))
+
+    scraper._write_results(_visit('2019-02-01', [('A', 2)]), 'hospital_data', HOSPITAL_COLUMNS)
+    scraper._write_results(_visit('2019-02-02', [('B', 3)]), 'hospital_data', HOSPITAL_COLUMNS)
+
+    assert pd.read_csv(RAW_FILES['hospital_data'])['hospital_name'].tolist() == ['B']
+    assert not DataLake().has('hospital_raw')
+
+
+def test_pubmed_shards_are_added_to_earlier_articles(workdir, repo_config):
+    from gallbladder_analysis.work_queue import write_shard
+
+    os.makedirs('data/raw_data')
+    pd.DataFrame({'pmid': ['1', '2'], 'title': ['One', 'Two'], 'queries': ['gallstones'] * 2}).reindex(
+        columns=PUBMED_COLUMNS).to_csv(RAW_FILES['pubmed_data'], index=False)
+    write_shard('pubmed_data', 1, [{'pmid': '2', 'title': 'Two', 'queries': 'cholecystitis'},
+                                   {'pmid': '3', 'title': 'Three', 'queries': 'cholecystitis'}],
+                PUBMED_COLUMNS)
+
+    GallbladderDataScraper(repo_config).combine_data(shards=True)
+
+    df = pd.read_csv(RAW_FILES['pubmed_data'], dtype={'pmid': 'string'})
+    assert dict(zip(df['pmid'], df['queries'])) == {
+        '1': 'gallstones', '2': 'gallstones; cholecystitis', '3': 'cholecystitis'
+    }
@@ -0,0 +1,25 @@
+import logging
+
+import pytest
+
+from gallbladder_analysis.settings import ConfigError, load_config
+
+
+def test_retired_keys_are_ignored_with_a_warning(workdir, caplog):
+    workdir.joinpath('config.yaml').write_text(
+        'app:\n  log_level: debug\n'
+        'dashboard:\n  theme: dark\n  update_interval: 60\n'
+        'analysis:\n  geographical:\n    region_comparison: true\n'
+    )
+    with caplog.at_level(logging.WARNING, logger='gallbladder_analysis.settings'):
+        config = load_config('config.yaml')
+
+    assert config.dashboard.theme == 'dark'
+    assert config.app.logging_level == logging.DEBUG
+    assert 'dashboard.update_interval is no longer used' in caplog.text
+    assert 'analysis.geographical is no longer used' in caplog.text
+
+
+def test_unknown_keys_are_still_rejected(workdir):
+    with pytest.raises(ConfigError, match='unknown keys'):
+        load_config('missing.yaml', {'dashboard.refresh': 60})
@@ -0,0 +1,30 @@
+import glob
+import os
+
+import pandas as pd
+
+from gallbladder_analysis.shared_data import attach, export_shared
+
+
+def _frame(offset):
+    return pd.DataFrame({
+        'date': pd.date_range('2019-01-01', periods=4, freq='D'),
+        'count': pd.array([1 + offset, None, 3 + offset, 4], dtype='Int32'),
+        'source': pd.Categorical(['A', 'B', 'A', 'C']),
+        'free_text': ['a', 'b', 'c', 'd']
+    })
+
+
+def test_exports_round_trip_and_replace_each_other(tmp_path):
+    directory = str(tmp_path)
+    target = export_shared(_frame(0), 'test_data', directory=directory)
+    first = attach('test_data', directory=directory)
+
+    pd.testing.assert_frame_equal(first, _frame(0).drop(columns='free_text'))
+
+    export_shared(_frame(10), 'test_data', directory=directory)
+    assert os.path.islink(target)
+    assert len(glob.glob(f'{target}*')) == 2
+    assert attach('test_data', ['count'], directory)['count'].tolist()[0] == 11
+    # Memory maps opened before the switch stay readable
+    assert first['count'].tolist()[0] == 1
@@ -0,0 +1,86 @@
+import json
+
+import pandas as pd
+import pytest
+
+from gallbladder_analysis.validation import ValidationError, rules_for, validate_chunks, validate_file
+
+
+def _hospital_rows(**overrides):
+    rows = pd.DataFrame({
+        'hospital_name': [f'Hospital {i % 3}' for i in range(6)],
+        'date': [f'2023-01-0{i // 3 + 1}' for i in range(6)],
+        'surgery_count': [str(i) for i in range(6)],
+        'location': ['North'] * 6
+    })
+    for column, values in overrides.items():
+        rows[column] = values
+    return rows
+
+
+def test_row_checks_report_counts_and_sample_rows():
+    rows = _hospital_rows(surgery_count=['1', 'x', '-2', '3', '4', None],
+                          date=['2023-01-01'] * 3 + ['2023-01-02', '1980-01-01', 'soon'])
+    report = validate_chunks([rows], 'hospital_raw', fail_fast=False)
+
+    issues = {(issue['check'], str(issue['column'])): issue for issue in report['issues']}
+    assert issues[('parses', 'surgery_count')]['sample_rows'] == [1]
+    assert issues[('range', 'surgery_count')]['sample_rows'] == [2]
+    assert issues[('parses', 'date')]['sample_rows'] == [5]
+    assert issues[('date_range', 'date')]['sample_rows'] == [4]
+    assert not report['passed'] and report['complete']
+
+
+def test_unique_keys_are_tracked_across_chunks():
+    rows = _hospital_rows()
+    report = validate_chunks([rows.iloc[:4], rows.iloc[4:], rows.iloc[1:3]], 'hospital_raw')
+
+    duplicates, = [issue for issue in report['issues'] if issue['check'] == 'unique']
+    assert duplicates['failed_rows'] == 2
+    assert duplicates['sample_rows'] == [6, 7]
+    # Repeated hospital days only warn on raw scrapes
+    assert report['passed'] and report['warnings'] == 1
+
+
+def test_fail_fast_stops_after_the_first_bad_chunk():
+    bad = _hospital_rows(surgery_count=['-1'] * 6)
+    chunks = [bad, _hospital_rows(), _hospital_rows()]
+
+    report = validate_chunks(iter(chunks), 'hospital_raw', fail_fast=True)
+    assert report['rows_checked'] == 6 and not report['complete']
+
+    report = validate_chunks(iter(chunks), 'hospital_raw', fail_fast=False)
+    assert report['rows_checked'] == 18 and report['complete']
+
+
+def test_missing_columns_fail_before_any_row_check():
+    report = validate_chunks([_hospital_rows().drop(columns=['location'])], 'hospital_raw')
+
+    assert report['issues'] == [{'check': 'required', 'column': ['location'], 'severity': 'error',
+                                 'failed_rows': None, 'sample_rows': []}]
+    assert report['rows_checked'] == 0
+
+
+def test_configured_regions_are_allowed_values(repo_config):
+    regions = list(repo_config.data_sources.hospitals.regions)
+    rows = _hospital_rows(location=[regions[0]] * 5 + ['Atlantis'])
+
+    report = validate_chunks([rows], 'hospital_raw', rules_for('hospital_raw', repo_config))
+    allowed, = [issue for issue in report['issues'] if issue['check'] == 'allowed']
+    assert allowed['sample_rows'] == [5]
+
+
+def test_validate_file_writes_the_report_and_raises(tmp_path):
+    path = tmp_path / 'hospital_data.csv'
+    _hospital_rows(surgery_count=['-1'] * 6).to_csv(path, index=False)
+
+    with pytest.raises(ValidationError) as raised:
+        validate_file(str(path), 'hospital_raw', report_dir=str(tmp_path / 'validation'))
+    with open(tmp_path / 'validation' / 'hospital_raw.json') as f:
+        assert json.load(f) == raised.value.report
+    assert 'range' in str(raised.value)
+
+    empty = tmp_path / 'empty.csv'
+    empty.write_text('')
+    report = validate_file(str(empty), 'hospital_raw', raise_on_error=False, report_dir=None)
+    assert report['issues'][0]['check'] == 'empty_file'
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from gallbladder_analysis.work_queue import WorkQueue, read_shards, write_shard
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), interval=2.0, lease_timeout=30.0,
+                      max_attempts=2, clock=lambda: clock[0])
+    yield queue
+    queue.close()
+
+
+def test_tasks_are_queued_once(queue):
+    assert queue.enqueue('pubmed', {'url': 'http://pubmed.test/?page=1'})
+    assert not queue.enqueue('pubmed', {'url': 'http://pubmed.test/?page=1'})
+    assert queue.counts() == {'pending': 1}
+
+
+def test_claims_book_per_domain_request_slots(queue):
+    for page in range(3):
+        queue.enqueue('pubmed', {'url': f'http://pubmed.test/?page={page}'})
+    queue.enqueue('statistics', {'url': 'http://stats.test/table'})
+
+    claims = [queue.claim('worker') for _ in range(4)]
+    starts = {task['payload']['url']: task['start'] for task in claims}
+    assert [starts[f'http://pubmed.test/?page={page}'] for page in range(3)] == [1000.0, 1002.0, 1004.0]
+    # The free domain is handed out before PubMed's later slots
+    assert [task['domain'] for task in claims][:2] == ['pubmed.test', 'stats.test']
+    assert starts['http://stats.test/table'] == 1000.0
+    assert queue.claim('worker') is None
+
+
+def test_slots_hold_across_queue_connections(queue, tmp_path, clock):
+    other = WorkQueue(queue.path, interval=2.0, clock=lambda: clock[0])
+    for page in range(2):
+        queue.enqueue('pubmed', {'url': f'http://pubmed.test/?page={page}'})
+
+    assert queue.claim('a')['start'] == 1000.0
+    assert other.claim('b')['start'] == 1002.0
+    other.close()
+
+
+def test_expired_leases_are_claimed_again(queue, clock):
+    queue.enqueue('pubmed', {'url': 'http://pubmed.test/?page=1'})
+    first = queue.claim('crashed')
+    assert queue.claim('other') is None
+
+    clock[0] += 31.0
+    second = queue.claim('other')
+    assert second['id'] == first['id'] and second['attempt'] == 2
+
+    # Out of attempts, an expired lease fails the task
+    clock[0] += 31.0
+    assert queue.claim('other') is None
+    assert queue.failures() == [{'source': 'pubmed', 'target': 'http://pubmed.test/?page=1',
+                                 'error': 'lease expired'}]
+
+
+def test_failed_tasks_retry_until_out_of_attempts(queue):
+    queue.enqueue('pubmed', {'url': 'http://pubmed.test/?page=1'})
+    queue.enqueue('pubmed', {'url': 'http://pubmed.test/?page=2'})
+
+    first = queue.claim('w')
+    queue.fail(first['id'], 'HTTP 503')
+    assert queue.counts() == {'pending': 2}
+    again = queue.claim('w')
+    assert again['id'] == first['id'] and again['attempt'] == 2
+    queue.fail(again['id'], 'HTTP 503')
+    second = queue.claim('w')
+    queue.fail(second['id'], 'HTTP 404', retry=False)
+
+    assert queue.counts() == {'failed': 2}
+    assert not queue.unfinished()
+    assert queue.retry_failed() == 2
+    task = queue.claim('w')
+    queue.complete(task['id'])
+    assert queue.counts() == {'done': 1, 'pending': 1}
+
+
+def test_shards_are_replaced_and_read_in_task_order(workdir):
+    write_shard('pubmed', 2, [{'title': 'b'}], ['title'])
+    write_shard('pubmed', 1, [{'title': 'a'}], ['title'])
+    write_shard('pubmed', 2, [{'title': 'c'}], ['title'])
+
+    assert read_shards('pubmed')['title'].tolist() == ['a', 'c']
+    assert read_shards('hospital') is None
+    assert not any(name.endswith('.tmp') for name in os.listdir('data/raw_data/shards/pubmed'))
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence
+
+# Date keys are days since 1970-01-01, so a contiguous daily calendar can be
+# joined positionally (key - first key) instead of through a hash join
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+CALENDAR_COLUMNS = [
+    'year', 'quarter', 'month', 'week', 'day_of_week', 'day_of_year',
+    'is_weekend', 'is_holiday', 'fiscal_year', 'fiscal_quarter', 'fiscal_period'
+]
+# Features copied onto the hospital rows; everything else stays in the calendar
+DEFAULT_FEATURES = [
+    'year', 'month', 'week', 'day_of_week', 'is_holiday', 'fiscal_year', 'fiscal_period'
+]
+HOLIDAY_CALENDARS = ('us_federal', 'none')
+
+
+def date_keys(dates: pd.Series) -> pd.arrays.IntegerArray:
+    """
+    Integer date keys (days since 1970-01-01) for a datetime column; NaT maps to NA
+    """
+    values = dates.to_numpy(dtype='datetime64[ns]')
+    missing = np.isnat(values)
+    days = (values.astype('datetime64[D]') - EPOCH).astype('int64')
+    return pd.arrays.IntegerArray(days.astype('int32'), missing)
+
+
+def _holidays(start: pd.Timestamp, end: pd.Timestamp, holiday_calendar: str) -> pd.DatetimeIndex:
+    if holiday_calendar == 'us_federal':
+        from pandas.tseries.holiday import USFederalHolidayCalendar
+        return USFederalHolidayCalendar().holidays(start, end)
+    return pd.DatetimeIndex([])
+
+
+def build_calendar(start, end, fiscal_year_start_month: int = 1,
+                   holiday_calendar: str = 'us_federal') -> pd.DataFrame:
+    """
+    One row per day from `start` to `end` with typed calendar attributes.
+
+    Fiscal years are labelled by the calendar year they end in; with the
+    default start month of 1 they match calendar years.
+    """
+    if holiday_calendar not in HOLIDAY_CALENDARS:
+        raise ValueError(f"Unknown holiday calendar: {holiday_calendar}")
+    dates = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+    iso = dates.isocalendar()
+    month = dates.month.to_numpy()
+    # Months since the start of the fiscal year, 0-11
+    fiscal_offset = (month - fiscal_year_start_month) % 12
+    fiscal_year = dates.year.to_numpy() + (month >= fiscal_year_start_month) * (fiscal_year_start_month > 1)
+
+    return pd.DataFrame({
+        'date_key': date_keys(pd.Series(dates)),
+        'date': dates,
+        'year': pd.array(dates.year, dtype='Int16'),
+        'quarter': pd.array(dates.quarter, dtype='Int8'),
+        'month': pd.array(month, dtype='Int8'),
+        'week': pd.array(iso['week'].to_numpy(), dtype='Int8'),
+        'day_of_week': pd.array(dates.dayofweek, dtype='Int8'),
+        'day_of_year': pd.array(dates.dayofyear, dtype='Int16'),
+        'is_weekend': pd.array(dates.dayofweek >= 5, dtype='boolean'),
+        'is_holiday': pd.array(dates.isin(_holidays(dates.min(), dates.max(), holiday_calendar)),
+                               dtype='boolean'),
+        'fiscal_year': pd.array(fiscal_year, dtype='Int16'),
+        'fiscal_quarter': pd.array(fiscal_offset // 3 + 1, dtype='Int8'),
+        'fiscal_period': pd.array(fiscal_offset + 1, dtype='Int8')
+    })
+
+
+def join_calendar(df: pd.DataFrame, calendar: pd.DataFrame,
+                  columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Add `date_key` and calendar `columns` to `df` by integer date key.
+
+    Each row's calendar position is its key minus the calendar's first key,
+    so the join is a single vectorized take; dates outside the calendar and
+    missing dates get NA features.
+    """
+    columns: List[str] = list(DEFAULT_FEATURES if columns is None else columns)
+    keys = date_keys(df['date'])
+    first = int(calendar['date_key'].iloc[0])
+    positions = keys.to_numpy(dtype='int64', na_value=-1) - first
+    positions[keys.isna() | (positions < 0) | (positions >= len(calendar))] = -1
+
+    df['date_key'] = keys
+    for column in columns:
+        df[column] = calendar[column].array.take(positions, allow_fill=True)
+    return df
+
+
+def add_time_features(df: pd.DataFrame, columns: Optional[Sequence[str]] = None,
+                      fiscal_year_start_month: int = 1,
+                      holiday_calendar: str = 'us_federal') -> pd.DataFrame:
+    """
+    Build a calendar spanning `df['date']` and join it onto `df`
+    """
+    dates = df['date'].dropna()
+    if dates.empty:
+        return df
+    calendar = build_calendar(dates.min(), dates.max(), fiscal_year_start_month, holiday_calendar)
+    return join_calendar(df, calendar, columns)
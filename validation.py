@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .schema import iter_dataset
+except ImportError:
+    from schema import iter_dataset
+
+VALIDATION_DIR = 'data/validation'
+SAMPLE_SIZE = 5
+
+# Declarative checks per dataset. Row checks ('not_null', 'parses',
+# 'pattern', 'range', 'date_range', 'allowed', 'unique') are evaluated
+# vectorized on each chunk and skipped for columns the file does not have
+# (presence is what 'required' is for); 'required' and 'min_rows' apply to
+# the file as a whole. Checks are errors unless marked as warnings.
+VALIDATION_RULES: Dict[str, List[Dict]] = {
+    'pubmed_raw': [
+        {'check': 'required', 'columns': ['title', 'authors', 'date', 'source']},
+        {'check': 'min_rows', 'value': 1},
+        {'check': 'not_null', 'columns': ['title']},
+        {'check': 'pattern', 'column': 'date', 'regex': r'\d{4}'},
+        {'check': 'unique', 'columns': ['title'], 'severity': 'warning'},
+        {'check': 'unique', 'columns': ['pmid'], 'severity': 'warning'}
+    ],
+    'hospital_raw': [
+        {'check': 'required', 'columns': ['hospital_name', 'date', 'surgery_count', 'location']},
+        {'check': 'min_rows', 'value': 1},
+        {'check': 'not_null', 'columns': ['hospital_name', 'date']},
+        {'check': 'parses', 'column': 'date', 'as': 'datetime'},
+        {'check': 'parses', 'column': 'surgery_count', 'as': 'numeric'},
+        {'check': 'range', 'column': 'surgery_count', 'min': 0},
+        {'check': 'date_range', 'column': 'date', 'min': '1990-01-01', 'max': 'today'},
+        {'check': 'unique', 'columns': ['hospital_name', 'date'], 'severity': 'warning'}
+    ],
+    'statistics_raw': [
+        {'check': 'required', 'columns': ['source', 'date']},
+        {'check': 'not_null', 'columns': ['source']},
+        {'check': 'parses', 'column': 'date', 'as': 'datetime'},
+        {'check': 'date_range', 'column': 'date', 'min': '1990-01-01', 'max': 'today'},
+        {'check': 'not_null', 'columns': ['metric', 'value'], 'severity': 'warning'},
+        # Legacy scrapes store the page text instead of metric rows
+        {'check': 'pattern', 'column': 'data', 'regex': r'\d', 'severity': 'warning'}
+    ],
+    'test_data': [
+        {'check': 'required', 'columns': ['date', 'count', 'source', 'rate']},
+        {'check': 'min_rows', 'value': 1},
+        {'check': 'not_null', 'columns': ['date', 'source']},
+        {'check': 'range', 'column': 'count', 'min': 0},
+        {'check': 'range', 'column': 'rate', 'min': 0, 'max': 100},
+        {'check': 'date_range', 'column': 'date', 'min': '1990-01-01', 'max': 'today'},
+        {'check': 'unique', 'columns': ['source', 'date']}
+    ]
+}
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a dataset fails an error-severity check; carries the report
+    """
+
+    def __init__(self, report: Dict):
+        failed = [issue['check'] for issue in report['issues'] if issue['severity'] == 'error']
+        super().__init__(f"{report['dataset']} failed validation ({', '.join(failed)}); "
+                         f"see the validation report")
+        self.report = report
+
+
+def rules_for(dataset: str, config=None) -> List[Dict]:
+    """
+    The declared rules for `dataset`, plus allowed values taken from `config`
+    """
+    rules = list(VALIDATION_RULES[dataset])
+    if dataset == 'hospital_raw' and config is not None and config.data_sources.hospitals.regions:
+        rules.append({'check': 'allowed', 'column': 'location',
+                      'values': list(config.data_sources.hospitals.regions)})
+    return rules
+
+
+def _bound(value) -> Optional[pd.Timestamp]:
+    if value is None:
+        return None
+    return pd.Timestamp.now().normalize() if value == 'today' else pd.Timestamp(value)
+
+
+def _dates(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors='coerce', format='mixed')
+
+
+def _parsed(parsed: Dict, kind: str, series: pd.Series) -> pd.Series:
+    # Several rules parse the same column; each chunk parses it once
+    key = (kind, series.name)
+    if key not in parsed:
+        parsed[key] = _dates(series) if kind == 'datetime' else pd.to_numeric(series, errors='coerce')
+    return parsed[key]
+
+
+def _failing_rows(rule: Dict, chunk: pd.DataFrame, parsed: Dict) -> np.ndarray:
+    """
+    Boolean mask of the rows in `chunk` that violate a row-level rule;
+    `parsed` caches converted columns across the rules of one chunk
+    """
+    check = rule['check']
+    if check == 'not_null':
+        return chunk[rule['columns']].isna().any(axis=1).to_numpy()
+
+    series = chunk[rule['column']]
+    present = series.notna().to_numpy()
+    if check == 'parses':
+        return present & _parsed(parsed, rule['as'], series).isna().to_numpy()
+    if check == 'pattern':
+        matches = series.astype('string').str.contains(rule['regex'], regex=True)
+        return present & ~matches.fillna(False).to_numpy(dtype=bool)
+    if check == 'range':
+        values = _parsed(parsed, 'numeric', series).to_numpy(dtype='float64', na_value=np.nan)
+        with np.errstate(invalid='ignore'):
+            low = values < rule['min'] if rule.get('min') is not None else False
+            high = values > rule['max'] if rule.get('max') is not None else False
+        return np.asarray(low | high, dtype=bool) & ~np.isnan(values)
+    if check == 'date_range':
+        dates = _parsed(parsed, 'datetime', series)
+        low, high = _bound(rule.get('min')), _bound(rule.get('max'))
+        failing = pd.Series(False, index=series.index)
+        if low is not None:
+            failing |= dates < low
+        if high is not None:
+            failing |= dates > high
+        return failing.fillna(False).to_numpy(dtype=bool)
+    if check == 'allowed':
+        return present & ~series.isin(rule['values']).to_numpy()
+    raise ValueError(f"Unknown validation check: {check}")
+
+
+class _UniqueKeys:
+    """
+    Duplicate detection across chunks on 64-bit hashes of the key columns,
+    kept as one sorted array (8 bytes per row)
+    """
+
+    def __init__(self):
+        self.seen = np.empty(0, dtype='uint64')
+
+    def duplicates(self, chunk: pd.DataFrame, columns: List[str]) -> np.ndarray:
+        hashes = pd.util.hash_pandas_object(chunk[columns], index=False).to_numpy()
+        repeated = pd.Series(hashes).duplicated().to_numpy()
+        if len(self.seen):
+            positions = np.minimum(np.searchsorted(self.seen, hashes), len(self.seen) - 1)
+            repeated = repeated | (self.seen[positions] == hashes)
+        # Stable sort is a timsort here, which merges the two sorted runs in linear time
+        new = np.sort(hashes[~repeated])
+        self.seen = np.sort(np.concatenate([self.seen, new]), kind='stable')
+        return repeated
+
+
+def validate_chunks(chunks: Iterable[pd.DataFrame], dataset: str,
+                    rules: Optional[List[Dict]] = None, fail_fast: bool = True,
+                    source: Optional[str] = None) -> Dict:
+    """
+    Run `rules` over a stream of chunks and return a machine-readable report.
+
+    With `fail_fast`, the stream is abandoned after the first chunk that
+    produces an error, so a bad input is rejected after one chunk instead of
+    after a full pass.
+    """
+    rules = rules_for(dataset) if rules is None else rules
+    issues = {}
+    unique = {}
+    rows = 0
+    stopped_early = False
+
+    def record(index: int, rule: Dict, failing: np.ndarray, offset: int):
+        count = int(failing.sum())
+        if not count:
+            return
+        issue = issues.setdefault(index, {
+            'check': rule['check'],
+            'column': rule.get('column', rule.get('columns')),
+            'severity': rule.get('severity', 'error'),
+            'failed_rows': 0,
+            'sample_rows': []
+        })
+        issue['failed_rows'] += count
+        room = SAMPLE_SIZE - len(issue['sample_rows'])
+        if room > 0:
+            issue['sample_rows'] += (np.flatnonzero(failing)[:room] + offset).tolist()
+
+    for chunk in chunks:
+        if rows == 0:
+            for index, rule in enumerate(rules):
+                if rule['check'] == 'required':
+                    missing = [c for c in rule['columns'] if c not in chunk.columns]
+                    if missing:
+                        issues[index] = {'check': 'required', 'column': missing,
+                                         'severity': rule.get('severity', 'error'),
+                                         'failed_rows': None, 'sample_rows': []}
+            if any(issue['severity'] == 'error' for issue in issues.values()):
+                stopped_early = True
+                break
+
+        parsed = {}
+        for index, rule in enumerate(rules):
+            check = rule['check']
+            if check in ('required', 'min_rows'):
+                continue
+            columns = rule.get('columns', [rule.get('column')])
+            if not set(columns) <= set(chunk.columns):
+                continue
+            if check == 'unique':
+                failing = unique.setdefault(index, _UniqueKeys()).duplicates(chunk, rule['columns'])
+            else:
+                failing = _failing_rows(rule, chunk, parsed)
+            record(index, rule, failing, rows)
+        rows += len(chunk)
+
+        if fail_fast and any(issue['severity'] == 'error' for issue in issues.values()):
+            stopped_early = True
+            break
+
+    if not stopped_early:
+        for index, rule in enumerate(rules):
+            if rule['check'] == 'min_rows' and rows < rule['value']:
+                issues[index] = {'check': 'min_rows', 'column': None,
+                                 'severity': rule.get('severity', 'error'),
+                                 'failed_rows': None, 'sample_rows': [],
+                                 'expected': rule['value'], 'actual': rows}
+
+    issues = [issues[index] for index in sorted(issues)]
+    return {
+        'dataset': dataset,
+        'source': source,
+        'rows_checked': rows,
+        'complete': not stopped_early,
+        'passed': not any(issue['severity'] == 'error' for issue in issues),
+        'errors': sum(issue['severity'] == 'error' for issue in issues),
+        'warnings': sum(issue['severity'] == 'warning' for issue in issues),
+        'issues': issues
+    }
+
+
+def validate_file(path: str, dataset: str, rules: Optional[List[Dict]] = None,
+                  chunk_size: int = 1_000_000, fail_fast: bool = True,
+                  raise_on_error: bool = True, report_dir: Optional[str] = VALIDATION_DIR) -> Dict:
+    """
+    Stream `path` through the rules for `dataset`, write the report as JSON
+    to `report_dir` and raise ValidationError if an error-severity check failed
+    """
+    try:
+        report = validate_chunks(iter_dataset(path, dataset, chunk_size), dataset,
+                                 rules, fail_fast, source=path)
+    except pd.errors.EmptyDataError:
+        report = {'dataset': dataset, 'source': path, 'rows_checked': 0, 'complete': True,
+                  'passed': False, 'errors': 1, 'warnings': 0,
+                  'issues': [{'check': 'empty_file', 'column': None, 'severity': 'error',
+                              'failed_rows': None, 'sample_rows': []}]}
+
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+        with open(os.path.join(report_dir, f'{dataset}.json'), 'w') as f:
+            json.dump(report, f, indent=4)
+
+    for issue in report['issues']:
+        log = logging.error if issue['severity'] == 'error' else logging.warning
+        rows = f" in {issue['failed_rows']} rows" if issue['failed_rows'] is not None else ""
+        log(f"Validation of {dataset}: {issue['check']} on {issue['column']} failed{rows}")
+    if raise_on_error and not report['passed']:
+        raise ValidationError(report)
+    return report
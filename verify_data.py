@@ -1,10 +1,29 @@
 # src/verify_data.py
+import os
+
 import pandas as pd
 
+try:
+    from .sketches import sketch_path, summarize
+except ImportError:
+    from sketches import sketch_path, summarize
+
+try:
+    from .validation import ValidationError, validate_file
+except ImportError:
+    from validation import ValidationError, validate_file
+
+TEST_DATA_PATH = 'data/raw_data/gallbladder_test_data.csv'
+
 def verify_data():
     try:
+        # Check the declared rules first; the report is written as JSON
+        report = validate_file(TEST_DATA_PATH, 'test_data')
+        print("\n=== Validation ===")
+        print(f"Passed: {report['rows_checked']} rows checked, {report['warnings']} warnings")
+        
         # Read the generated data
-        df = pd.read_csv('data/raw_data/gallbladder_test_data.csv')
+        df = pd.read_csv(TEST_DATA_PATH)
         
         # Convert date column back to datetime
         df['date'] = pd.to_datetime(df['date'])
@@ -18,14 +37,19 @@ def verify_data():
         print("\n=== First 5 rows ===")
         print(df.head())
         
+        # Mergeable sketches, saved for the dashboard
+        summary = summarize(df, ['count', 'rate'])
+        os.makedirs(os.path.dirname(sketch_path('test_data')), exist_ok=True)
+        summary.save(sketch_path('test_data'))
+        
         print("\n=== Basic Statistics ===")
-        print(df[['count', 'rate']].describe())
+        print(pd.DataFrame(summary.describe()))
         
         print("\n=== Hospital Sources Distribution ===")
         print(df['source'].value_counts())
         
         # Check for any missing values
-        missing = df.isnull().sum()
+        missing = pd.Series(summary.missing_values())
         if missing.sum() > 0:
             print("\n=== Missing Values ===")
             print(missing[missing > 0])
@@ -34,6 +58,11 @@ def verify_data():
             
     except FileNotFoundError:
         print("Error: Data file not found. Please generate the test data first.")
+    except ValidationError as e:
+        print(f"\n=== Validation failed ===\n{e}")
+        for issue in e.report['issues']:
+            print(f"- {issue['severity']}: {issue['check']} on {issue['column']} "
+                  f"({issue['failed_rows']} rows, e.g. rows {issue['sample_rows']})")
     except Exception as e:
         print(f"Error during verification: {e}")
 
@@ -0,0 +1,370 @@
+import argparse
+import dataclasses
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+try:
+    from .http_client import FetchError
+    from .scraper import (HOSPITAL_COLUMNS, PUBMED_COLUMNS, STATISTICS_COLUMNS,
+                          GallbladderDataScraper, pubmed_url)
+    from .settings import Config, StatisticsSource, load_config, parse_overrides
+except ImportError:
+    from http_client import FetchError
+    from scraper import (HOSPITAL_COLUMNS, PUBMED_COLUMNS, STATISTICS_COLUMNS,
+                         GallbladderDataScraper, pubmed_url)
+    from settings import Config, StatisticsSource, load_config, parse_overrides
+
+# One CSV per finished task, under a directory per raw dataset
+SHARD_DIR = 'data/raw_data/shards'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    leased_until REAL,
+    error TEXT,
+    UNIQUE (kind, payload)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, domain);
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    next_at REAL NOT NULL
+);
+'''
+
+
+class WorkQueue:
+    """
+    Durable scrape task queue in a SQLite file shared by worker processes.
+
+    Claiming a task leases it for `lease_timeout` seconds and books the next
+    request slot of its domain, `interval` seconds after the previous one,
+    so the rate limit holds across all workers. Tasks whose domain is free
+    soonest are handed out first. Each process opens its own WorkQueue.
+    """
+
+    def __init__(self, path: str, interval: float = 2.0, lease_timeout: float = 300.0,
+                 max_attempts: int = 3, clock: Callable[[], float] = time.time):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.interval = interval
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.clock = clock
+        # Autocommit; writes take the database lock explicitly
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: Config) -> 'WorkQueue':
+        queue = config.data_sources.queue
+        return cls(queue.path, config.data_sources.http.request_delay,
+                   queue.lease_timeout, queue.max_attempts)
+
+    def close(self):
+        self.connection.close()
+
+    def enqueue(self, kind: str, payload: Dict) -> bool:
+        """
+        Add a task unless the same one is already queued; returns whether it was added
+        """
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO tasks (kind, payload, domain) VALUES (?, ?, ?)',
+            (kind, json.dumps(payload, sort_keys=True), urlsplit(payload['url']).netloc)
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """
+        Lease the next runnable task to `worker`; None when there is none.
+
+        The task's `start` is the earliest time its request may be sent.
+        """
+        db = self.connection
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            now = self.clock()
+            # Leases of crashed workers expire; give up on tasks out of attempts
+            db.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired' "
+                "WHERE status = 'running' AND leased_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = db.execute(
+                "SELECT t.id, t.kind, t.payload, t.domain, t.attempts, COALESCE(d.next_at, 0) "
+                "FROM tasks t LEFT JOIN domains d ON d.domain = t.domain "
+                "WHERE t.status = 'pending' OR (t.status = 'running' AND t.leased_until < ?) "
+                "ORDER BY COALESCE(d.next_at, 0), t.id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            task_id, kind, payload, domain, attempts, next_at = row
+            start = max(now, next_at)
+            db.execute(
+                'INSERT INTO domains (domain, next_at) VALUES (?, ?) '
+                'ON CONFLICT (domain) DO UPDATE SET next_at = excluded.next_at',
+                (domain, start + self.interval)
+            )
+            db.execute(
+                "UPDATE tasks SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "leased_until = ? WHERE id = ?",
+                (worker, start + self.lease_timeout, task_id)
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return {'id': task_id, 'kind': kind, 'payload': json.loads(payload),
+                'domain': domain, 'attempt': attempts + 1, 'start': start}
+
+    def complete(self, task_id: int):
+        self.connection.execute(
+            "UPDATE tasks SET status = 'done', error = NULL, leased_until = NULL WHERE id = ?",
+            (task_id,)
+        )
+
+    def fail(self, task_id: int, error: str, retry: bool = True):
+        """
+        Put a failed task back in the queue, or mark it failed once out of
+        attempts (or right away when `retry` is false)
+        """
+        self.connection.execute(
+            "UPDATE tasks SET status = CASE WHEN ? AND attempts < ? THEN 'pending' ELSE 'failed' END, "
+            "error = ?, leased_until = NULL WHERE id = ?",
+            (retry, self.max_attempts, error, task_id)
+        )
+
+    def retry_failed(self) -> int:
+        cursor = self.connection.execute(
+            "UPDATE tasks SET status = 'pending', attempts = 0 WHERE status = 'failed'"
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.connection.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status'))
+
+    def unfinished(self) -> bool:
+        return self.connection.execute(
+            "SELECT EXISTS (SELECT 1 FROM tasks WHERE status IN ('pending', 'running'))"
+        ).fetchone()[0] == 1
+
+    def failures(self) -> List[Dict]:
+        """
+        Failed tasks in the layout of the scraper's failed_requests
+        """
+        rows = self.connection.execute(
+            "SELECT kind, payload, error FROM tasks WHERE status = 'failed' ORDER BY id"
+        )
+        return [{'source': kind, 'target': json.loads(payload)['url'], 'error': error}
+                for kind, payload, error in rows]
+
+
+def write_shard(dataset: str, task_id: int, rows: List[Dict], columns: List[str]) -> str:
+    """
+    Write one task's rows; a retried task replaces its earlier shard
+    """
+    directory = os.path.join(SHARD_DIR, dataset)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'task_{task_id:08d}.csv')
+    pd.DataFrame(rows, columns=columns).to_csv(f'{path}.tmp', index=False)
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+def read_shards(dataset: str) -> Optional[pd.DataFrame]:
+    """
+    A dataset's shards concatenated in task order; None when it has none
+    """
+    directory = os.path.join(SHARD_DIR, dataset)
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.csv'))
+    if not names:
+        return None
+    return pd.concat([pd.read_csv(os.path.join(directory, name), dtype={'pmid': 'string'})
+                      for name in names], ignore_index=True)
+
+
+def enqueue_crawl(queue: WorkQueue, config: Config, hospitals: Optional[List[Dict]] = None) -> int:
+    """
+    Queue a result-page task per configured PubMed term and page, one per
+    hospital and one per statistics source; returns the number added
+    """
+    base_url = config.data_sources.pubmed.base_url
+    tasks = [
+        ('pubmed', {'url': pubmed_url(base_url, term, page), 'term': term, 'page': page})
+        for term in config.data_sources.pubmed.search_terms
+        for page in range(1, config.data_sources.queue.pages_per_term + 1)
+    ]
+    tasks += [('hospital', hospital) for hospital in hospitals or []]
+    tasks += [('statistics', dataclasses.asdict(source))
+              for source in config.data_sources.statistics.sources]
+    return sum(queue.enqueue(kind, payload) for kind, payload in tasks)
+
+
+class QueueWorker:
+    """
+    Pulls tasks from the queue until none are left, writing each task's
+    rows to its own shard
+    """
+
+    def __init__(self, config: Config, name: Optional[str] = None):
+        self.config = config
+        self.name = name or f'{socket.gethostname()}-{os.getpid()}'
+        self.queue = WorkQueue.from_config(config)
+        self.scraper = GallbladderDataScraper(config)
+        self.driver = None
+
+    def _hospital(self, hospital: Dict):
+        if self.driver is None:
+            from selenium import webdriver
+            self.driver = webdriver.Chrome(options=self.scraper.chrome_options)
+        return [self.scraper.scrape_hospital(self.driver, hospital)]
+
+    def execute(self, task: Dict):
+        """
+        Run one task; returns (dataset, rows, columns)
+        """
+        payload = task['payload']
+        if task['kind'] == 'pubmed':
+            rows = self.scraper.scrape_pubmed_page(payload['term'], payload['page'])
+            return 'pubmed_data', rows, PUBMED_COLUMNS
+        if task['kind'] == 'hospital':
+            return 'hospital_data', self._hospital(payload), HOSPITAL_COLUMNS
+        if task['kind'] == 'statistics':
+            rows = self.scraper.scrape_statistics_source(StatisticsSource(**payload))
+            rows = self.scraper.statistics_frame(rows).to_dict(orient='records')
+            return 'medical_statistics', rows, STATISTICS_COLUMNS
+        raise ValueError(f"Unknown task kind {task['kind']!r}")
+
+    def _retryable(self, error: Exception) -> bool:
+        # Client errors and pages without the expected table fail the same way again
+        if isinstance(error, FetchError):
+            return error.status is None or error.status in self.config.data_sources.http.retry_statuses
+        return not isinstance(error, ValueError)
+
+    def run(self) -> int:
+        """
+        Work until the queue has no pending or leased tasks; returns the number done
+        """
+        errors = (FetchError, ValueError)
+        try:
+            from selenium.common.exceptions import WebDriverException
+            errors += (WebDriverException,)
+        except ImportError:
+            pass
+
+        done = 0
+        try:
+            while True:
+                task = self.queue.claim(self.name)
+                if task is None:
+                    if not self.queue.unfinished():
+                        break
+                    # Other workers hold the remaining tasks; one may still fail back
+                    time.sleep(self.config.data_sources.queue.poll_interval)
+                    continue
+                # Wait for the domain's slot
+                time.sleep(max(0.0, task['start'] - time.time()))
+                try:
+                    dataset, rows, columns = self.execute(task)
+                except errors as e:
+                    reason = getattr(e, 'reason', str(e))
+                    logging.warning(f"Task {task['id']} ({task['kind']}) attempt "
+                                    f"{task['attempt']} failed: {reason}")
+                    self.queue.fail(task['id'], reason, retry=self._retryable(e))
+                    continue
+                write_shard(dataset, task['id'], rows, columns)
+                self.queue.complete(task['id'])
+                done += 1
+        finally:
+            if self.driver is not None:
+                self.driver.quit()
+            self.queue.close()
+        logging.info(f"Worker {self.name} finished {done} tasks")
+        return done
+
+
+def _run_worker(config: Config, name: str):
+    QueueWorker(config, name).run()
+
+
+def run_crawl(config: Config, hospitals: Optional[List[Dict]] = None, workers: int = 4,
+              resume: bool = False):
+    """
+    Queue a crawl, run it on `workers` local processes and merge the shards
+    into the raw files. With `resume`, an earlier queue and its finished
+    shards are kept and its failed tasks are tried again.
+    """
+    path = config.data_sources.queue.path
+    if not resume:
+        for stale in [path, f'{path}-wal', f'{path}-shm']:
+            if os.path.exists(stale):
+                os.remove(stale)
+        shutil.rmtree(SHARD_DIR, ignore_errors=True)
+
+    queue = WorkQueue.from_config(config)
+    if resume:
+        queue.retry_failed()
+    added = enqueue_crawl(queue, config, hospitals)
+    logging.info(f"Queued {added} new tasks; queue: {queue.counts()}")
+
+    processes = [
+        multiprocessing.Process(target=_run_worker,
+                                args=(config, f'{socket.gethostname()}-w{i}'))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    scraper = GallbladderDataScraper(config)
+    scraper.failures.extend(queue.failures())
+    counts = queue.counts()
+    queue.close()
+    scraper.combine_data(shards=True)
+    logging.info(f"Crawl finished: {counts}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape work queue: run extra workers or show progress')
+    parser.add_argument('command', choices=['worker', 'status'])
+    parser.add_argument('-c', '--config', metavar='YAML')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE')
+    parser.add_argument('--name', help='worker name (default: host-pid)')
+    args = parser.parse_args()
+
+    config = load_config(args.config, parse_overrides(args.set))
+    logging.basicConfig(
+        filename='scraping.log',
+        level=config.app.logging_level,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.command == 'worker':
+        print(f"Finished {QueueWorker(config, args.name).run()} tasks")
+    else:
+        queue = WorkQueue.from_config(config)
+        print(json.dumps({'counts': queue.counts(), 'failures': queue.failures()}, indent=4))
+
+if __name__ == "__main__":
+    main()